@@ -0,0 +1,863 @@
+import numpy as np
+
+import particles
+import thermal
+from chunks import SLEEP_FRAMES, grow
+from parallel import TILE_SIZE, Workers
+from simulation import BURNS_OUT, DECAY_FACTOR, DRIES_TO, IGNORE_COOLING, NEIGHBOUR_ORDER, SPREADS_COLOR, Simulation
+from particles import (COLOR_VARIANTS, MATERIALS, PARTICLE_COLORS, Granular, Liquid, StraightFalling, LightGas, Bouncy,
+                       empty, steam, fire, cold_fire, mud, dirt, wet_sand, sand, water, lava, stone,
+                       acid, corrosive_byproducts, crystal)
+
+# Movement kinds, looked up per material id
+STATIC, GRANULAR, STRAIGHT, LIQUID, GAS, BOUNCY = range(6)
+
+# Mirrors INTERACTIONS in simulation.py: (current, neighbour) -> (becomes at neighbour, becomes at current)
+REACTIONS = {
+    (water, sand): (wet_sand, empty),
+    (sand, water): (wet_sand, empty),
+    (dirt, water): (mud, empty),
+    (water, dirt): (mud, empty),
+    (lava, stone): (lava, lava),
+    (stone, lava): (lava, lava),
+}
+
+# Steam looks at these cells (yi != xi) when condensing, in the same order as handle_particle_specials()
+CONDENSE_ORDER = [(-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0)]
+
+# LightGas recursion as data: (dy, dx, next on vertical bound, next on horizontal bound, next when blocked)
+# A pair of next steps means randint(0, 1) picks between them, just like the check_* methods.
+BOTTOM_LEFT, BELOW, BOTTOM_RIGHT, LEFT, RIGHT, TOP_LEFT, ABOVE, TOP_RIGHT = range(8)
+GAS_STEPS = [
+    (1, -1, (LEFT,), (BELOW,), (BELOW,)),                      # bottom left
+    (1, 0, (LEFT, RIGHT), None, (LEFT, RIGHT)),                # below
+    (1, 1, (RIGHT,), (BELOW,), (BELOW,)),                      # bottom right
+    (0, -1, None, (BELOW, ABOVE), (BELOW, ABOVE)),             # left
+    (0, 1, None, (BELOW, ABOVE), (BELOW, ABOVE)),              # right
+    (-1, -1, (LEFT,), (ABOVE,), (ABOVE,)),                     # top left
+    (-1, 0, (LEFT, RIGHT), None, (LEFT, RIGHT)),               # above
+    (-1, 1, (RIGHT,), (BELOW,), (BELOW,)),                     # top right (falls back downwards like LightGas does)
+]
+GAS_TRIES = 8 # Steps a gas tries before it gives up for the frame, the recursion limit of LightGas
+
+# The same as lookup tables for moving a row of gas at once: where each step goes, the next step per
+# [step, vertical bound / horizontal bound / blocked, coin flip], and the first step per 1/30th of a roll,
+# which is LightGas.check_movement()'s split: 60% up, 20% sideways, 10% down and 10% staying put (-1)
+GAS_DY = np.array([step[0] for step in GAS_STEPS])
+GAS_DX = np.array([step[1] for step in GAS_STEPS])
+GAS_NEXT = np.array([[(choices[0], choices[-1]) if choices else (step, step) for choices in GAS_STEPS[step][2:]]
+                     for step in range(8)])
+GAS_START = np.repeat([TOP_LEFT, ABOVE, TOP_RIGHT, LEFT, RIGHT, BOTTOM_LEFT, BELOW, BOTTOM_RIGHT, -1],
+                      [6, 6, 6, 3, 3, 1, 1, 1, 3])
+
+# Bouncy directions as integer codes, same order as Bouncy.directions
+BOUNCY_DIRECTIONS = list(Bouncy.directions)
+
+# Per-particle fields that travel with a particle when it moves
+PARTICLE_FIELDS = ("temp", "color", "variant", "target_color", "alt_color", "orig_temp",
+                   "lifetime", "max_lifetime", "visc_timer", "condense_timer", "condense_frames",
+                   "progress", "acid_tick", "direction")
+
+
+def rgb_to_hsv(rgb):
+    """Vectorized colorsys.rgb_to_hsv for an (..., 3) array of 0-1 floats"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+    s = np.where(maxc > 0, delta / np.where(maxc > 0, maxc, 1), 0.0)
+    safe = np.where(delta > 0, delta, 1)
+    rc = (maxc - r) / safe
+    gc = (maxc - g) / safe
+    bc = (maxc - b) / safe
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return h, s, maxc
+
+
+def hsv_to_rgb(h, s, v):
+    """Vectorized colorsys.hsv_to_rgb, returns an (..., 3) array of 0-1 floats"""
+    i = np.floor(h * 6.0)
+    f = h * 6.0 - i
+    i = i.astype(np.int64) % 6
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    r = np.choose(i, [v, q, p, p, t, v])
+    g = np.choose(i, [t, v, v, q, p, p])
+    b = np.choose(i, [p, p, t, v, v, q])
+    return np.stack([r, g, b], axis=-1)
+
+
+def blend_hsv(from_rgb, to_rgb, progress):
+    """Interpolate two uint8 color arrays through HSV, like the melt/solidify color transitions"""
+    h0, s0, v0 = rgb_to_hsv(from_rgb / 255.0)
+    h1, s1, v1 = rgb_to_hsv(to_rgb / 255.0)
+    rgb = hsv_to_rgb(h0 + (h1 - h0) * progress, s0 + (s1 - s0) * progress, v0 + (v1 - v0) * progress)
+    return np.clip(rgb * 255, 0, 255).astype(np.uint8)
+
+
+def pick(where, keep):
+    """The cells of where, a tuple of index arrays, for which keep is True"""
+    return tuple(index[keep] for index in where)
+
+
+class MaterialTable:
+    """Per-material constants as lookup tables indexed by material id"""
+    def __init__(self, materials=MATERIALS):
+        n = len(materials)
+        self.materials = materials
+        self.kind = np.zeros(n, np.uint8)
+        self.conductivity = np.zeros(n, np.float32)
+        self.decay_factor = np.zeros(n, np.float32)
+        self.ignore_cooling = np.zeros(n, bool)
+        self.viscosity = np.zeros(n, np.uint8)
+        self.dispersion = np.ones(n, np.uint8)
+        self.melt_temp = np.full(n, np.inf, np.float32)
+        self.melt_to = np.full(n, -1, np.int16)
+        self.solidify_temp = np.full(n, -np.inf, np.float32)
+        self.solidify_to = np.full(n, -1, np.int16)
+        self.evap_temp = np.full(n, np.inf, np.float32)
+        self.evap_to = np.full(n, -1, np.int16)
+        self.condense_temp = np.full(n, -np.inf, np.float32)
+        self.condense_to = np.full(n, -1, np.int16)
+        self.dries_to = np.full(n, -1, np.int16)
+        self.burns_out = np.zeros(n, bool)
+        self.corrodes = np.zeros(n, bool)
+        self.spreads_color = np.zeros(n, bool)
+        self.base_color = np.zeros((n, 3), np.float32)
+        self.color_pool = np.zeros((n, COLOR_VARIANTS, 3), np.uint8)
+        self.variants = [] # Per material, the pool index of every color in it, to take over what a particle picked
+
+        for material_id, cls in enumerate(materials):
+            probe = cls()
+            self.kind[material_id] = self.movement_kind(cls)
+            self.conductivity[material_id] = probe.conductivity
+            self.decay_factor[material_id] = probe.decay_factor
+            self.ignore_cooling[material_id] = getattr(probe, 'ignore_cooling', False)
+            self.viscosity[material_id] = getattr(probe, 'viscosity', 0)
+            self.dispersion[material_id] = getattr(probe, 'dispersion', 1)
+            self.base_color[material_id] = probe.base_color
+            self.color_pool[material_id] = np.resize(np.array(cls.color_pool, np.uint8), (COLOR_VARIANTS, 3))
+            self.variants.append({color: variant for variant, color in reversed(list(enumerate(cls.color_pool)))})
+            if hasattr(probe, 'melt_to'):
+                self.melt_temp[material_id] = probe.melt_temp
+                self.melt_to[material_id] = probe.melt_to.material_id
+            if hasattr(probe, 'solidify_to'):
+                self.solidify_temp[material_id] = probe.solidify_temp
+                self.solidify_to[material_id] = probe.solidify_to.material_id
+            if hasattr(probe, 'evap_to'):
+                self.evap_temp[material_id] = probe.evap_temp
+                self.evap_to[material_id] = probe.evap_to.material_id
+            if hasattr(probe, 'condense_to'):
+                self.condense_temp[material_id] = probe.condense_temp
+                self.condense_to[material_id] = probe.condense_to.material_id
+            if cls in DRIES_TO:
+                self.dries_to[material_id] = DRIES_TO[cls].material_id
+            self.burns_out[material_id] = cls in BURNS_OUT
+            self.corrodes[material_id] = hasattr(probe, 'corroded_color')
+            self.spreads_color[material_id] = cls in SPREADS_COLOR
+
+        self.has_specials = ((self.condense_to >= 0) | self.burns_out | (self.solidify_to >= 0) | (self.melt_to >= 0) |
+                             (self.evap_to >= 0) | (self.dries_to >= 0) | self.corrodes | self.spreads_color)
+
+        # What each movement kind is allowed to swap with
+        is_liquid = self.kind == LIQUID
+        is_gas = self.kind == GAS
+        self.gas_or_empty = is_gas.copy()
+        self.gas_or_empty[empty.material_id] = True
+        self.sinkable = self.gas_or_empty | is_liquid
+        self.movable = self.kind != STATIC
+        # Gases move in batches of their own (_move_gases()) and balls as entities (Simulation._move_balls())
+        self.moves_in_rows = self.movable & ~is_gas & (self.kind != BOUNCY)
+
+        self.reacts_with = np.zeros((n, n), bool) # [current, neighbour]
+        self.products = np.zeros((n, n, 2), np.uint8) # [current, neighbour] -> (what the neighbour, the current become)
+        for (current, neighbour), products in REACTIONS.items():
+            self.products[current.material_id, neighbour.material_id] = (products[0].material_id, products[1].material_id)
+            self.reacts_with[current.material_id, neighbour.material_id] = True
+        self.reactive = self.reacts_with.any(axis=1)
+
+    @staticmethod
+    def movement_kind(cls):
+        if issubclass(cls, Granular):
+            return GRANULAR
+        if issubclass(cls, StraightFalling):
+            return STRAIGHT
+        if issubclass(cls, Liquid):
+            return LIQUID
+        if issubclass(cls, LightGas):
+            return GAS
+        if issubclass(cls, Bouncy):
+            return BOUNCY
+        return STATIC
+
+
+class ArraySimulation(Simulation):
+    """The powder world stored as NumPy arrays instead of a grid of Particle objects.
+
+    With workers > 1 the movement pass runs on that many processes in tiles of tile_size, and with
+    thermal_backend="tiled" so does the thermal pass, see parallel.py.
+    """
+    thermal_backends = ("numpy", "tiled")
+
+    def __init__(self, *args, workers=1, tile_size=TILE_SIZE, **kwargs):
+        self.workers = workers
+        self.tile_size = tile_size
+        super().__init__(*args, **kwargs)
+
+    def _build_world(self):
+        width, height = self.width, self.height
+        self.table = MaterialTable()
+        self.rng = np.random.default_rng(self.seed)
+
+        shape = (height, width)
+        self.mat = np.zeros(shape, np.uint8)
+        self.temp = np.zeros(shape, np.float32)
+        self.color = np.zeros(shape + (3,), np.uint8)
+        self.variant = np.zeros(shape, np.uint8)                # Spawn color, as an index into the material's color pool
+        self.target_color = np.zeros(shape + (3,), np.uint8)   # solidify_color / melt_color
+        self.alt_color = np.zeros(shape + (3,), np.uint8)      # corroded_color
+        self.orig_temp = np.full(shape, np.nan, np.float32)
+        self.lifetime = np.zeros(shape, np.int16)
+        self.max_lifetime = np.zeros(shape, np.int16)
+        self.visc_timer = np.zeros(shape, np.uint8)
+        self.condense_timer = np.zeros(shape, np.int16)
+        self.condense_frames = np.zeros(shape, np.int16)
+        self.progress = np.zeros(shape, np.float32)           # acidification_progress
+        self.acid_tick = np.full(shape, 2, np.float32)        # acidification_tick
+        self.direction = np.zeros(shape, np.uint8)            # Bouncy.current_direction as a code
+        self._identity = np.arange(width * height, dtype=np.int32)
+        self.perm = self._identity.reshape(shape).copy()
+        self._temp_back = np.zeros(shape, np.float32) # thermal.conduct() writes here, then the two swap
+        self._mat_before = np.zeros(shape, np.uint8)
+        self._moved = np.full(width * height, -1, np.int64) # Frame each cell's particle last moved in
+        self._spawn_empty((slice(None), slice(None)))
+        self.parallel = Workers(self, self.workers, self.tile_size) if self.workers > 1 else None
+
+    def close(self):
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None # Carries on in this process
+
+    #* --- Spawning ---
+
+    def _spawn_empty(self, where):
+        """Reset the cells selected by `where` (a mask or an index) to fresh empty particles"""
+        noise = self.rng.random(self.mat[where].shape, np.float32) * 5.0 - 2.5
+        self.mat[where] = empty.material_id
+        self.temp[where] = self.ambient_temperature + noise
+        for name in ("color", "variant", "target_color", "alt_color", "lifetime", "max_lifetime",
+                     "visc_timer", "condense_timer", "condense_frames", "progress", "direction"):
+            getattr(self, name)[where] = 0
+        self.orig_temp[where] = np.nan
+        self.acid_tick[where] = 2
+
+    def _write_particles(self, where, ps):
+        """Write the particle objects ps, in row-major order, into the cells selected by `where` (an index or slices)"""
+        table = self.table
+        shape = self.mat[where].shape
+
+        def put(name, values, dtype):
+            values = np.array(values, dtype)
+            getattr(self, name)[where] = values.reshape(shape + values.shape[1:])
+
+        put("mat", [p.material_id for p in ps], np.uint8)
+        mat = self.mat[where]
+        # Spawn and target colors are picked from the color pools, see particles.color_pool(). The spawn color is the
+        # one the particle picked, so both engines color a cell alike.
+        variants = table.variants
+        put("variant", [variants[p.material_id][p.spawn_color] for p in ps], np.uint8)
+        self.color[where] = table.color_pool[mat, self.variant[where]]
+        target = np.maximum(table.melt_to[mat], table.solidify_to[mat])
+        self.target_color[where] = table.color_pool[target, self.rng.integers(COLOR_VARIANTS, size=shape)] * (target >= 0)[..., None]
+        put("temp", [p.temperature for p in ps], np.float32)
+        put("alt_color", [getattr(p, 'corroded_color', (0, 0, 0)) for p in ps], np.uint8)
+        put("lifetime", [getattr(p, 'lifetime', 0) for p in ps], np.int16)
+        put("max_lifetime", [getattr(p, 'max_lifetime', 0) for p in ps], np.int16)
+        put("visc_timer", [getattr(p, 'viscosity_timer', 0) for p in ps], np.uint8)
+        put("condense_frames", [getattr(p, 'condensing_framecount', 0) for p in ps], np.int16)
+        put("acid_tick", [getattr(p, 'acidification_tick', 2) for p in ps], np.float32)
+        put("direction", [BOUNCY_DIRECTIONS.index(p.current_direction) if isinstance(p, Bouncy) else 0 for p in ps], np.uint8)
+        self.orig_temp[where] = np.nan
+        self.condense_timer[where] = 0
+        self.progress[where] = 0
+
+    def _spawn(self, y, x, material_id, temperature=None):
+        if material_id == empty.material_id:
+            self._spawn_empty((y, x))
+        else:
+            self._write_particles((y, x), [MATERIALS[material_id]()])
+        if temperature is not None:
+            self.temp[y, x] = temperature
+
+    def place(self, x, y, material, temperature=None):
+        """Put a fresh particle of class `material` at (x, y), optionally at a given temperature"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self._wake(x, y, x + 1, y + 1)
+            particles.ambient_temperature = self.ambient_temperature
+            particles.use_rng(self.random)
+            self._spawn(y, x, material.material_id, temperature)
+            self._track_balls(x, y, x + 1, y + 1)
+
+    def fill(self, x0, y0, x1, y1, material):
+        """Fill the rectangle [x0, x1) x [y0, y1) with fresh particles of class `material`"""
+        x0, x1 = max(0, x0), min(self.width, x1)
+        y0, y1 = max(0, y0), min(self.height, y1)
+        self._wake(x0, y0, x1, y1)
+        if material is empty:
+            self._spawn_empty((slice(y0, y1), slice(x0, x1)))
+        else:
+            particles.ambient_temperature = self.ambient_temperature
+            particles.use_rng(self.random)
+            self._write_particles((slice(y0, y1), slice(x0, x1)), [material() for _ in range((y1 - y0) * (x1 - x0))])
+        self._track_balls(x0, y0, x1, y1)
+
+    def material_at(self, x, y):
+        return MATERIALS[self.mat[y, x]]
+
+    def temperature_at(self, x, y):
+        material_id = self.mat[y, x]
+        lag = self._heat_lag[y // self.heat.size, x // self.heat.size]
+        return float(thermal.decay(self.temp[y, x], DECAY_FACTOR[material_id], IGNORE_COOLING[material_id],
+                                   self._heat_ambient, lag))
+
+    def materials(self):
+        return self.mat
+
+    def temperatures(self):
+        return self._caught_up(self.temp, self.mat)
+
+    def colors(self):
+        return self.color
+
+    def snapshot(self):
+        return {
+            "frame": self.frame,
+            "width": self.width,
+            "height": self.height,
+            "ambient_temperature": self.ambient_temperature,
+            "material": self.mat.copy(),
+            "temperature": np.array(self.temperatures()),
+            "color": self.color.copy(),
+        }
+
+    def state_arrays(self):
+        """The whole world as named arrays, for snapshots.save()"""
+        return {"material": self.mat, **{name: getattr(self, name) for name in PARTICLE_FIELDS}}
+
+    def load_state(self, arrays):
+        """Replace the world with the arrays of state_arrays(), material ids already matching MATERIALS"""
+        np.copyto(self.mat, arrays["material"])
+        for name in PARTICLE_FIELDS:
+            np.copyto(getattr(self, name), arrays[name])
+        self._heat_lag[:] = 0
+        self._wake(0, 0, self.width, self.height)
+        self._track_balls(0, 0, self.width, self.height)
+
+    def _track_balls(self, x0, y0, x1, y1):
+        x0, y0, x1, y1 = max(0, x0), max(0, y0), min(self.width, x1), min(self.height, y1)
+        self.balls.drop(x0, y0, x1, y1)
+        mat = self.mat[y0:y1, x0:x1]
+        ys, xs = np.nonzero(self.table.kind[mat] == BOUNCY)
+        if ys.size:
+            ys, xs = y0 + ys, x0 + xs
+            self.balls.add(ys, xs, self.mat[ys, xs], self.direction[ys, xs], self.visc_timer[ys, xs])
+
+    def _materials_at(self, ys, xs):
+        return self.mat[ys, xs]
+
+    def _store_balls(self):
+        # Every frame, after _apply_moves(), as the arrays are handed out as they are (state_arrays(), paging)
+        self.direction[self.balls.y, self.balls.x] = self.balls.direction
+        self.visc_timer[self.balls.y, self.balls.x] = self.balls.timer
+
+    def _swap_balls(self, ys, xs, tys, txs):
+        self._swap(ys, xs, tys, txs)
+
+    def _heat_cells(self, rows, cols):
+        return self.mat[rows, cols], self.temp[rows, cols]
+
+    def _set_heat(self, rows, cols, temps):
+        self.temp[rows, cols] = temps
+
+    #* --- Frame update ---
+
+    def update_frame(self):
+        particles.ambient_temperature = self.ambient_temperature
+        particles.use_rng(self.random)
+        profiler = self.profiler
+        profiler.begin_frame(self.frame)
+        asleep_before = self.idle >= SLEEP_FRAMES if profiler.enabled else None
+        self._start_heat()
+        before = self._mat_before
+        np.copyto(before, self.mat)
+        self._movement_pass()
+        profiler.lap("movement")
+        self._specials_pass()
+        profiler.lap("specials")
+        self._interactions_pass()
+        changed = self.mat != before
+        self.chunks.touch_mask(changed)
+        self._touch_flowing()
+        self._settle(changed)
+        profiler.lap("interactions")
+        self._thermal_pass()
+        profiler.lap("thermal")
+        self._forget_balls()
+        self.chunks.end_frame()
+        if asleep_before is not None:
+            self._count_sleep(asleep_before)
+        self.frame += 1
+
+    def _movement_pass(self):
+        self._move_balls()
+        if self.parallel is not None:
+            self.parallel.move(self.chunks.cells(), self.frame, int(self.rng.integers(2**32)))
+        else:
+            self._awake = self.chunks.cells()
+            self._move_tile(0, self.height, 0, self.width)
+        self._apply_moves()
+        self._store_balls()
+
+    def _move_tile(self, y0, y1, x0, x1):
+        # Rows only ever gain particles that have already moved, so which have particles that can move is known
+        # up front. Rows with sleeping particles also get a look when something moved in one of the two rows below.
+        movable = self.table.moves_in_rows[self.mat[y0:y1, x0:x1]] & self._awake[y0:y1, x0:x1]
+        asleep = self.idle[y0:y1, x0:x1] >= SLEEP_FRAMES
+        busy = (movable & ~asleep).any(axis=1).tolist()
+        sleepy = (movable & asleep).any(axis=1).tolist()
+        calm = 2 # Rows since the last one something moved in
+        for y in range(y1 - y0 - 1, -1, -1):  # Bottom to top
+            stirred = calm < 2 # A move changes the rows next to its own, so this row or the one below changed
+            calm += 1
+            if busy[y] or (sleepy[y] and stirred):
+                if self._move_row(y0 + y, x0, x1, stirred):
+                    calm = 0
+
+        # Then the gases, every third row at once. A gas moves at most one row, so gases three rows apart never
+        # reach the same cells.
+        kind = self.table.kind
+        for start in range(y0 + 2, y0 - 1, -1):
+            rows = slice(start, y1, 3)
+            mat = self.mat[rows, x0:x1]
+            gas = (kind[mat] == GAS) & self._awake[rows, x0:x1]
+            ys, xs = np.nonzero(gas)
+            if ys.size:
+                ys, xs = start + 3 * ys, x0 + xs
+                unmoved = self._moved[self.perm[ys, xs]] != self.frame
+                self._move_gases(ys[unmoved], xs[unmoved])
+
+    def _swap(self, y0, x0, y1, x1):
+        mat, perm = self.mat, self.perm
+        mat[y0, x0], mat[y1, x1] = mat[y1, x1], mat[y0, x0]
+        perm[y0, x0], perm[y1, x1] = perm[y1, x1], perm[y0, x0]
+        self._moved[perm[y1, x1]] = self.frame
+
+    def _try_moves(self, y, xs, ty, txs, allowed):
+        """Move the cells at (y, xs) to (ty, txs) where allowed, the leftmost mover wins a shared target"""
+        ok = (txs >= 0) & (txs < self.width)
+        ok[ok] = allowed[self.mat[ty, txs[ok]]]
+        if not ok.any():
+            return ok
+        _, first = np.unique(txs[ok], return_index=True)
+        winners = np.flatnonzero(ok)[first]
+        ok[:] = False
+        ok[winners] = True
+        self._swap(y, xs[ok], ty, txs[ok])
+        return ok
+
+    def _changed_near(self, y, x0, x1):
+        """Which cells in columns [x0, x1) of row y have a neighbour whose material changed this frame"""
+        ya, yb = max(0, y - 1), min(self.height, y + 2)
+        xa, xb = max(0, x0 - 1), min(self.width, x1 + 1)
+        changed = np.zeros(x1 - x0 + 2, bool) # One column either side, off the grid never changes
+        changed[xa - x0 + 1:xb - x0 + 1] = (self.mat[ya:yb, xa:xb] != self._mat_before[ya:yb, xa:xb]).any(axis=0)
+        return changed[:-2] | changed[1:-1] | changed[2:]
+
+    def _move_row(self, y, x0, x1, stirred=True):
+        # Moves the particles in columns [x0, x1) of row y, they may move one cell out of that range (liquids flowing
+        # sideways up to their dispersion), and returns whether any might have. stirred says something moved next to
+        # the row, which can wake sleeping particles.
+        # Everything here indexes that window of the row, x0 + x is the column on the grid.
+        table = self.table
+        row = self.mat[y, x0:x1]
+        kind = table.kind[row]
+        src = self.perm[y, x0:x1]
+        active = table.moves_in_rows[row] & (self._moved[src] != self.frame) & self._awake[y, x0:x1]
+        idle = self.idle[y, x0:x1]
+        asleep = active & (idle >= SLEEP_FRAMES)
+        if stirred and asleep.any():
+            # Wake the ones next to a cell that changed material this frame, the rest sit this frame out
+            near = self._changed_near(y, x0, x1)
+            idle[asleep & near] = 0
+            asleep &= ~near
+        active &= ~asleep
+
+        # Slower moving items all fall under viscosity
+        visc = table.viscosity[row]
+        slow = active & (visc > 0)
+        if slow.any():
+            xs = np.flatnonzero(slow)
+            timers = self.visc_timer.ravel()
+            timer = timers[src[xs]] + 1
+            ready = timer > visc[xs]
+            timers[src[xs]] = np.where(ready, 0, timer)
+            active[xs[~ready]] = False
+        if not active.any():
+            return False
+
+        touched = np.zeros(x1 - x0, bool)
+        fallers = active & ((kind == GRANULAR) | (kind == STRAIGHT) | (kind == LIQUID))
+        if y < self.height - 1 and fallers.any():
+            is_liquid = kind == LIQUID
+            below = self.mat[y + 1, x0:x1]
+            open_below = np.where(is_liquid, below == empty.material_id, table.sinkable[below])
+            xs = np.flatnonzero(fallers & open_below)
+            self._swap(y, x0 + xs, y + 1, x0 + xs)
+            touched[xs] = True
+
+            # Granular and liquid particles slide diagonally, picking a random side first
+            xs = np.flatnonzero(fallers & ~open_below & (kind != STRAIGHT))
+            if xs.size:
+                liquid = is_liquid[xs]
+                first = np.where(self.rng.random(xs.size) < 0.5, -1, 1)
+                pending = np.ones(xs.size, bool)
+                for side in (first, -first):
+                    for group, allowed in ((~liquid, table.sinkable), (liquid, table.gas_or_empty)):
+                        sel = np.flatnonzero(pending & group)
+                        if sel.size:
+                            moved = self._try_moves(y, x0 + xs[sel], y + 1, x0 + xs[sel] + side[sel], allowed)
+                            pending[sel[moved]] = False
+                touched[xs[~pending]] = True
+
+                # Liquids flow sideways, but only when they tried bottom left first (see Liquid.check_bottom_right)
+                sel = np.flatnonzero(pending & liquid & (first == -1) & (x0 + xs < self.width - 1))
+                if sel.size:
+                    xs = xs[sel]
+                    first = np.where(self.rng.random(xs.size) < 0.5, -1, 1)
+                    pending = np.ones(xs.size, bool)
+                    reach = table.dispersion[row[xs]]
+                    for side in (first, -first):
+                        targets = self._flow_targets(y, x0 + xs[pending], side[pending], reach[pending]) - x0
+                        moved = self._try_moves(y, x0 + xs[pending], y, x0 + targets, table.gas_or_empty)
+                        idx = np.flatnonzero(pending)[moved]
+                        pending[idx] = False
+                        touched[xs[idx]] = True
+                        targets = targets[moved]
+                        touched[targets[(targets >= 0) & (targets < touched.size)]] = True
+
+        idle[active & ~touched & self._sleeps[row]] += 1
+        return bool(touched.any())
+
+    def _flow_targets(self, y, xs, side, reach):
+        """Columns liquids at (y, xs) flowing sideways end up in, see Liquid.flow_target(). A flow that can't
+        start keeps the first cell as its target, for _try_moves() to turn down."""
+        allowed = self.table.gas_or_empty
+        targets = xs + side
+        going = (targets >= 0) & (targets < self.width)
+        going[going] = allowed[self.mat[y, targets[going]]]
+        for step in range(1, int(reach.max(initial=1))):
+            going &= reach > step
+            if y < self.height - 1:
+                going[going] &= self.mat[y + 1, targets[going]] != empty.material_id
+            nxt = targets + side
+            going &= (nxt >= 0) & (nxt < self.width)
+            going[going] = allowed[self.mat[y, nxt[going]]]
+            if not going.any():
+                break
+            targets[going] = nxt[going]
+        return targets
+
+    def _move_gases(self, ys, xs):
+        """Move the gas particles at (ys, xs), in row order and no two closer than three rows, all at once.
+
+        Each walks through GAS_STEPS like LightGas.check_movement(): every gas tries its current step at the same
+        time and the ones that couldn't move take their next step, so all random numbers are drawn up front, one
+        roll for the first step and a coin per retry. The leftmost gas wins a shared target, and none moves into
+        the cell of a gas still trying to leave it. Losing either way counts as being blocked."""
+        mat, allowed, width = self.mat, self.table.gas_or_empty, self.width
+        rolls = self.rng.random((GAS_TRIES + 1, xs.size))
+        steps = GAS_START[(rolls[0] * GAS_START.size).astype(np.intp)]
+        going = steps >= 0
+        ys, xs, steps, rolls = ys[going], xs[going], steps[going], rolls[1:, going]
+        for attempt in range(GAS_TRIES):
+            if not xs.size:
+                return
+            ty, tx = ys + GAS_DY[steps], xs + GAS_DX[steps]
+            off_y = (ty < 0) | (ty >= self.height)
+            off_x = ~off_y & ((tx < 0) | (tx >= width))
+            ok = ~(off_y | off_x)
+            sel = np.flatnonzero(ok)
+            targets = ty[sel] * width + tx[sel]
+            sources = ys * width + xs # Sorted, as the gases come in row order
+            leaving = sources[np.minimum(np.searchsorted(sources, targets), sources.size - 1)] == targets
+            ok[sel] = allowed[mat[ty[sel], tx[sel]]] & ~leaving
+            if ok.any():
+                sel = np.flatnonzero(ok)
+                _, first = np.unique(ty[sel] * width + tx[sel], return_index=True)
+                ok[:] = False
+                ok[sel[first]] = True
+                self._swap(ys[ok], xs[ok], ty[ok], tx[ok])
+            bound = np.where(off_y, 0, np.where(off_x, 1, 2))
+            steps = GAS_NEXT[steps, bound, (rolls[attempt] < 0.5).astype(np.intp)]
+            ys, xs, steps, rolls = ys[~ok], xs[~ok], steps[~ok], rolls[:, ~ok]
+
+    def _apply_moves(self):
+        """Carry every per-particle field along with the particles that moved this frame"""
+        perm = self.perm.ravel()
+        changed = np.flatnonzero(perm != self._identity)
+        if not changed.size:
+            return
+        sources = perm[changed]
+        cells = self.width * self.height
+        for name in PARTICLE_FIELDS:
+            field = getattr(self, name).reshape(cells, -1)
+            field[changed] = field[sources]
+        perm[changed] = changed
+
+    def _touch_flowing(self):
+        """Keep the chunks of liquids with room to flow sideways awake, see FLOWS"""
+        flat, width = self.mat.reshape(-1), self.width
+        cells = self.chunks.indices()
+        cells = cells[self.table.kind[flat[cells]] == LIQUID]
+        if cells.size:
+            xs = cells % width
+            left, right = xs > 0, xs < width - 1
+            free = self.table.gas_or_empty
+            room = (left & free[flat[cells - left]]) | (right & free[flat[cells + right]])
+            ys, xs = np.divmod(cells[room], width)
+            self.chunks.touch(xs, ys)
+
+    def _specials_pass(self):
+        table = self.table
+        mat, temp = self.mat, self.temp
+        # Only the cells of awake chunks with a special behaviour. Every behaviour picks its cells out of these, as
+        # (ys, xs), by their material at that point, since the ones before it may have changed some.
+        flat = mat.reshape(-1)
+        cells = self.chunks.indices()
+        cells = cells[table.has_specials[flat[cells]]]
+        self.profiler.count("special_cells", cells.size)
+        if not cells.size:
+            return
+        every = np.divmod(cells, self.width)
+
+        #! Handle condensation
+        ids = flat[cells]
+        condensing = table.condense_to[ids] >= 0
+        if condensing.any():
+            condensing = pick(every, condensing & (temp[every] <= table.condense_temp[ids]))
+            self.condense_timer[condensing] += 1
+            ready = pick(condensing, self.condense_timer[condensing] >= self.condense_frames[condensing])
+            for y, x in zip(*ready):
+                self._condense(int(y), int(x))
+
+        #! Fire>Dissapear
+        burning = table.burns_out[flat[cells]]
+        if burning.any():
+            burning = pick(every, burning)
+            self.lifetime[burning] -= 1
+            self._spawn_empty(pick(burning, self.lifetime[burning] <= 0))
+
+        #! Handle solidification
+        solidifying = table.solidify_to[flat[cells]] >= 0
+        if solidifying.any():
+            solidifying = pick(every, solidifying)
+            self._remember_temp(solidifying)
+            solidify_temp = table.solidify_temp[mat[solidifying]]
+            temp_range = np.maximum(1.0, self.orig_temp[solidifying] - solidify_temp)
+            progress = np.clip(1.0 - (temp[solidifying] - solidify_temp) / temp_range, 0.0, 1.0)
+            self.color[solidifying] = blend_hsv(self._spawn_colors(solidifying), self.target_color[solidifying], progress)
+            self._transition(pick(solidifying, temp[solidifying] <= solidify_temp), table.solidify_to, keep_color=True)
+
+        #! Handle melting
+        melting = table.melt_to[flat[cells]] >= 0
+        if melting.any():
+            melting = pick(every, melting)
+            self._remember_temp(melting)
+            melt_temp = table.melt_temp[mat[melting]]
+            temp_range = np.maximum(1.0, melt_temp - self.orig_temp[melting])
+            progress = np.clip((temp[melting] - self.orig_temp[melting]) / temp_range, 0.0, 1.0)
+            self.color[melting] = blend_hsv(self._spawn_colors(melting), self.target_color[melting], progress)
+            self._transition(pick(melting, temp[melting] >= melt_temp), table.melt_to, keep_color=True)
+
+        #! Handle evaporation
+        ids = flat[cells]
+        evaporating = table.evap_to[ids] >= 0
+        if evaporating.any():
+            self._transition(pick(every, evaporating & (temp[every] >= table.evap_temp[ids])), table.evap_to)
+
+        #! Mud>Dirt and Wet Sand>Sand
+        drying = table.dries_to[flat[cells]] >= 0
+        if drying.any():
+            drying = pick(every, drying)
+            self.lifetime[drying] -= 1
+            ids = mat[drying]
+            increment = (table.base_color[table.dries_to[ids]] - table.base_color[ids]) / self.max_lifetime[drying][:, None]
+            elapsed = (self.max_lifetime[drying] - self.lifetime[drying])[:, None]
+            self.color[drying] = np.clip(self._spawn_colors(drying) + increment * elapsed, 0, 255)
+            for y, x in zip(*pick(drying, self.lifetime[drying] <= 0)):
+                self._spawn(y, x, table.dries_to[mat[y, x]])
+
+        #! Acidic Corrosion
+        corroding = table.corrodes[flat[cells]]
+        if corroding.any():
+            ys, xs = corroding = pick(every, corroding)
+            touching = np.zeros(ys.size, bool)
+            for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                ny, nx = ys + dy, xs + dx
+                inside = (ny >= 0) & (ny < self.height) & (nx >= 0) & (nx < self.width)
+                touching |= inside & (mat[ny.clip(0, self.height - 1), nx.clip(0, self.width - 1)] == acid.material_id)
+            corroding = pick(corroding, touching)
+            self.progress[corroding] += self.acid_tick[corroding]
+            acid_color = np.broadcast_to(np.array(acid.base_color, np.uint8), self.color[corroding].shape)
+            self.color[corroding] = blend_hsv(self._spawn_colors(corroding), acid_color, self.progress[corroding] / 100)
+            for y, x in zip(*pick(corroding, self.progress[corroding] >= 100)):
+                heated = self.temp[y, x] + 10 + particles.random() * 10  # 10–20 °C bump
+                if particles.random() < 0.8:
+                    self._spawn(y, x, acid.material_id, heated)
+                else:
+                    corroded_color = self.alt_color[y, x].copy()
+                    self._spawn(y, x, corrosive_byproducts.material_id, heated)
+                    self.color[y, x] = corroded_color
+
+        #! Crystal color spread
+        spreading = table.spreads_color[flat[cells]]
+        if spreading.any():
+            self._spread_color(pick(every, spreading))
+
+    def _spawn_colors(self, where):
+        return self.table.color_pool[self.mat[where], self.variant[where]]
+
+    def _remember_temp(self, where):
+        # original_temp is taken the first time a particle goes through the specials
+        unset = pick(where, np.isnan(self.orig_temp[where]))
+        self.orig_temp[unset] = self.temp[unset]
+
+    def _transition(self, where, lookup, keep_color=False):
+        """Replace the particles at where, as (ys, xs), with lookup[material], keeping their temperature (and target color)"""
+        for y, x in zip(*where):
+            temperature = self.temp[y, x]
+            color = self.target_color[y, x].copy()
+            self._spawn(y, x, lookup[self.mat[y, x]], temperature)
+            if keep_color:
+                self.color[y, x] = color
+
+    def _condense(self, y, x):
+        if self.mat[y, x] != steam.material_id:
+            return
+        steam_neighbours = []
+        for yi, xi in CONDENSE_ORDER:
+            ny, nx = y + yi, x + xi
+            if 0 <= ny < self.height and 0 <= nx < self.width and self.mat[ny, nx] == steam.material_id:
+                steam_neighbours.append((ny, nx))
+                if len(steam_neighbours) == 3:
+                    break
+        if len(steam_neighbours) == 3:
+            self._spawn(y, x, self.table.condense_to[steam.material_id], self.temp[y, x])
+            for ny, nx in steam_neighbours:
+                self._spawn(ny, nx, empty.material_id, self.temp[ny, nx])
+
+    def _spread_color(self, spreading):
+        # Average of the non-empty neighbours, dimmed. Dimming V in HSV is the same as scaling RGB.
+        ys, xs = spreading
+        y0, y1 = max(0, ys.min() - 1), min(self.height, ys.max() + 2)
+        x0, x1 = max(0, xs.min() - 1), min(self.width, xs.max() + 2)
+        filled = np.pad(self.mat[y0:y1, x0:x1] != empty.material_id, 1)
+        colors = np.pad(self.color[y0:y1, x0:x1].astype(np.float32), ((1, 1), (1, 1), (0, 0)))
+        colors *= filled[..., None]
+        h, w = y1 - y0, x1 - x0
+        total = np.zeros((h, w, 3), np.float32)
+        count = np.zeros((h, w), np.float32)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if dy or dx:
+                    total += colors[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+                    count += filled[1 + dy:1 + dy + h, 1 + dx:1 + dx + w]
+        target = np.zeros((h, w), bool)
+        target[ys - y0, xs - x0] = True
+        target &= count > 0
+        region = self.color[y0:y1, x0:x1]
+        region[target] = np.clip(total[target] / count[target][:, None] * 0.96, 0, 255)
+
+    def _interactions_pass(self):
+        table = self.table
+        flat = self.mat.reshape(-1)
+        width, height = self.width, self.height
+        cells = self.chunks.indices()
+        cells = cells[table.reactive[flat[cells]]]
+        self.profiler.count("reactive_cells", cells.size)
+        if not cells.size:
+            return
+        # Every reactive cell of the awake chunks reacts with the first neighbour in NEIGHBOUR_ORDER it has a reaction
+        # with, and a cell takes part in one reaction a frame. Where pairs share a cell the pair whose reacting cell
+        # comes first in scan order goes ahead, and the others look for a partner among the cells left, a round at a
+        # time. Products first react the frame after.
+        ys, xs = np.divmod(cells, width)
+        reacted = np.zeros(0, np.intp)
+        pairs = []
+        while cells.size:
+            current = flat[cells]
+            partner = np.full(cells.size, -1, np.intp)
+            for dx, dy in NEIGHBOUR_ORDER:
+                nx, ny = xs + dx, ys + dy
+                inside = (nx >= 0) & (nx < width) & (ny >= 0) & (ny < height)
+                neighbour = np.where(inside, ny * width + nx, 0)
+                found = (partner < 0) & inside & table.reacts_with[current, flat[neighbour]]
+                partner[found] = neighbour[found]
+                if reacted.size:
+                    partner[found & np.isin(neighbour, reacted)] = -1
+            keep = partner >= 0
+            cells, ys, xs, partner = cells[keep], ys[keep], xs[keep], partner[keep]
+            if not cells.size:
+                break
+            # The first claim on every cell, by the scan order of the reacting cells
+            claimed, claims = np.unique(np.concatenate((cells, partner)), return_inverse=True)
+            first = np.full(claimed.size, width * height)
+            np.minimum.at(first, claims, np.concatenate((cells, cells)))
+            won = (first[claims[:cells.size]] == cells) & (first[claims[cells.size:]] == cells)
+            pairs.append((cells[won], partner[won]))
+            reacted = np.concatenate((reacted, cells[won], partner[won]))
+            left = ~np.isin(cells, reacted)
+            cells, ys, xs = cells[left], ys[left], xs[left]
+        if pairs:
+            cells, partners = (np.concatenate(part) for part in zip(*pairs))
+            products = table.products[flat[cells], flat[partners]]
+            self._spawn_many(np.concatenate((partners, cells)), np.concatenate((products[:, 0], products[:, 1])))
+
+    def _spawn_many(self, cells, material_ids):
+        """Put fresh particles of material_ids at the flat indices cells"""
+        for material_id in np.unique(material_ids).tolist():
+            where = np.divmod(cells[material_ids == material_id], self.width)
+            if material_id == empty.material_id:
+                self._spawn_empty(where)
+            else:
+                self._write_particles(where, [MATERIALS[material_id]() for _ in range(where[0].size)])
+
+    def _thermal_pass(self):
+        table = self.table
+        mat, temp = self.mat, self.temp
+        tiled = self.thermal_backend == "tiled" and self.parallel is not None
+        region = self._heat_region()
+        if region.all():
+            if tiled:
+                self.temp = self.parallel.conduct(temp, self.ambient_temperature, self.all_neighbours_temp)
+            else:
+                self.temp = thermal.conduct(temp, table.conductivity[mat], table.decay_factor[mat], table.ignore_cooling[mat],
+                                            self.ambient_temperature, self.all_neighbours_temp, out=self._temp_back)
+            self._temp_back = temp
+            blocks = [(slice(0, self.height), slice(0, self.width), mat, temp, self.temp)]
+        else:
+            # Only part of the grid, every block is computed before any is written back
+            parts = thermal.blocks(region, self.heat.size, self.width, self.height)
+            if tiled:
+                out = self.parallel.conduct_blocks(temp, parts, self.ambient_temperature, self.all_neighbours_temp)
+                new_temps = [out[rows, cols] for rows, cols in parts]
+            else:
+                new_temps = thermal.conduct_blocks(temp, mat, table.conductivity, table.decay_factor, table.ignore_cooling,
+                                                   self.ambient_temperature, self.all_neighbours_temp, parts)
+            blocks = []
+            for (rows, cols), new_temp in zip(parts, new_temps):
+                blocks.append((rows, cols, mat[rows, cols], temp[rows, cols].copy(), new_temp))
+                temp[rows, cols] = new_temp
+        self._end_heat(region, blocks)
@@ -0,0 +1,187 @@
+"""Run fixed scenes headless and report how fast the simulation steps.
+
+    python benchmark.py                                  # every scene at 100x100, 400x400 and 1000x1000
+    python benchmark.py --scenes crystal --sizes 200 --steps 50 --engine objects
+    python benchmark.py --output after.json --compare before.json
+    python benchmark.py --engine objects --thermal-backend loop --profile   # time of every pass, per frame
+    python benchmark.py --sizes 1000 2000 --workers 1 2 4 8 16 --profile    # parallel movement scaling
+    python benchmark.py --sizes 4096 --scenes lava_flood --workers 1 2 4 8 --thermal-backend tiled --profile
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from particles import *
+from simulation import Simulation
+
+ENGINES = {"objects": Simulation}
+try:
+    from array_engine import ArraySimulation
+    ENGINES["arrays"] = ArraySimulation
+except ImportError:
+    pass
+
+
+def scene_crystal(sim):
+    # The block of crystal game.py starts with, scaled to the grid
+    sim.fill(0, 0, sim.width // 2, sim.height * 47 // 100, crystal)
+
+def scene_lava_flood(sim):
+    sim.fill(0, sim.height * 2 // 3, sim.width, sim.height, stone)
+    sim.fill(0, sim.height // 3, sim.width, sim.height * 2 // 3, lava)
+
+def scene_steam_cloud(sim):
+    # Hot steam in cold air, so it cools down and condenses
+    sim.ambient_temperature = 10
+    sim.fill(sim.width // 4, sim.height // 10, sim.width * 3 // 4, sim.height * 4 // 10, steam)
+
+def scene_acid_copper(sim):
+    sim.fill(0, sim.height * 7 // 10, sim.width, sim.height * 8 // 10, copper)
+    sim.fill(0, sim.height // 2, sim.width, sim.height * 7 // 10, acid)
+
+def scene_sand_pile(sim):
+    # A tall column of sand slumping into a pile, under drifting steam that keeps the chunks above it awake
+    sim.fill(sim.width // 3, sim.height // 10, sim.width * 2 // 3, sim.height, sand)
+    sim.fill(0, 0, sim.width, sim.height // 10, steam)
+
+def scene_bouncy_box(sim):
+    # Tungsten walls around the grid with a ball in every third cell
+    sim.fill(0, 0, sim.width, 1, tungsten)
+    sim.fill(0, sim.height - 1, sim.width, sim.height, tungsten)
+    sim.fill(0, 0, 1, sim.height, tungsten)
+    sim.fill(sim.width - 1, 0, sim.width, sim.height, tungsten)
+    for y in range(2, sim.height - 2, 3):
+        for x in range(2, sim.width - 2, 3):
+            sim.place(x, y, bouncy_ball)
+
+SCENES = {
+    "crystal": scene_crystal,
+    "lava_flood": scene_lava_flood,
+    "steam_cloud": scene_steam_cloud,
+    "acid_copper": scene_acid_copper,
+    "bouncy_box": scene_bouncy_box,
+    "sand_pile": scene_sand_pile,
+}
+
+
+def build(scene, engine, size, thermal_backend="numpy", workers=1):
+    # Only the array engine can run passes on worker processes
+    if engine == "arrays":
+        sim = ENGINES[engine](size, size, thermal_backend=thermal_backend, workers=workers)
+    else:
+        sim = ENGINES[engine](size, size, thermal_backend=thermal_backend)
+    SCENES[scene](sim)
+    return sim
+
+
+def run_case(scene, engine, size, steps, memory=True, profile=False, thermal_backend="numpy", workers=1):
+    start = time.perf_counter()
+    sim = build(scene, engine, size, thermal_backend, workers)
+    sim.profiler.enabled = profile
+    setup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sim.step(steps)
+    seconds = time.perf_counter() - start
+    sim.close()
+
+    result = {
+        "scene": scene,
+        "engine": engine,
+        "width": size,
+        "height": size,
+        "workers": workers,
+        "steps": steps,
+        "setup_seconds": round(setup_seconds, 4),
+        "seconds": round(seconds, 4),
+        "steps_per_sec": round(steps / seconds, 3),
+        "cells_per_sec": round(size * size * steps / seconds),
+    }
+    if profile:
+        result["passes"] = list(sim.profiler.passes)
+        result["pass_seconds"] = {name: round(stats[0], 6) for name, stats in sim.profiler.summary().items()}
+        result["counts"] = {name: round(value, 1) for name, value in sim.profiler.counts().items()}
+    if memory:
+        # tracemalloc slows Python code down a lot, so memory gets its own short run (in this process only)
+        tracemalloc.start()
+        sim = build(scene, engine, size, thermal_backend)
+        result["bytes_per_cell"] = round(tracemalloc.get_traced_memory()[0] / (size * size), 1)
+        sim.step(min(steps, 5))
+        result["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["scene"], r["engine"], r["width"], r["height"], r.get("workers", 1)): r for r in json.load(f)["results"]}
+    print(f"\nCompared to {baseline_path}:")
+    for r in results:
+        old = baseline.get((r["scene"], r["engine"], r["width"], r["height"], r["workers"]))
+        if old:
+            print(f"  {r['scene']:<12} {label(r):<10} {r['width']}x{r['height']:<6} {r['steps_per_sec'] / old['steps_per_sec']:.2f}x steps/sec")
+
+
+def label(result):
+    return result["engine"] if result["workers"] == 1 else f"{result['engine']}/{result['workers']}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", nargs="+", choices=SCENES, default=list(SCENES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 400, 1000])
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--engine", nargs="+", choices=ENGINES, default=["arrays"] if "arrays" in ENGINES else ["objects"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1], help="worker process counts for the array engine's movement")
+    parser.add_argument("--thermal-backend", choices=["numpy", "loop", "tiled"], default="numpy",
+                        help="loop only runs on the objects engine, tiled on the array engine's workers")
+    parser.add_argument("--profile", action="store_true", help="also record the passes of a frame and the mean time of each")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for engine in args.engine:
+        if args.thermal_backend not in ENGINES[engine].thermal_backends:
+            print(f"{engine} has no {args.thermal_backend} thermal backend, skipped")
+            continue
+        for size in args.sizes:
+            for scene in args.scenes:
+                for workers in args.workers if engine == "arrays" else [1]:
+                    result = run_case(scene, engine, size, args.steps, memory=not args.no_memory, profile=args.profile,
+                                      thermal_backend=args.thermal_backend, workers=workers)
+                    results.append(result)
+                    memory = f"{result['peak_memory_mb']:>9.1f} MB {result['bytes_per_cell']:>7.0f} B/cell" if "peak_memory_mb" in result else ""
+                    print(f"{scene:<12} {label(result):<10} {size}x{size:<6} {result['steps_per_sec']:>9.2f} steps/sec "
+                          f"{result['cells_per_sec']:>13,} cells/sec{memory}")
+                    if args.profile:
+                        print(f"    {len(result['passes'])} passes: " + "  ".join(f"{name} {seconds * 1000:.2f}ms" for name, seconds in result["pass_seconds"].items()))
+                        print("    per frame: " + "  ".join(f"{name} {value:g}" for name, value in result["counts"].items()))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import numpy as np
+
+CHUNK_SIZE = 16
+SETTLED_DELTA = 0.01 # A cell whose temperature moves less than this per frame counts as at equilibrium
+AMBIENT_DELTA = 0.05 # and one this close to the ambient temperature too can skip the thermal pass
+SLEEP_FRAMES = 4 # A particle that couldn't move this many frames in a row sleeps until a neighbour changes
+
+
+def grow(mask):
+    """The mask with every True cell spread to its 8 neighbours"""
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    out = grown.copy()
+    out[:, 1:] |= grown[:, :-1]
+    out[:, :-1] |= grown[:, 1:]
+    return out
+
+
+class Chunks:
+    """Awake flags for the world split into size x size chunks.
+
+    Passes record activity (a particle moved, a cell changed material, temperatures still shifting) with
+    touch(), and end_frame() turns that into the awake set for the next frame: every active chunk plus its
+    8 neighbours, since activity on a chunk edge can spill into the chunk next to it. Placing particles
+    wakes chunks straight away with wake(). With enabled off every chunk stays awake.
+    """
+    def __init__(self, width, height, size=CHUNK_SIZE, enabled=True):
+        self.width = width
+        self.height = height
+        self.size = size
+        self.enabled = enabled
+        shape = (-(-height // size), -(-width // size))
+        self.awake = np.ones(shape, bool) # Everything gets one look before it can fall asleep
+        self.active = np.zeros(shape, bool)
+        self._rows = np.arange(0, height, size)
+        self._cols = np.arange(0, width, size)
+        self._changed()
+
+    def _changed(self):
+        self._spans = {}
+        self._cells = None
+        self._indices = None
+
+    def touch(self, x, y):
+        self.active[y // self.size, x // self.size] = True
+
+    def touch_mask(self, mask, x0=0, y0=0):
+        """Mark every chunk holding a True cell of the per-cell mask as active. The mask covers the whole world,
+        or the cells from (x0, y0) on when that is the corner of a chunk."""
+        if mask.any():
+            s = self.size
+            rows, cols = (self._rows, self._cols) if mask.shape == (self.height, self.width) else \
+                (np.arange(0, mask.shape[0], s), np.arange(0, mask.shape[1], s))
+            active = np.logical_or.reduceat(np.logical_or.reduceat(mask, rows, axis=0), cols, axis=1)
+            self.active[y0 // s:y0 // s + active.shape[0], x0 // s:x0 // s + active.shape[1]] |= active
+
+    def wake(self, x0, y0, x1, y1):
+        """Wake the chunks around the cells [x0, x1) x [y0, y1) now, for this frame and the next"""
+        s = self.size
+        cy0, cy1 = max(0, y0 // s), (max(y0, y1 - 1)) // s + 1
+        cx0, cx1 = max(0, x0 // s), (max(x0, x1 - 1)) // s + 1
+        self.active[cy0:cy1, cx0:cx1] = True
+        self.awake[max(0, cy0 - 1):cy1 + 1, max(0, cx0 - 1):cx1 + 1] = True
+        self._changed()
+
+    def restore(self, awake):
+        """Take over the awake flags another Chunks had at the end of a frame"""
+        self.awake = np.array(awake, bool)
+        self.active[:] = False
+        self._changed()
+
+    def end_frame(self):
+        if self.enabled:
+            self.awake = grow(self.active)
+        else:
+            self.awake[:] = True
+        self.active[:] = False
+        self._changed()
+
+    def spans(self, y):
+        """Runs of awake cells on row y as (x0, x1) pairs"""
+        cy = y // self.size
+        spans = self._spans.get(cy)
+        if spans is None:
+            row = np.concatenate(([False], self.awake[cy], [False]))
+            edges = np.flatnonzero(row[1:] != row[:-1]) * self.size
+            spans = [(int(x0), min(self.width, int(x1))) for x0, x1 in zip(edges[::2], edges[1::2])]
+            self._spans[cy] = spans
+        return spans
+
+    def cells(self):
+        """Per-cell awake mask"""
+        if self._cells is None:
+            s = self.size
+            self._cells = np.repeat(np.repeat(self.awake, s, axis=0), s, axis=1)[:self.height, :self.width]
+        return self._cells
+
+    def indices(self):
+        """Flat indices of the cells of the awake chunks, in row-major order"""
+        if self._indices is None:
+            self._indices = np.flatnonzero(self.cells())
+        return self._indices
+
+    def awake_fraction(self):
+        return float(self.awake.mean())
@@ -0,0 +1,88 @@
+"""Bouncy balls as entities: a compact list of every ball instead of something the movement pass finds on the grid.
+
+Balls keeps the position, direction and viscosity timer of each ball in arrays and moves them all at once. The
+grid is only asked which materials are at the cells the balls bounce off or move into. The particle on the grid is
+still the ball for everything else (heat, melting, drawing, saving), so the engines write the new directions and
+timers back to it, add balls where they're placed and drop the ones whose cell no longer holds one.
+"""
+import numpy as np
+
+from particles import MATERIALS, Bouncy, empty
+
+# Directions are codes into Bouncy.directions: bit 1 is down and bit 0 is right, so flipping a bit reverses one
+# component of the direction
+FLIP_VERTICAL, FLIP_HORIZONTAL, FLIP_BOTH = 2, 1, 3
+
+IS_BALL = np.array([issubclass(cls, Bouncy) for cls in MATERIALS])
+VISCOSITY = np.array([getattr(cls, 'viscosity', 0) for cls in MATERIALS], np.uint8)
+
+
+class Balls:
+    """Every ball of a width x height world as parallel arrays: y, x, direction (code), timer and viscosity"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.y = np.zeros(0, np.intp)
+        self.x = np.zeros(0, np.intp)
+        self.direction = np.zeros(0, np.uint8)
+        self.timer = np.zeros(0, np.uint8)
+        self.viscosity = np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return self.y.size
+
+    def add(self, ys, xs, material_ids, directions, timers):
+        """Add balls of the given materials at (ys, xs), with their direction codes and viscosity timers"""
+        self.y = np.concatenate((self.y, np.asarray(ys, np.intp)))
+        self.x = np.concatenate((self.x, np.asarray(xs, np.intp)))
+        self.direction = np.concatenate((self.direction, np.asarray(directions, np.uint8)))
+        self.timer = np.concatenate((self.timer, np.asarray(timers, np.uint8)))
+        self.viscosity = np.concatenate((self.viscosity, VISCOSITY[np.asarray(material_ids, np.intp)]))
+
+    def keep(self, mask):
+        """Keep only the balls where mask is True"""
+        self.y, self.x = self.y[mask], self.x[mask]
+        self.direction, self.timer, self.viscosity = self.direction[mask], self.timer[mask], self.viscosity[mask]
+
+    def drop(self, x0, y0, x1, y1):
+        """Forget the balls in the rectangle [x0, x1) x [y0, y1), before it's written over"""
+        self.keep(~((self.x >= x0) & (self.x < x1) & (self.y >= y0) & (self.y < y1)))
+
+    def step(self, materials_at):
+        """Bounce or move every ball whose viscosity timer runs out, like one check_movement() of Bouncy each.
+
+        materials_at(ys, xs) gives the material ids at those cells. A ball bounces off the edges of the grid and off
+        anything that isn't empty above/below or beside it, and otherwise moves diagonally, whatever is there trades
+        places with it. All balls look at the grid as it was before any of them moved, so two balls can't just swap:
+        a ball that would move into another one bounces off it, and when two go for the same cell the one first in
+        row-major order gets it and the other waits. Returns the moves as (from_y, from_x, to_y, to_x), the caller
+        swaps those cells.
+        """
+        timer = self.timer + 1
+        ready = timer > self.viscosity
+        self.timer = np.where(ready, 0, timer).astype(np.uint8)
+        balls = np.flatnonzero(ready)
+        y, x, code = self.y[balls], self.x[balls], self.direction[balls]
+        ty = y + np.where(code & 2, 1, -1)
+        tx = x + np.where(code & 1, 1, -1)
+        off_y = (ty < 0) | (ty >= self.height)
+        off_x = (tx < 0) | (tx >= self.width)
+        vertical = np.zeros(balls.size, bool) # Something above or below, in the direction of travel
+        horizontal = np.zeros(balls.size, bool)
+        vertical[~off_y] = materials_at(ty[~off_y], x[~off_y]) != empty.material_id
+        horizontal[~off_x] = materials_at(y[~off_x], tx[~off_x]) != empty.material_id
+        # A corner (on the grid or on particles) reverses both components, a horizontal surface the vertical one
+        # and a vertical surface the horizontal one
+        flip = np.select([(off_y & off_x) | (vertical & horizontal), off_y, off_x, vertical, horizontal],
+                         [FLIP_BOTH, FLIP_VERTICAL, FLIP_HORIZONTAL, FLIP_VERTICAL, FLIP_HORIZONTAL], 0)
+        movers = np.flatnonzero(flip == 0)
+        flip[movers[IS_BALL[materials_at(ty[movers], tx[movers])]]] = FLIP_BOTH
+        self.direction[balls] = code ^ flip.astype(np.uint8)
+
+        movers = np.flatnonzero(flip == 0)
+        movers = movers[np.argsort(y[movers] * self.width + x[movers], kind="stable")]
+        _, first = np.unique(ty[movers] * self.width + tx[movers], return_index=True)
+        movers = movers[first]
+        moves = y[movers], x[movers], ty[movers], tx[movers]
+        self.y[balls[movers]], self.x[balls[movers]] = ty[movers], tx[movers]
+        return moves
@@ -1,1245 +1,120 @@
-import pygame
-from random import randint, random
-from colorsys import rgb_to_hsv, hsv_to_rgb
-def colorer(base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-    # If only color_variance_red is filled, use it for all channels and apply the same diff to all
-    if color_variance_green is None and color_variance_blue is None:
-        diff = randint(-color_variance_red, color_variance_red)
-        r = max(0, min(255, base_r + diff))
-        g = max(0, min(255, base_g + diff))
-        b = max(0, min(255, base_b + diff))
-        # Clamp negative values to positive, and if any channel >255, reset all to base color
-        if r < 0 or g < 0 or b < 0:
-            r, g, b = abs(r), abs(g), abs(b)
-        if r > 255:
-            r = base_r
-        if g > 255:
-            g = base_g
-        if b > 255:
-            b = base_b
-    else:
-        # Apply variance per channel
-        if color_variance_green is None:
-            color_variance_green = color_variance_red
-        if color_variance_blue is None:
-            color_variance_blue = color_variance_red
-
-        diff_r = randint(-color_variance_red, color_variance_red)
-        diff_g = randint(-color_variance_green, color_variance_green)
-        diff_b = randint(-color_variance_blue, color_variance_blue)
-        
-        r = max(0, min(255, base_r + diff_r))
-        g = max(0, min(255, base_g + diff_g))
-        b = max(0, min(255, base_b + diff_b))
-        # Clamp negative values to positive, and if any channel >255, reset all to base color
-        if r < 0 or g < 0 or b < 0:
-            r, g, b = abs(r), abs(g), abs(b)
-        if r > 255:
-            r = base_r
-        if g > 255:
-            g = base_g
-        if b > 255:
-            b = base_b
-    return (r, g, b)
-
-
-
-
-class Particle:
-    """Base class for all particles"""
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        self.has_moved = False
-        self.base_color = (base_r, base_g, base_b)
-        # If only color_variance_red is filled, use it for all channels and apply the same diff to all
-        self.color = colorer(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue) 
-        self.spawn_color = self.color
-    def __repr__(self):
-        return self.__class__.__name__
-    
-    def move(self, grid, old_y, old_x, new_y, new_x):
-        grid[new_y][new_x], grid[old_y][old_x] = grid[old_y][old_x], grid[new_y][new_x]
-
-class Static(Particle):
-    locked = False
-    """Base class for particles that don't move"""
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        super().__init__(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue)
-
-class StraightFalling(Particle):
-    locked = False
-    """Base class for particles that fall straight down"""
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        super().__init__(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue)
-    
-    def check_movement(self, x, y, grid):
-        return self.check_below(x, y, grid)
-
-    def check_below(self, x, y, grid):
-        if y >= height - 1:
-            return False
-        if isinstance(grid[y+1][x], (empty, Liquid, LightGas)):
-            self.move(grid, y, x, y+1, x)
-            return True
-        return False
-
-class Granular(Particle):
-    locked = False
-    """Base class for sand-like particles that fall and slide"""
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        super().__init__(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue)
-
-    def check_movement(self, x, y, grid):
-        return self.check_below(x, y, grid)
-
-    def check_bottom_left(self, x, y, grid, other):
-        # Left edge check
-        if x <= 0:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_right(x, y, grid, True)
-        # Regular checks
-        if isinstance(grid[y+1][x-1], (empty, Liquid, LightGas)):
-            self.move(grid, y, x, y+1, x-1)
-            return True
-        else:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_right(x, y, grid, True)
-
-    def check_bottom_right(self, x, y, grid, other):
-        # Right edge check
-        if x >= width - 1:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_left(x, y, grid, True)
-        # Regular checks
-        if isinstance(grid[y+1][x+1], (empty, Liquid, LightGas)):
-            self.move(grid, y, x, y+1, x+1)
-            return True
-        else:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_left(x, y, grid, True)
-
-    def check_below(self, x, y, grid):
-        # Floor check
-        if y >= height - 1:
-            return False
-        # Regular checks
-        if isinstance(grid[y+1][x], (empty, Liquid, LightGas)):
-            self.move(grid, y, x, y+1, x)
-            return True
-        else:
-            rnder = randint(0,1)
-            if rnder == 0:
-                return self.check_bottom_left(x, y, grid, False)
-            else:
-                return self.check_bottom_right(x, y, grid, False)
-
-class Liquid(Particle):
-    locked = False
-    """Base class for liquid particles that fall, slide, and flow horizontally"""
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        super().__init__(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue)
-
-    def check_movement(self, x, y, grid):
-        return self.check_below(x, y, grid)
-    
-    def check_bottom_left(self, x, y, grid, other):
-        # Left edge check
-        if x <= 0:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_right(x, y, grid, True)
-        # Regular checks
-        if isinstance(grid[y+1][x-1], (empty,LightGas)):
-            self.move(grid, y, x, y+1, x-1)
-            return True
-        else:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_right(x, y, grid, True)
-
-    def check_bottom_right(self, x, y, grid, other):
-        # Right edge check
-        if x >= width - 1:
-            if other == True:
-                return False
-            else:
-                return self.check_bottom_left(x, y, grid, True)
-        # Regular checks
-        if isinstance(grid[y+1][x+1], (empty, LightGas)):
-            self.move(grid, y, x, y+1, x+1)
-            return True
-        else:
-            if other == True:
-                if randint(0, 1) == 0:
-                    return self.check_left(x, y, grid, False)
-                else:
-                    return self.check_right(x, y, grid, False)
-            else:
-                return self.check_bottom_left(x, y, grid, True)
-
-    def check_left(self, x, y, grid, other):
-        if x <= 0:
-            if other == True:
-                return False
-            else:
-                return self.check_right(x, y, grid, other)
-        if isinstance(grid[y][x-1], (empty, LightGas)):
-            self.move(grid, y, x, y, x-1)
-            return True
-        else:
-            if other == True:
-                return False
-            else:
-                return self.check_right(x, y, grid, True)
-    
-    def check_right(self, x, y, grid, other):
-        if x >= width-1:
-            if other == True:
-                return False
-            else:
-                return self.check_left(x, y, grid, True)
-        if isinstance(grid[y][x+1], (empty, LightGas)):
-            self.move(grid, y, x, y, x+1)
-            return True
-        else:
-            if other == True:
-                if randint(0, 1) == 0:
-                    return self.check_left(x, y, grid, False)
-                else:
-                    return self.check_right(x, y, grid, False)
-            else:
-                return self.check_left(x, y, grid, True)
-
-    def check_below(self, x, y, grid):
-        # Floor check
-        if y >= height - 1:
-            return False
-        # Regular checks
-        if isinstance(grid[y+1][x], empty):
-            self.move(grid, y, x, y+1, x)
-            return True
-        else:
-            if randint(0, 1) == 0:
-                return self.check_bottom_left(x, y, grid, False)
-            else:
-                return self.check_bottom_right(x, y, grid, False)
-
-class LightGas(Particle):
-    locked = False
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        super().__init__(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue)
-    
-    def check_bottom_left(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-        # Floor check
-        if y >= height - 1:
-            #* At the floor of the simulation, it can't go further down.
-            #* This means that it should either go left or right, instead of trying diagonally downwards like standard particles.
-            #* Since this particle originally intended to go downleft, it'll try to go left.
-            return self.check_left(x, y, grid, counter + 1)
-        # Left edge check
-        if x <= 0:
-            #* At the left wall of the simulation, it can't go bottom left, top left, or left itself.
-            #* This means that it should either go up or down, instead of trying the other side like standard particles.
-            #* Since this particle originally intended to go downleft, it'll try to go down.
-            return self.check_below(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y+1][x-1]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y+1, x-1)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            return self.check_below(x,y, grid, counter+1)
-        
-    def check_below(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-
-        # Floor check
-        if y >= height-1:
-            #* At the floor of the simulation, it can't go further down.
-            #* This means that it should either go left or right, instead of trying diagonally downwards like standard particles.
-            #* Since this particle originally intended to go straight down, it'll randomly go left or right.
-            if randint(0, 1) == 0:
-                return self.check_left(x,y, grid, counter+1)
-            else:
-                return self.check_right(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y+1][x]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y+1, x)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            if randint(0, 1) == 0:
-                return self.check_left(x,y, grid, counter+1)
-            else:
-                return self.check_right(x,y, grid, counter+1)
-    
-    def check_bottom_right(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-        # Floor check
-        if y >= height - 1:
-            #* At the floor of the simulation, it can't go further down.
-            #* This means that it should either go left or right, instead of trying diagonally downwards like standard particles.
-            #* Since this particle originally intended to go downright, it'll try to go right.
-            return self.check_right(x, y, grid, counter + 1)
-        # Right edge check
-        if x >= width-1:
-            #* At the right wall of the simulation, it can't go bottom right, top right, or right itself.
-            #* This means that it should either go up or down, instead of trying the other side like standard particles.
-            #* Since this particle originally intended to go downright, it'll try to go down.
-            return self.check_below(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y+1][x+1]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y+1, x+1)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            return self.check_below(x,y, grid, counter+1)
-    
-    def check_left(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-
-        # Left edge check
-        if x <= 0:
-            #* At the left wall of the simulation, it can't go bottom left, top left, or left itself.
-            #* This means that it should either go up or down, instead of trying the other side like standard particles.
-            #* Since this particle had no original vertical intention, it'll randomly pick to go up or down.
-            if randint(0, 1) == 0:
-                return self.check_below(x,y, grid, counter+1)
-            else:
-                return self.check_above(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y][x-1]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y, x-1)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            if randint(0, 1) == 0:
-                return self.check_below(x,y, grid, counter+1)
-            else:
-                return self.check_above(x,y, grid, counter+1)
-    
-    def check_right(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-
-        # Right edge check
-        if x >= width-1:
-            #* At the right wall of the simulation, it can't go bottom right, top right, or right itself.
-            #* This means that it should either go up or down, instead of trying the other side like standard particles.
-            #* Since this particle had no original vertical intention, it'll randomly pick to go up or down.
-            if randint(0, 1) == 0:
-                return self.check_below(x,y, grid, counter+1)
-            else:
-                return self.check_above(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y][x+1]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y, x+1)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            if randint(0, 1) == 0:
-                return self.check_below(x,y, grid, counter+1)
-            else:
-                return self.check_above(x,y, grid, counter+1)
-
-    def check_top_left(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-
-        # Ceiling check
-        if y <= 0:
-            #* At the ceiling of the simulation, it can't go further up.
-            #* This means that it should either go left or right.
-            #* Since this particle originally intended to go upleft, it'll go left.
-            return self.check_left(x,y, grid, counter+1)
-        # Left edge check
-        if x <= 0:
-            #* At the left wall of the simulation, it can't go bottom left, top left, or left itself.
-            #* This means that it should either go up or down, instead of trying the other side like standard particles.
-            #* Since this particle originally intended to go upleft, it'll try to go up.
-            return self.check_above(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y-1][x-1]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y-1, x-1)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            return self.check_above(x,y, grid, counter+1)
-        
-    def check_above(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-
-        # Ceiling check
-        if y <= 0:
-            #* At the ceiling of the simulation, it can't go further up.
-            #* This means that it should either go left or right.
-            #* Since this particle originally intended to go straight up, it'll randomly go left or right.
-            if randint(0, 1) == 0:
-                return self.check_left(x,y, grid, counter+1)
-            else:
-                return self.check_right(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y-1][x]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y-1, x)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            if randint(0, 1) == 0:
-                return self.check_left(x,y, grid, counter+1)
-            else:
-                return self.check_right(x,y, grid, counter+1)
-    
-    def check_top_right(self, x,y, grid, counter=0):
-        #! Recursion prevention
-        if counter >= 8:
-            return False
-        #! Recursion prevention
-
-        # Ceiling check
-        if y <= 0:
-            #* At the ceiling of the simulation, it can't go further up.
-            #* This means that it should either go left or right.
-            #* Since this particle originally intended to go upright, it'll go right.
-            return self.check_right(x,y, grid, counter+1)
-        
-        # Right edge check
-        if x >= width-1:
-            #* At the right wall of the simulation, it can't go bottom right, top right, or right itself.
-            #* This means that it should either go up or down, instead of trying the other side like standard particles.
-            #* Since this particle originally intended to go downright, it'll try to go down.
-            return self.check_below(x,y, grid, counter+1)
-        # Regular checks
-        target=grid[y-1][x+1]
-        if isinstance(target, (empty, LightGas)):
-            self.move(grid, y,x, y-1, x+1)
-            return True
-        #TODO--- Gaseous interactions of varying densities
-        else:
-            return self.check_below(x,y, grid, counter+1)
-
-    def check_movement(self, x,y, grid):
-        r = random()
-        ri = randint(0,2)
-        # Upwards movements
-        if r < 0.6:
-            if ri == 0:
-                return self.check_top_left(x,y, grid, 0)
-            elif ri == 1:
-                return self.check_above(x,y, grid, 0)
-            else:
-                return self.check_top_right(x,y, grid, 0)
-        # Sideways movements
-        elif r < 0.8:
-            if randint(0,1) == 0:
-                return self.check_left(x,y, grid, 0)
-            else:
-                return self.check_right(x,y, grid, 0)
-        # Downwards movements
-        elif r < 0.9:
-            if ri == 0:
-                return self.check_bottom_left(x,y, grid, 0)
-            elif ri == 1:
-                return self.check_below(x,y, grid, 0)
-            else:
-                return self.check_bottom_right(x,y, grid, 0)
-        # Stay put
-        else:
-            return False
-
-
-
-class Bouncy(Particle):
-    locked = True
-    def __init__(self, base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
-        super().__init__(base_r, base_g, base_b, color_variance_red, color_variance_green, color_variance_blue)
-        self.directions = ["topleft", "topright", "bottomleft", "bottomright"]
-        self.current_direction = self.directions[randint(0,3)]
-    def check_movement(self, x,y, grid):
-        if self.current_direction == self.directions[0]:
-            return self.check_top_left(x,y, grid)
-        elif self.current_direction == self.directions[1]:
-            return self.check_top_right(x,y, grid)
-        elif self.current_direction == self.directions[2]:
-            return self.check_bottom_left(x,y, grid)
-        elif self.current_direction == self.directions[3]:
-            return self.check_bottom_right(x,y, grid)
-  
-    def check_top_right(self, x,y, grid):
-        # Topright Corner Bounce on grid
-        if y <= 0 and x >= width-1:
-            self.current_direction = self.directions[2]  # bottomleft
-            return False
-        # Corner Bounce on particles
-        if y > 0 and x < width-1 and not isinstance(grid[y-1][x], empty) and not isinstance(grid[y][x+1], empty):
-            self.current_direction = self.directions[2]  # bottomleft
-            return False
-        
-        # Bounce on ceiling (horizontal surface - reverse vertical component)
-        if y <= 0:
-            self.current_direction = self.directions[3]  # bottomright
-            return False
-        
-        # Bounce on right wall of grid (vertical surface - reverse horizontal component)
-        if x >= width-1:
-            self.current_direction = self.directions[0]  # topleft
-            return False
-        
-        # Bounce on object above (horizontal surface) or to the right (vertical surface)
-        if not isinstance(grid[y-1][x], empty):
-            self.current_direction = self.directions[3]  # bottomright
-            return False
-        elif not isinstance(grid[y][x+1], empty):
-            self.current_direction = self.directions[0]  # topleft
-            return False
-        # Move to empty spot
-        else:
-            self.move(grid, y, x, y-1, x+1)
-            return True
-        
-    def check_top_left(self, x,y, grid):
-        # Topleft Corner Bounce on grid
-        if y <= 0 and x <= 0:
-            self.current_direction = self.directions[3]  # bottomright
-            return False
-        # Corner Bounce on particles
-        if y > 0 and x > 0 and not isinstance(grid[y-1][x], empty) and not isinstance(grid[y][x-1], empty):
-            self.current_direction = self.directions[3]  # bottomright
-            return False
-        
-        # Bounce on ceiling (horizontal surface - reverse vertical component)
-        if y <= 0:
-            self.current_direction = self.directions[2]  # bottomleft
-            return False
-        
-        # Bounce on left wall of grid (vertical surface - reverse horizontal component)
-        if x <= 0:
-            self.current_direction = self.directions[1]  # topright
-            return False
-        
-        # Bounce on object above (horizontal surface) or to the left (vertical surface)
-        if not isinstance(grid[y-1][x], empty):
-            self.current_direction = self.directions[2]  # bottomleft
-            return False
-        elif not isinstance(grid[y][x-1], empty):
-            self.current_direction = self.directions[1]  # topright
-            return False
-        # Move to empty spot
-        else:
-            self.move(grid, y, x, y-1, x-1)
-            return True
-    
-    def check_bottom_left(self, x,y, grid):
-        # Bottomleft Corner Bounce on grid
-        if y >= height-1 and x <= 0:
-            self.current_direction = self.directions[1]  # topright
-            return False
-        # Corner Bounce on particles
-        if y < height-1 and x > 0 and not isinstance(grid[y+1][x], empty) and not isinstance(grid[y][x-1], empty):
-            self.current_direction = self.directions[1]  # topright
-            return False
-        
-        # Bounce on floor (horizontal surface - reverse vertical component)
-        if y >= height-1:
-            self.current_direction = self.directions[0]  # topleft
-            return False
-        
-        # Bounce on left wall of grid (vertical surface - reverse horizontal component)
-        if x <= 0:
-            self.current_direction = self.directions[3]  # bottomright
-            return False
-        
-        # Bounce on object below (horizontal surface) or to the left (vertical surface)
-        if not isinstance(grid[y+1][x], empty):
-            self.current_direction = self.directions[0]  # topleft
-            return False
-        elif not isinstance(grid[y][x-1], empty):
-            self.current_direction = self.directions[3]  # bottomright
-            return False
-        # Move to empty spot
-        else:
-            self.move(grid, y, x, y+1, x-1)
-            return True
-    
-    def check_bottom_right(self, x,y, grid):
-        # Bottomright Corner Bounce on grid
-        if y >= height-1 and x >= width-1:
-            self.current_direction = self.directions[0]  # topleft
-            return False
-        # Corner Bounce on particles
-        if y < height-1 and x < width-1 and not isinstance(grid[y+1][x], empty) and not isinstance(grid[y][x+1], empty):
-            self.current_direction = self.directions[0]  # topleft
-            return False
-        
-        # Bounce on floor (horizontal surface - reverse vertical component)
-        if y >= height-1:
-            self.current_direction = self.directions[1]  # topright
-            return False
-        
-        # Bounce on right wall of grid (vertical surface - reverse horizontal component)
-        if x >= width-1:
-            self.current_direction = self.directions[2]  # bottomleft
-            return False
-        
-        # Bounce on object below (horizontal surface) or to the right (vertical surface)
-        if not isinstance(grid[y+1][x], empty):
-            self.current_direction = self.directions[1]  # topright
-            return False
-        elif not isinstance(grid[y][x+1], empty):
-            self.current_direction = self.directions[2]  # bottomleft
-            return False
-        # Move to empty spot
-        else:
-            self.move(grid, y, x, y+1, x+1)
-            return True
-
-
-
-# Granular particles
-class sand(Granular):
-    locked = False
-    color = (194, 178, 128)  # Sandy beige color
-    color_variance = (20,)
-    def __init__(self):
-        self.conductivity = 0.015
-        self.decay_factor = 0.002
-        # temperature defaults to ambient_temperature +/- 2.5 (use fallback 20 if not defined yet)
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        # color variance: default (same as Particle default)
-        self.color_variance = (20,)
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-class dirt(Granular):
-    locked = False
-    color = (139, 115, 85)  # Earthy brown, lighter and less saturated than mud
-    color_variance = (20,)
-    def __init__(self):
-        self.conductivity = 0.02
-        self.decay_factor = 0.003
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        # color variance: default
-        self.color_variance = (20,)
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-# Liquid particles  
-class water(Liquid):
-    locked = False
-    color = (64, 164, 223)  # Blue color
-    color_variance = (20,)
-    def __init__(self):
-        self.conductivity = 0.03
-        self.decay_factor = 0.005
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-
-        self.evap_temp = 100
-        self.evap_to = steam
-
-        self.solidify_temp = 0
-        self.solidify_to = ice
-        self.solidify_color = colorer(ice.color[0], ice.color[1], ice.color[2], ice.color_variance[0] if hasattr(ice, 'color_variance') else 20)
-
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-class lava(Liquid):
-    locked = False
-    color = (255, 80, 0)
-    color_variance = (45,)
-    def __init__(self):
-        self.conductivity = 0.08
-        self.decay_factor = 0.0035
-        # Base 1125 +/-125 variation
-        self.temperature = 1125 + (random() * 250.0 - 125.0)
-
-        self.solidify_temp = 200 # Celsius
-        self.solidify_to = basalt
-        self.solidify_color = colorer(basalt.color[0], basalt.color[1], basalt.color[2], basalt.color_variance[0] if hasattr(basalt, 'color_variance') else 20)
-        
-        self.viscosity = 2 # Lava moves slower
-        self.viscosity_timer = 0
-
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class acid(Liquid):
-    locked = False
-    color = (100, 255, 100)  # Bright green color
-    color_variance = (20,)
-    def __init__(self):
-        self.conductivity = 0.025
-        self.decay_factor = 0.004
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        self.lifetime = randint(100,200)
-        self.max_lifetime = self.lifetime
-        self.viscosity = 1 # Acid moves slower
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-class corrosive_byproducts(Liquid):
-    locked = True
-    color = (150, 75, 0)  # Brownish color
-    color_variance = (30,)
-    def __init__(self):
-        self.conductivity = 0.02
-        self.decay_factor = 0.004
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        self.lifetime = randint(150,300)
-        self.max_lifetime = self.lifetime
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-# Straight falling particles
-class stone(StraightFalling):
-    locked = False
-    color = (68, 68, 68)  # Gray with less variance
-    color_variance = (10,)
-    def __init__(self):
-        self.conductivity = 0.03
-        self.decay_factor = 0.002
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class mud(StraightFalling):
-    locked = False
-    color = (101, 67, 33)   # Dark brown color
-    color_variance = (20,)
-    def __init__(self):
-        self.conductivity = 0.02
-        self.decay_factor = 0.003
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        self.lifetime = randint(50,100)
-        self.max_lifetime = self.lifetime
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-class wet_sand(StraightFalling):
-    locked = False
-    color = (160, 140, 100)  # Darker sandy beige color
-    color_variance = (20,)
-    def __init__(self):
-        self.conductivity = 0.02
-        self.decay_factor = 0.003
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        self.lifetime = randint(50,100)
-        self.max_lifetime = self.lifetime
-        super().__init__(self.color[0], self.color[1], self.color[2])
-
-
-
-# Light Gaseous particles
-class steam(LightGas):
-    locked = False
-    color = (200, 200, 220)  # Light grayish color
-    color_variance = (15,)
-    def __init__(self):
-        # self.conductivity = 0.05
-        # self.decay_factor = 0.015
-        self.conductivity = 0.004
-        self.decay_factor = 0.025
-        self.condense_to = water
-        self.condense_temp = 100
-
-        self.condensing_framecount = 180 + randint(0,40)
-        self.condense_timer = 0
-
-        # Temperature variation across 100..275 (centered variation)
-        self.temperature = 187.5 + (random() * 175.0 - 87.5)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class fire(LightGas):
-    locked = False
-    color = (255, 120, 30)  # Bright orange, distinct from lava
-    color_variance = (30,)  # More variance than lava for a flickering effect
-    ignore_cooling = True
-    def __init__(self):
-        self.conductivity = 0.05
-        self.decay_factor = 0.015
-        self.temperature = 187.5 + (random() * 175.0 - 87.5) # Temperature variation across 100..275 (centered variation)
-        self.lifetime = randint(60, 120)  # Lifetime in frames
-        self.max_lifetime = self.lifetime
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class cold_fire(LightGas):
-    locked = False
-    color = (60, 120, 255)  # Brighter blue color
-    color_variance = (20,)  # Moderate variance for a flickering effect
-    ignore_cooling = True
-    def __init__(self):
-        self.conductivity = 0.015
-        self.decay_factor = 0.010
-        self.temperature = -150.0 + (random() * 50.0 - 25.0) # Temperature variation across -175..-125 (centered variation)
-        self.lifetime = randint(60, 120)  # Lifetime in frames
-        self.max_lifetime = self.lifetime
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-# Static particles
-class empty(Static):
-    locked = True
-    color = (0, 0, 0)  # Black with no variance
-    color_variance = (0,)
-    def __init__(self):
-        self.conductivity = 0.01
-        self.decay_factor = 0.035
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class basalt(Static):
-    locked = False
-    color = (76, 74, 74)  # Dark blue with minimal variance
-    color_variance = (35,)
-    def __init__(self):
-        self.conductivity = 0.03
-        self.decay_factor = 0.002
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-
-        self.melt_temp = 1000 # Celsius
-        self.melt_to = lava
-        self.melt_color = colorer(lava.color[0], lava.color[1], lava.color[2], lava.color_variance[0] if hasattr(lava, 'color_variance') else 20)
-
-        # color variance: basalt has larger variance
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
+import os
 
-class ice(Static):
-    locked = True
-    color = (180, 220, 255)  # Pale blue-white for ice
-    color_variance = (10,)
-    def __init__(self):
-        # Ice is a poor conductor compared to metals, but better than air
-        self.conductivity = 0.015
-        # Decays slowly toward ambient temperature (melts slowly)
-        self.decay_factor = 0.001
-        # Ice is cold by default, well below room temperature
-        self.temperature = -10.0
-        # Melts at 0°C, turns into water
-        self.melt_temp = 0
-        self.melt_to = water
-        self.melt_color = colorer(water.color[0], water.color[1], water.color[2], water.color_variance[0] if hasattr(water, 'color_variance') else 20)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class tungsten(Static):
-    locked = False
-    color = (180, 180, 200)  # Silvery light gray-blue, still fits tungsten
-    color_variance = (6,)
-    def __init__(self):
-        # Tungsten is an excellent conductor
-        self.conductivity = 0.10
-        # Decays quickly toward ambient temperature (fast heat transfer)
-        self.decay_factor = 0.018
-        # Default temperature is ambient
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        # Tungsten melts at 3422°C, turns into empty (simulate melting away)
-        self.melt_temp = 3422
-        self.melt_to = empty
-        self.melt_color = colorer(empty.color[0], empty.color[1], empty.color[2], empty.color_variance[0] if hasattr(empty, 'color_variance') else 0)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class copper(Static):
-    locked = False
-    color = (184, 115, 51)  # Copper color
-    color_variance = (10,)
-    def __init__(self):
-        # Copper is a very good conductor
-        self.conductivity = 0.15
-        # Decays quickly toward ambient temperature (fast heat transfer)
-        self.decay_factor = 0.015
-        # Default temperature is ambient
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        # Copper melts at 1085°C, turns into empty (simulate melting away)
-        # Corroded copper: more greenish (e.g., verdigris)
-        self.corroded_color = colorer(80, 180, 120, copper.color_variance[0] if hasattr(copper, 'color_variance') else 20)
-        self.melt_temp = 1085
-        self.melt_to = empty
-        self.acidification_tick = 5 + random() * 4  # random float between 5 and 9
-        self.melt_color = colorer(empty.color[0], empty.color[1], empty.color[2], empty.color_variance[0] if hasattr(empty, 'color_variance') else 0)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-class crystal(Static):
-    locked = False
-    color = (40, 40, 40)  # Darker than mid-dark, pure grey, no tint
-    color_variance = (0,)
-    def __init__(self):
-        self.conductivity = 0.025
-        self.decay_factor = 0.002
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        super().__init__(self.color[0], self.color[1], self.color[2], *self.color_variance)
-
-# Bouncy particles
-class bouncy_ball(Bouncy):
-    locked = True
-    color = (255, 0, 255)  # Bright magenta color
-    color_variance = (20,)
-    def __init__(self):
-        self.viscosity_timer = 0
-        self.viscosity =  2
-        # Rubber is a poor conductor, so low conductivity
-        self.conductivity = 0.005
-        # Decays slowly toward ambient temperature (insulator)
-        self.decay_factor = 0.0005
-        # Rubber is usually at room temperature by default
-        self.temperature = globals().get('ambient_temperature', 20) + (random() * 5.0 - 2.5)
-        # Melts at around 180°C, turns into empty (simulate burning/melting away)
-        self.melt_temp = 180
-        self.melt_to = empty
-        self.melt_color = colorer(empty.color[0], empty.color[1], empty.color[2], empty.color_variance[0] if hasattr(empty, 'color_variance') else 0)
-        super().__init__(self.color[0], self.color[1], self.color[2])
+import numpy as np
+import pygame
+from particles import *
+from profiler import Profiler
+from renderer import Renderer, thermogram_colors
+from simulation import Simulation
+import snapshots
+from recording import Recorder
+from runner import SimulationRunner
 
 width, height=100,100
-grid = [[empty() for _ in range(width)] for _ in range(height)]
+use_array_engine = False # If true, the world lives in NumPy arrays (array_engine.py) instead of the grid of Particle objects
+all_neighbours_temp = True # If true, particles will consider all 8 neighbours for thermal conduction, not just orthogonal ones
+thermal_backend = "numpy" # "numpy" conducts heat for the whole grid at once, "loop" goes cell by cell
+# Set to a file name to play in a world_width x world_height world kept in that file, of which only the pages
+# around the view are simulated (paging.py). The file is made on the first run and picked up again after that.
+paged_world = None
+world_width, world_height = 4096, 4096
+if paged_world:
+    from paging import PagedWorld
+    if os.path.exists(paged_world):
+        sim = PagedWorld(paged_world, all_neighbours_temp=all_neighbours_temp)
+    else:
+        sim = PagedWorld(paged_world, world_width, world_height, all_neighbours_temp=all_neighbours_temp)
+elif use_array_engine:
+    from array_engine import ArraySimulation
+    sim = ArraySimulation(width, height, all_neighbours_temp=all_neighbours_temp)
+else:
+    sim = Simulation(width, height, all_neighbours_temp=all_neighbours_temp, thermal_backend=thermal_backend)
+recorder = Recorder(sim, enabled=not paged_world) # Everything placed goes through here, so the session can be replayed (recording.py)
+record_path = None # Set to a file name to save the recording there on quit
+# The simulation steps on its own thread, and everything that changes the world is handed to it with runner.call()
+runner = SimulationRunner(sim)
 cell_size=10
 sidebar_width = 150
+grid_width, grid_height = width * cell_size, height * cell_size # The grid area in pixels, it stays the same when zooming
+ZOOM_LEVELS = (1, 2, 4, 5, 10, 20, 40) # Cell sizes the mouse wheel steps through
+view_x, view_y = 0, 0 # World cell at the top left of the grid area, the arrow keys move it
+view_width, view_height = grid_width // cell_size, grid_height // cell_size # Cells the grid area shows
 
 
 selected_particle = sand  # Default selection
 pygame.init()
-screen = pygame.display.set_mode((width * cell_size + sidebar_width, height * cell_size))
+screen = pygame.display.set_mode((grid_width + sidebar_width, grid_height))
+renderer = Renderer(screen, view_width, view_height, cell_size)
+sidebar_rect = pygame.Rect(grid_width, 0, sidebar_width, grid_height)
 clock = pygame.time.Clock()
 running = True
 paused = False
-
-def draw_grid():
-    for y in range(height):
-        for x in range(width):
-            cell = grid[y][x]
-            pygame.draw.rect(
-                screen,
-                cell.color,
-                (x * cell_size, y * cell_size, cell_size, cell_size)
-            )
-    pygame.display.flip()
-
-def get_all_subclasses(cls):
-    subclasses = []
-    for subclass in cls.__subclasses__():
-        if subclass.locked:
-            continue
-        subclasses.append(subclass)
-        subclasses.extend(get_all_subclasses(subclass))
-    return subclasses
-
-def get_particle_colors():
-    color_dict = {}
-    for subclass in get_all_subclasses(Particle):
-        # only include "end" classes, not base ones like Granular
-        if not subclass.__subclasses__():
-            instance = subclass()  # create one so we can read its base color
-            color_dict[subclass] = instance.base_color
-            # Store the variance as a tuple (red, green, blue)
-            # Try to get the variance values from the constructor args or attributes
-            # Prefer the new unified `color_variance` attribute when present
-            red = getattr(instance, 'color_variance_red', None)
-            green = getattr(instance, 'color_variance_green', None)
-            blue = getattr(instance, 'color_variance_blue', None)
-            if hasattr(instance, 'color_variance'):
-                cv = instance.color_variance
-                if isinstance(cv, (list, tuple)):
-                    if len(cv) == 1:
-                        red = cv[0]
-                        green = cv[0]
-                        blue = cv[0]
-                    elif len(cv) == 3:
-                        red, green, blue = cv
-                    else:
-                        # Fallback: use first value for all channels
-                        red = cv[0]
-                        green = red
-                        blue = red
-                else:
-                    # single numeric value
-                    red = cv
-                    green = cv
-                    blue = cv
-            # Final fallbacks to maintain original behavior
-            if red is None:
-                red = 20
-            if green is None:
-                green = red
-            if blue is None:
-                blue = red
-            color_dict[f"{subclass.__name__}_var"] = (red, green, blue)
-    return color_dict
-
-PARTICLE_COLORS = get_particle_colors()
-
-
-
-
-particle_list = [cls for cls in get_all_subclasses(Particle)
-                 if not cls.__subclasses__()]
-
-for y in range(0,47):
-    for x in range(0,50):
-        grid[y][x] = crystal()
-
-def handle_particle_specials(x, y, grid):
-    target=grid[y][x]
-
-    #! Handle condensation
-    #! 3 cells need to surround the cell if that cell wants to condense, lowers on lower temperatures. 
-    if hasattr(target, 'condense_to'):
-        if target.temperature <= target.condense_temp:
-            target.condense_timer += 1
-            if target.condense_timer >= target.condensing_framecount:
-                # Edge checks for grid boundaries
-                orthogonal_neighbours = 0
-                steam_neighbours = []
-                for yi in range(-1,2):
-                    if orthogonal_neighbours == 3:
-                            break
-                    for xi in range(-1,2):
-                        if orthogonal_neighbours == 3:
-                            break
-                        
-                        # Wall checks
-                        if y+yi < 0 or y+yi >= height or x+xi < 0 or x+xi >= width:
-                            continue
-                        if yi != xi:
-                            if isinstance(grid[y+yi][x+xi], steam): 
-                                orthogonal_neighbours+=1
-                                steam_neighbours.append((y+yi, x+xi))
-
-                if orthogonal_neighbours == 3:
-                    neighbour_1 = grid[steam_neighbours[0][0]][steam_neighbours[0][1]]
-                    neighbour_2 = grid[steam_neighbours[1][0]][steam_neighbours[1][1]]
-                    neighbour_3 = grid[steam_neighbours[2][0]][steam_neighbours[2][1]]
-                    grid[y][x] = target.condense_to()
-                    grid[y][x].temperature = target.temperature
-                    grid[steam_neighbours[0][0]][steam_neighbours[0][1]] = empty()
-                    grid[steam_neighbours[0][0]][steam_neighbours[0][1]].temperature = neighbour_1.temperature
-                    grid[steam_neighbours[1][0]][steam_neighbours[1][1]] = empty()
-                    grid[steam_neighbours[1][0]][steam_neighbours[1][1]].temperature = neighbour_2.temperature
-                    grid[steam_neighbours[2][0]][steam_neighbours[2][1]] = empty()
-                    grid[steam_neighbours[2][0]][steam_neighbours[2][1]].temperature = neighbour_3.temperature
-
-    
-    #! Fire>Dissapear
-    if isinstance(target, ( fire, cold_fire )):
-        grid[y][x].lifetime -= 1
-        if grid[y][x].lifetime <= 0:
-            grid[y][x] = empty()
-
-    #! Handle solidification
-    #! Color transitions will apply.
-    if hasattr(target, 'solidify_to'):
-        p = grid[y][x]
-
-        # use the particle's original spawned color for the transition
-        original_hsv = rgb_to_hsv(p.spawn_color[0] / 255.0,
-                                  p.spawn_color[1] / 255.0,
-                                  p.spawn_color[2] / 255.0)
-        new_hsv = rgb_to_hsv(p.solidify_color[0] / 255.0,
-                                p.solidify_color[1] / 255.0,
-                                p.solidify_color[2] / 255.0)
-
-        # fixed temp range: hot->cold
-        # Use the correct temperature range for solidifying (from original temp down to solidify_temp)
-        if not hasattr(p, 'original_temp'):
-            p.original_temp = p.temperature  # store the original temp at spawn
-        temp_range = max(1.0, p.original_temp - p.solidify_temp)
-        # Progress should be 0 when hot, 1 when cold (so invert)
-        temp_progress = 1.0 - ((p.temperature - p.solidify_temp) / temp_range)
-        temp_progress = max(0.0, min(1.0, temp_progress))
-
-        # interpolate from the original (spawn) HSV -> basalt HSV
-        new_h = original_hsv[0] + (new_hsv[0] - original_hsv[0]) * temp_progress
-        new_s = original_hsv[1] + (new_hsv[1] - original_hsv[1]) * temp_progress
-        new_v = original_hsv[2] + (new_hsv[2] - original_hsv[2]) * temp_progress
-
-        new_rgb = hsv_to_rgb(new_h, new_s, new_v)
-        # assign ints and clamp
-        p.color = (int(max(0, min(255, new_rgb[0] * 255))),
-                   int(max(0, min(255, new_rgb[1] * 255))),
-                   int(max(0, min(255, new_rgb[2] * 255))))
-
-        if p.temperature <= p.solidify_temp:
-            grid[y][x] = p.solidify_to()
-            grid[y][x].temperature = p.temperature
-            grid[y][x].color = p.solidify_color
-    
-
-    #! Handle melting
-    #! Color transitions will apply
-    if hasattr(target, 'melt_to'):
-        p = grid[y][x]
-
-        # use the particle's original spawned color for the transition
-        original_hsv = rgb_to_hsv(p.spawn_color[0] / 255.0,
-                                  p.spawn_color[1] / 255.0,
-                                  p.spawn_color[2] / 255.0)
-        new_hsv = rgb_to_hsv(p.melt_color[0] / 255.0,
-                                p.melt_color[1] / 255.0,
-                                p.melt_color[2] / 255.0)
-
-        if not hasattr(p, 'original_temp'):
-            p.original_temp = p.temperature  # store the original temp at spawn
-        temp_range = max(1.0, p.melt_temp - p.original_temp)
-        # Progress should be 0 when cold (original), 1 when hot (melted)
-        temp_progress = (p.temperature - p.original_temp) / temp_range
-        temp_progress = max(0.0, min(1.0, temp_progress))
-
-        # interpolate from the original (spawn) HSV -> basalt HSV
-        new_h = original_hsv[0] + (new_hsv[0] - original_hsv[0]) * temp_progress
-        new_s = original_hsv[1] + (new_hsv[1] - original_hsv[1]) * temp_progress
-        new_v = original_hsv[2] + (new_hsv[2] - original_hsv[2]) * temp_progress
-
-        new_rgb = hsv_to_rgb(new_h, new_s, new_v)
-        # assign ints and clamp
-        p.color = (int(max(0, min(255, new_rgb[0] * 255))),
-                   int(max(0, min(255, new_rgb[1] * 255))),
-                   int(max(0, min(255, new_rgb[2] * 255))))
-
-        if p.temperature >= p.melt_temp:
-            grid[y][x] = p.melt_to()
-            grid[y][x].temperature = p.temperature
-            grid[y][x].color = p.melt_color
-
-    #! Handle evaporation
-    if hasattr(target, 'evap_to'):
-        if target.temperature >= target.evap_temp:
-            grid[y][x] = target.evap_to()
-            grid[y][x].temperature = target.temperature
-
-    #! Mud>Dirt
-    if isinstance(target, mud):
-        p = grid[y][x]
-        p.lifetime -= 1
-        red_drying_increment = ((PARTICLE_COLORS[dirt][0] - PARTICLE_COLORS[mud][0])/p.max_lifetime)
-        green_drying_increment = ((PARTICLE_COLORS[dirt][1] - PARTICLE_COLORS[mud][1])/p.max_lifetime)
-        blue_drying_increment = ((PARTICLE_COLORS[dirt][2] - PARTICLE_COLORS[mud][2])/p.max_lifetime)
-        new_r = max(0, min(255, p.color[0] + red_drying_increment))
-        new_g = max(0, min(255, p.color[1] + green_drying_increment))
-        new_b = max(0, min(255, p.color[2] + blue_drying_increment))
-        p.color = (new_r, new_g, new_b)
-
-        if p.lifetime <= 0:
-            grid[y][x] = dirt()
-    
-    if isinstance(target, wet_sand):
-        p = grid[y][x]
-        p.lifetime -= 1
-        red_drying_increment = ((PARTICLE_COLORS[sand][0] - PARTICLE_COLORS[wet_sand][0])/p.max_lifetime)
-        green_drying_increment = ((PARTICLE_COLORS[sand][1] - PARTICLE_COLORS[wet_sand][1])/p.max_lifetime)
-        blue_drying_increment = ((PARTICLE_COLORS[sand][2] - PARTICLE_COLORS[wet_sand][2])/p.max_lifetime)
-        new_r = max(0, min(255, p.color[0] + red_drying_increment))
-        new_g = max(0, min(255, p.color[1] + green_drying_increment))
-        new_b = max(0, min(255, p.color[2] + blue_drying_increment))
-        p.color = (new_r, new_g, new_b)
-
-        if p.lifetime <= 0:
-            grid[y][x] = sand()
-
-    #! Acidic Corrosion
-    if hasattr(target, 'corroded_color'):
-        # Check for acid neighbors, accounting for grid edges
-        acid_neighbor = False
-        if y > 0 and isinstance(grid[y-1][x], acid):
-            acid_neighbor = True
-        if y < height - 1 and isinstance(grid[y+1][x], acid):
-            acid_neighbor = True
-        if x < width - 1 and isinstance(grid[y][x+1], acid):
-            acid_neighbor = True
-        if x > 0 and isinstance(grid[y][x-1], acid):
-            acid_neighbor = True
-        if acid_neighbor:
-            # use the particle's original spawned color for the transition
-            original_hsv = rgb_to_hsv(target.spawn_color[0] / 255.0,
-                                    target.spawn_color[1] / 255.0,
-                                    target.spawn_color[2] / 255.0)
-            new_hsv = rgb_to_hsv(acid.color[0] / 255.0,
-                                    acid.color[1] / 255.0,
-                                    acid.color[2] / 255.0)
-
-            if not hasattr(target, 'acidification_progress'):
-                target.acidification_progress = 0
-            if not hasattr(target, 'acidification_tick'):
-                target.acidification_tick = 2
-            target.acidification_progress += target.acidification_tick
-
-            # interpolate from the original (spawn) HSV -> corroded HSV
-            new_h = original_hsv[0] + (new_hsv[0] - original_hsv[0]) * target.acidification_progress/100
-            new_s = original_hsv[1] + (new_hsv[1] - original_hsv[1]) * target.acidification_progress/100
-            new_v = original_hsv[2] + (new_hsv[2] - original_hsv[2]) * target.acidification_progress/100
-
-            new_rgb = hsv_to_rgb(new_h, new_s, new_v)
-            # assign ints and clamp
-            target.color = (int(max(0, min(255, new_rgb[0] * 255))),
-                    int(max(0, min(255, new_rgb[1] * 255))),
-                    int(max(0, min(255, new_rgb[2] * 255))))
-            grid[y][x].color = target.color
-            if target.acidification_progress >= 100:
-                if random() < 0.8:
-                    grid[y][x] = acid()
-                    grid[y][x].temperature = target.temperature
-                    heat_release = 10 + random() * 10  # 10–20 °C bump
-                    grid[y][x].temperature = target.temperature + heat_release
-                else:
-                    grid[y][x] = corrosive_byproducts()
-                    grid[y][x].color = target.corroded_color
-                    grid[y][x].temperature = target.temperature
-                    heat_release = 10 + random() * 10  # 10–20 °C bump
-                    grid[y][x].temperature = target.temperature + heat_release
-
-    #! Crystal color spread
-    if isinstance(target, crystal):
-        r_sum = g_sum = b_sum = 0
-        non_empty = 0
-        for i in range(-1,2):
-            for j in range(-1,2):
-                nx, ny = x+i, y+j
-                if (i == 0 and j == 0) or not (0 <= nx < width and 0 <= ny < height):
-                    continue
-                cell = grid[ny][nx]
-                if isinstance(cell, empty):
-                    continue
-                else:
-                    non_empty += 1
-                r_sum += cell.color[0]
-                g_sum += cell.color[1]
-                b_sum += cell.color[2]
-        if non_empty != 0:
-            avg_hsv = rgb_to_hsv(r_sum/non_empty, g_sum/non_empty, b_sum/non_empty)
-            dimmed_rgb = hsv_to_rgb(avg_hsv[0], avg_hsv[1], avg_hsv[2]*0.96)
-            
-            grid[y][x].color = dimmed_rgb
-
-
-    
+output_dir = os.path.join(os.path.expanduser("~"), ".powder") # Where the files the game writes go, not the repo
+os.makedirs(output_dir, exist_ok=True)
+show_profiler = False # F3 toggles the per-pass timing overlay, F4 writes the recorded timings to profile_path
+profile_path = os.path.join(output_dir, "profile.csv")
+ui_profiler = Profiler() # Drawing runs apart from the simulation, so it gets a profiler of its own
+snapshot_path = os.path.join(output_dir, "world.powder") # F5 saves the world here, F9 loads it back
+profiler_font = pygame.font.SysFont(None, 18)
+
+def in_view(array, origin):
+    # The part of a frame's array the view shows, zeros (black) where that's outside of the array
+    ox, oy = origin
+    out = np.zeros((view_height, view_width) + array.shape[2:], array.dtype)
+    x0, y0 = max(view_x, ox), max(view_y, oy)
+    x1, y1 = min(view_x + view_width, ox + array.shape[1]), min(view_y + view_height, oy + array.shape[0])
+    if x0 < x1 and y0 < y1:
+        out[y0 - view_y:y1 - view_y, x0 - view_x:x1 - view_x] = array[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+    return out
+
+def draw_grid(state):
+    # Draws the latest finished frame and returns the screen rects that changed, they get pushed to the display with the sidebar
+    colors = in_view(state.colors, state.origin)
+    if thermogram and state.temperatures is not None:
+        colors = thermogram_colors(colors, in_view(state.temperatures, state.origin), in_view(state.materials, state.origin))
+    return renderer.draw(colors)
+
+def move_view(x, y):
+    # Keeps the view on the world and, in a paged world, has the simulation thread page in what it shows
+    global view_x, view_y
+    x, y = max(0, min(x, sim.width - view_width)), max(0, min(y, sim.height - view_height))
+    if (x, y) != (view_x, view_y):
+        renderer.invalidate() # Every cell on screen shows another one now
+    view_x, view_y = x, y
+    if hasattr(sim, "look_at"):
+        runner.call(sim.look_at, view_x, view_y, view_x + view_width, view_y + view_height)
+
+def zoom(steps, mouse_x, mouse_y):
+    # Steps through ZOOM_LEVELS, keeping the cell under the mouse where it is
+    global cell_size, view_width, view_height, renderer
+    level = max(0, min(len(ZOOM_LEVELS) - 1, ZOOM_LEVELS.index(cell_size) + steps))
+    cell_x, cell_y = view_x + mouse_x // cell_size, view_y + mouse_y // cell_size
+    cell_size = ZOOM_LEVELS[level]
+    view_width, view_height = grid_width // cell_size, grid_height // cell_size
+    renderer = Renderer(screen, view_width, view_height, cell_size)
+    screen.fill((0, 0, 0), (0, 0, grid_width, grid_height))
+    pygame.display.update(pygame.Rect(0, 0, grid_width, grid_height))
+    move_view(cell_x - mouse_x // cell_size, cell_y - mouse_y // cell_size)
+
+def pan_view():
+    # Arrow keys move the view by a twentieth of it per frame
+    keys = pygame.key.get_pressed()
+    dx = keys[pygame.K_RIGHT] - keys[pygame.K_LEFT]
+    dy = keys[pygame.K_DOWN] - keys[pygame.K_UP]
+    if (dx or dy) and not temperature_input_active:
+        move_view(view_x + dx * max(1, view_width // 20), view_y + dy * max(1, view_height // 20))
+
+
+move_view(0, 0)
+if sim.frame == 0:
+    recorder.fill(0, 0, 50, 47, crystal)
 
 def draw_sidebar():
-    sidebar_x = width * cell_size
+    sidebar_x = grid_width
     particle_types = particle_list
 
     # Draw sidebar background
-    pygame.draw.rect(screen, (50, 50, 50), (sidebar_x, 0, sidebar_width, height * cell_size))
+    pygame.draw.rect(screen, (50, 50, 50), (sidebar_x, 0, sidebar_width, grid_height))
     
     # Draw particle options
     font = pygame.font.SysFont(None, 24)
@@ -1282,9 +157,13 @@ def draw_sidebar():
         # Center the text inside the color box
         name_rect = name_surf.get_rect(center=box_rect.center)
         screen.blit(name_surf, name_rect)
+    # Simulation speed and the steps per second it actually reaches (T toggles turbo, + and - change the speed)
+    mode = "turbo" if runner.turbo else f"x{runner.speed:g}"
+    speed_surf = font_small.render(f"{runner.achieved:.0f} steps/s  {mode}", True, (255, 255, 255))
+    screen.blit(speed_surf, (sidebar_x + 10, grid_height - 195))
     # Draw temperature input box above the pause button
     global paused, temperature_input_active, temperature_input_text, thermogram
-    input_box_rect = pygame.Rect(sidebar_x + 10, height * cell_size - 110, sidebar_width - 20, 40)
+    input_box_rect = pygame.Rect(sidebar_x + 10, grid_height - 110, sidebar_width - 20, 40)
     font = pygame.font.SysFont(None, 24)
     # label
     label_surf = font.render("Ambient Temp:", True, (255, 255, 255))
@@ -1304,7 +183,7 @@ def draw_sidebar():
     screen.blit(text_surf, text_rect)
 
     # Draw thermogram toggle button
-    thermogram_button_rect = pygame.Rect(sidebar_x + 10, height * cell_size - 170, sidebar_width - 20, 40)
+    thermogram_button_rect = pygame.Rect(sidebar_x + 10, grid_height - 170, sidebar_width - 20, 40)
     pygame.draw.rect(screen, (100, 100, 100), thermogram_button_rect)
     font_big = pygame.font.SysFont(None, 32)
     therm_text = "Thermogram: On" if thermogram else "Thermogram: Off"
@@ -1313,7 +192,7 @@ def draw_sidebar():
     screen.blit(therm_surface, therm_rect)
 
     # Draw pause button
-    pause_button_rect = pygame.Rect(sidebar_x + 10, height * cell_size - 60, sidebar_width - 20, 40)
+    pause_button_rect = pygame.Rect(sidebar_x + 10, grid_height - 60, sidebar_width - 20, 40)
     pygame.draw.rect(screen, (100, 100, 100), pause_button_rect)
     pause_text = "Pause" if not paused else "Resume"
     text_surface = font_big.render(pause_text, True, (255, 255, 255))
@@ -1327,245 +206,82 @@ def draw_sidebar():
         # toggle thermogram
         thermogram = not thermogram
         pygame.time.wait(200)  # Debounce click
-        # If disabling thermogram, force all empty instances to black
-        if not thermogram:
-            for yi in range(height):
-                for xi in range(width):
-                    if isinstance(grid[yi][xi], empty):
-                        grid[yi][xi].color = (0, 0, 0)
     if mouse_pressed[0] and pause_button_rect.collidepoint(mouse_x, mouse_y):
         paused = not paused
         pygame.time.wait(200)  # Debounce click
 
-frame_delay = 0
-simulation_speed = 1
-ambient_temperature = 10
+def draw_profiler(stats, counts):
+    # Rolling per-pass timings of the simulation (handed over by its thread) and of drawing, above the sidebar buttons,
+    # then its counters per frame
+    stats = dict(stats or {}, **{name: s for name, s in ui_profiler.summary().items() if name != "total"})
+    lines = [("ms", "avg", "p95")] + [(name, f"{s[0]*1000:.1f}", f"{s[2]*1000:.1f}") for name, s in stats.items()]
+    lines += [(name.replace("_", " "), f"{value:.0f}", "") for name, value in (counts or {}).items()]
+    panel = pygame.Rect(grid_width, grid_height - 215 - len(lines) * 16, sidebar_width, len(lines) * 16 + 8)
+    pygame.draw.rect(screen, (20, 20, 20), panel)
+    for i, (name, avg, p95) in enumerate(lines):
+        y_pos = panel.y + 4 + i * 16
+        screen.blit(profiler_font.render(name, True, (255, 255, 255)), (panel.x + 6, y_pos))
+        screen.blit(profiler_font.render(avg, True, (255, 255, 255)), (panel.x + 92, y_pos))
+        screen.blit(profiler_font.render(p95, True, (255, 255, 255)), (panel.x + 122, y_pos))
+
 temperature_decay_factor = 0.005
 # UI state for the temperature input box in the sidebar
 temperature_input_active = False
-temperature_input_text = str(ambient_temperature)
+temperature_input_text = str(sim.ambient_temperature)
 
-r_hue = 0/360.0
-g_hue = 120/360.0
-b_hue = 240/360.0
 thermogram = False
-all_neighbours_temp = True # If true, particles will consider all 8 neighbours for thermal conduction, not just orthogonal ones
-def update_frame():
-    # First pass: Movement
-    for y in range(height-1, -1, -1):  # Bottom to top
-        for x in range(width):
-            cell = grid[y][x]
-           
-            # Check if the cell has a check_below method and hasn't moved
-            if hasattr(cell, 'check_movement') and hasattr(cell, 'has_moved') and not cell.has_moved:
-                
-                # Slower moving items all fall under the attribute 'viscosity'
-                if hasattr(cell, 'viscosity') and not hasattr(cell, 'viscosity_timer'):
-                    cell.viscosity_timer = 0
-                if hasattr(cell, 'viscosity_timer') and not hasattr(cell, 'viscosity'):
-                    raise LookupError("Viscosity timer found without matching visocisity attribute")
-                
-                if hasattr(cell, 'viscosity'):
-                    cell.viscosity_timer += 1
-                    if cell.viscosity_timer <= cell.viscosity:
-                        continue
-                    if cell.viscosity_timer > cell.viscosity:
-                        cell.viscosity_timer = 0
-                if cell.check_movement(x, y, grid):
-                    cell.has_moved = True
-    
-    # Second pass: Check for interactions
-    for y in range(height):
-        for x in range(width):
-            cell = grid[y][x]
-
-            handle_particle_specials(x, y, grid)
-            #^ Example: Aging steam particles eventually turn into water
-
-            if not isinstance(cell, empty):
-                check_interactions(x, y, grid)
-    
-    # Third pass: Reset has_moved flag for next frame
-    for y in range(height):
-        for x in range(width):
-            cell = grid[y][x]
-            if hasattr(cell, 'has_moved'):
-                cell.has_moved = False
-    # Delay frame
-    pygame.time.delay(frame_delay)
-
-    # Fourth pass: Thermal dynamics
-    for y in range(height):
-        for x in range(width):
-            cell=grid[y][x]
-            if hasattr(cell, 'ignore_cooling') and cell.ignore_cooling:
-                cell.new_temperature = cell.temperature
-                continue
-            conduction = 0
-            ambient_decay = cell.temperature + (ambient_temperature - cell.temperature) * cell.decay_factor
-
-            if y > 0:
-                upper = grid[y-1][x]
-                conduction += (upper.temperature - cell.temperature) * ((upper.conductivity + cell.conductivity)/2)
-            if y < height-1:
-                lower = grid[y+1][x]
-                conduction += (lower.temperature - cell.temperature) * ((lower.conductivity + cell.conductivity)/2)
-            if x > 0:
-                left = grid[y][x-1]
-                conduction += (left.temperature - cell.temperature) * ((left.conductivity + cell.conductivity)/2)
-            if x < width-1:
-                right = grid[y][x+1]
-                conduction += (right.temperature - cell.temperature) * ((right.conductivity + cell.conductivity)/2)
-            if all_neighbours_temp:
-                if x > 0 and y > 0:
-                    upper_left = grid[y-1][x-1]
-                    conduction += (upper_left.temperature - cell.temperature) * ((upper_left.conductivity + cell.conductivity)/2) * 0.7071
-                if x < width-1 and y > 0:
-                    upper_right = grid[y-1][x+1]
-                    conduction += (upper_right.temperature - cell.temperature) * ((upper_right.conductivity + cell.conductivity)/2) * 0.7071
-                if x > 0 and y < height-1:
-                    lower_left = grid[y+1][x-1]
-                    conduction += (lower_left.temperature - cell.temperature) * ((lower_left.conductivity + cell.conductivity)/2) * 0.7071
-                if x < width-1 and y < height-1:
-                    lower_right = grid[y+1][x+1]
-                    conduction += (lower_right.temperature - cell.temperature) * ((lower_right.conductivity + cell.conductivity)/2) * 0.7071
-            cell.new_temperature = ambient_decay + conduction
-    for y in range(height):
-        for x in range(width):
-            cell = grid[y][x]
-            grid[y][x].temperature = cell.new_temperature
-            grid[y][x].new_temperature = 0
-
-    # Fifth pass:
-    #! Handle background thermogram
-    if thermogram == True:
-        all_temperatures=[]
-        #^ Gather temp data
-        for yi in range(height):
-            for xi in range(width):
-                all_temperatures.append(grid[yi][xi].temperature)
-        min_temp = min(all_temperatures)
-        max_temp = max(all_temperatures)
-        avg_temp = sum(all_temperatures)/len(all_temperatures)
-        #^ Clamp extremes to prevent skewing
-        if max_temp < 100:
-            max_temp = 50
-        if min_temp > 0:
-            min_temp = 0
-        #^ Normalize and display temperature
-        if thermogram == True:
-            for yi in range(height):
-                for xi in range(width):
-                    cell = grid[yi][xi]
-                    if isinstance(cell, empty):
-                        # Prevent division by zero
-                        if cell.temperature < avg_temp:
-                            denom = (avg_temp - min_temp)
-                            n_temp = (cell.temperature - min_temp) / denom if denom != 0 else 0
-                            new_colors = hsv_to_rgb((b_hue + n_temp * (g_hue - b_hue)), 1, .4)
-                        else:
-                            denom = (max_temp - avg_temp)
-                            n_temp = (cell.temperature - avg_temp) / denom if denom != 0 else 0
-                            new_colors = hsv_to_rgb((g_hue + n_temp * (r_hue - g_hue)), 1, .4)
-                        grid[yi][xi].color = (new_colors[0]*255, new_colors[1]*255, new_colors[2]*255)
-                    else:
-                        continue
-
-
-def check_interactions(x, y, grid):
-    """Check for interactions with adjacent particles"""
-    current_particle = grid[y][x]
-
-    directions = [
-        (0, 1),   # below
-        (0, -1),  # above
-        (1, 0),   # right
-        (-1, 0),  # left
-        (1, 1),   # bottom-right
-        (-1, 1),  # bottom-left
-        (1, -1),  # top-right
-        (-1, -1)  # top-left
-    ]
-    
-    for dx, dy in directions:
-        new_x, new_y = x + dx, y + dy
-        
-        # Bounds checking
-        if 0 <= new_x < width and 0 <= new_y < height:
-            neighbor_particle = grid[new_y][new_x]
-            
-            # Check for interaction
-            interaction_func = get_interaction(current_particle, neighbor_particle)
-            if interaction_func:
-                interaction_func(new_x, new_y, x, y, grid)
-                return  # Only process one interaction per particle per frame
-
-def sa_wa_ws(new_x, new_y, old_x, old_y, grid):
-        grid[new_y][new_x] = wet_sand()
-        grid[old_y][old_x] = empty()
-
-def di_wa_mu(new_x, new_y, old_x, old_y, grid):
-        grid[new_y][new_x] = mud()
-        grid[old_y][old_x] = empty()
-
-# def wa_la_ba(new_x, new_y, old_x, old_y, grid):
-#         grid[new_y][new_x] = basalt()
-#         r=random()
-#         if r > .9:
-#             print(r)
-#             grid[old_y][old_x] = steam()
-
-def la_st_la(new_x, new_y, old_x, old_y, grid):
-        grid[new_y][new_x] = lava()
-        grid[old_y][old_x] = lava()
-
-INTERACTIONS = {
-    "water+sand": sa_wa_ws, # Wet Sand
-    "sand+water": sa_wa_ws, #
-    "dirt+water": di_wa_mu, # Mud
-    "water+dirt": di_wa_mu, #
-    # "lava+water": wa_la_ba, # Basalt
-    # "water+lava": wa_la_ba, #
-    "lava+stone": la_st_la, # Lava-fy
-    "stone+lava": la_st_la, #
-}
-
-def get_interaction(particle1, particle2):
-    key = f"{particle1.__class__.__name__}+{particle2.__class__.__name__}"
-    return INTERACTIONS.get(key)
-    
 
+def place_keeping_temperature(x, y, material):
+    # Runs on the simulation thread: the new particle takes over the temperature of the cell
+    recorder.place(x, y, material, sim.temperature_at(x, y))
+
+def set_profiling(enabled):
+    sim.profiler.enabled = enabled
+    sim.profiler.clear()
+
+def load_world():
+    # Runs on the simulation thread, between two steps
+    global sim, temperature_input_text
+    try:
+        loaded = snapshots.load(snapshot_path)
+    except (OSError, ValueError) as e:
+        print(f"Couldn't load {snapshot_path}: {e}")
+        return
+    sim.close()
+    sim = loaded
+    sim.profiler.enabled = show_profiler
+    recorder.stop() # The loaded world isn't in the recording, it ends here
+    recorder.sim = sim
+    runner.sim = sim
+    temperature_input_text = str(sim.ambient_temperature)
+    move_view(view_x, view_y)
 
 def event_handler():
-    global selected_particle, running
-    global temperature_input_active, temperature_input_text, ambient_temperature
+    global selected_particle, running, show_profiler
+    global temperature_input_active, temperature_input_text
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
-        # if event.type == pygame.KEYDOWN:
-        #     if event.key == pygame.K_EQUALS:  # + key
-        #         simulation_speed = min(5, simulation_speed + 0.5)
-        #     elif event.key == pygame.K_MINUS:  # - key
-        #         simulation_speed = max(0.1, simulation_speed - 0.5)
-        if event.type == pygame.MOUSEBUTTONDOWN:
+        if event.type == pygame.MOUSEWHEEL:
             mouse_x, mouse_y = pygame.mouse.get_pos()
-            if mouse_x < width * cell_size:  # Click in grid area
-                grid_x = mouse_x // cell_size
-                grid_y = mouse_y // cell_size
-                cell=grid[grid_y][grid_x]
-                if grid_x < width and grid_y < height:
+            if mouse_x < grid_width:
+                zoom(event.y, mouse_x, mouse_y)
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button not in (4, 5): # 4 and 5 are the wheel
+            mouse_x, mouse_y = pygame.mouse.get_pos()
+            if mouse_x < grid_width:  # Click in grid area
+                grid_x = view_x + mouse_x // cell_size
+                grid_y = view_y + mouse_y // cell_size
+                if grid_x < sim.width and grid_y < sim.height:
                     if event.button == 1:  # Left click
-                        grid[grid_y][grid_x] = selected_particle()
-                        grid[grid_y][grid_x].temperature = cell.temperature
+                        runner.call(place_keeping_temperature, grid_x, grid_y, selected_particle)
                     elif event.button == 3:  # Right click
-                        grid[grid_y][grid_x] = empty()
-                        grid[grid_y][grid_x].temperature = cell.temperature
+                        runner.call(place_keeping_temperature, grid_x, grid_y, empty)
             else:  # Click in sidebar
-                sidebar_x = width * cell_size
+                sidebar_x = grid_width
                 # check if clicked the temperature input box
-                input_box_rect = pygame.Rect(sidebar_x + 10, height * cell_size - 110, sidebar_width - 20, 40)
-                pause_button_rect = pygame.Rect(sidebar_x + 10, height * cell_size - 60, sidebar_width - 20, 40)
+                input_box_rect = pygame.Rect(sidebar_x + 10, grid_height - 110, sidebar_width - 20, 40)
+                pause_button_rect = pygame.Rect(sidebar_x + 10, grid_height - 60, sidebar_width - 20, 40)
 
                 if input_box_rect.collidepoint(mouse_x, mouse_y):
                     # focus the input box for typing
@@ -1589,16 +305,16 @@ def event_handler():
                     # try to parse and apply
                     try:
                         new_temp = float(temperature_input_text)
-                        ambient_temperature = new_temp
+                        runner.call(recorder.set_ambient_temperature, new_temp)
                         # normalize displayed text
-                        temperature_input_text = str(ambient_temperature)
+                        temperature_input_text = str(new_temp)
                     except Exception:
                         # invalid input: reset to current room temperature
-                        temperature_input_text = str(ambient_temperature)
+                        temperature_input_text = str(sim.ambient_temperature)
                     temperature_input_active = False
                 elif event.key == pygame.K_ESCAPE:
                     # cancel editing
-                    temperature_input_text = str(ambient_temperature)
+                    temperature_input_text = str(sim.ambient_temperature)
                     temperature_input_active = False
                 elif event.key == pygame.K_BACKSPACE:
                     temperature_input_text = temperature_input_text[:-1]
@@ -1607,36 +323,66 @@ def event_handler():
                     ch = event.unicode
                     if ch and ch in '0123456789.-':
                         temperature_input_text += ch
+            elif event.key == pygame.K_F3:
+                show_profiler = not show_profiler
+                runner.call(set_profiling, show_profiler)
+                ui_profiler.enabled = show_profiler
+                ui_profiler.clear()
+            elif event.key == pygame.K_F4:
+                runner.call(lambda: sim.profiler.to_csv(profile_path))
+            elif event.key == pygame.K_F5:
+                # A paged world is saved to its own file
+                runner.call(sim.flush if paged_world else lambda: snapshots.save(sim, snapshot_path))
+            elif event.key == pygame.K_F9 and not paged_world:
+                runner.call(load_world)
+            elif event.key == pygame.K_t:
+                runner.turbo = not runner.turbo
+            elif event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                runner.change_speed(2)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                runner.change_speed(0.5)
 
 def update_grid():
     mouse_buttons = pygame.mouse.get_pressed()
     if mouse_buttons[0] or mouse_buttons[2]:
         mouse_x, mouse_y = pygame.mouse.get_pos()
-        if mouse_x < width * cell_size:  # Only grid area
-            grid_x = mouse_x // cell_size
-            grid_y = mouse_y // cell_size
-            if 0 <= grid_x < width and 0 <= grid_y < height:
+        if mouse_x < grid_width:  # Only grid area
+            grid_x = view_x + mouse_x // cell_size
+            grid_y = view_y + mouse_y // cell_size
+            if 0 <= grid_x < sim.width and 0 <= grid_y < sim.height:
                 if mouse_buttons[0]:
-                    grid[grid_y][grid_x] = selected_particle()
+                    runner.call(recorder.place, grid_x, grid_y, selected_particle)
                     if grid_x - 1 >= 0:
-                        grid[grid_y][grid_x-1] = selected_particle()
-                    if grid_x + 1 < width:
-                        grid[grid_y][grid_x+1] = selected_particle()
+                        runner.call(recorder.place, grid_x-1, grid_y, selected_particle)
+                    if grid_x + 1 < sim.width:
+                        runner.call(recorder.place, grid_x+1, grid_y, selected_particle)
                     if grid_y - 1 >= 0:
-                        grid[grid_y-1][grid_x] = selected_particle()
-                    if grid_y + 1 < height:
-                        grid[grid_y+1][grid_x] = selected_particle()
+                        runner.call(recorder.place, grid_x, grid_y-1, selected_particle)
+                    if grid_y + 1 < sim.height:
+                        runner.call(recorder.place, grid_x, grid_y+1, selected_particle)
                 elif mouse_buttons[2]:
-                    grid[grid_y][grid_x] = empty()
+                    runner.call(recorder.erase, grid_x, grid_y)
 
 
-print(particle_list)
-print(len(particle_list))
+runner.start()
 while running:
     event_handler()
+    pan_view()
     update_grid()
-    if paused == False:
-        update_frame()
-    draw_grid()
+    runner.paused = paused
+    runner.thermogram = thermogram
+    ui_profiler.begin_frame()
+    state = runner.latest()
+    dirty_rects = draw_grid(state) if state is not None else []
+    ui_profiler.lap("draw_grid")
     draw_sidebar()
+    if show_profiler:
+        draw_profiler(state.stats if state is not None else None, state.counts if state is not None else None)
+    pygame.display.update(dirty_rects + [sidebar_rect])
+    ui_profiler.lap("draw_sidebar")
     clock.tick(60)
+
+runner.stop()
+sim.close()
+if record_path:
+    recorder.save(record_path)
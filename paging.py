@@ -0,0 +1,272 @@
+"""Worlds bigger than the screen and than memory: only the pages around the viewport are simulated.
+
+The world is cut into page_size x page_size pages, and all of it lives in a backing file in the snapshot layout
+(snapshots.py) that is memory mapped, so the operating system keeps the parts in use in RAM and can drop the rest.
+The pages the viewport covers, plus `margin` pages around them, make up the hot window: an ArraySimulation of
+just that area that steps every frame. Every other page is frozen. When the viewport leaves the window, the window
+is written back to the file and the new one is read in. A page that was never in a window has never been written
+either, it is filled with fresh empty cells the first time it comes in, so a new backing file is sparse on disk.
+
+RAM and the cost of a frame follow the window, not the world. The edge of the window acts like the edge of the
+world: particles and heat don't cross into frozen pages until those come into the window too.
+
+    world = PagedWorld("world.pages", 8192, 8192)   # makes the backing file, or opens it when no size is given
+    world.look_at(4000, 4000, 4100, 4100)          # cells the viewport shows, pages them in when needed
+    world.fill(4000, 4000, 4100, 4050, sand)       # world coordinates, the window follows what gets filled
+    world.step(100)
+    world.close()                                  # writes the window and header back
+"""
+import numpy as np
+
+import snapshots
+import thermal
+from array_engine import ArraySimulation
+from chunks import grow
+from particles import MATERIALS, empty
+from simulation import DECAY_FACTOR, IGNORE_COOLING
+
+PAGE_SIZE = 128
+MARGIN = 1 # Pages kept hot around the ones the viewport shows
+HEADER_SIZE = 1 << 16 # Room for the header, which is rewritten on every flush()
+
+
+def create(path, width, height, page_size=PAGE_SIZE, ambient_temperature=10, seed=None):
+    """Make the backing file of an empty width x height world"""
+    probe = ArraySimulation(1, 1, ambient_temperature=ambient_temperature, seed=seed)
+    fields = {name: (array.dtype, (height, width) + array.shape[2:]) for name, array in probe.state_arrays().items()}
+    fields["pages"] = (np.uint8, (-(-height // page_size), -(-width // page_size))) # 1 once a page has been written
+    header = dict(snapshots.state_header(probe), width=width, height=height, page_size=page_size,
+                  random_state=None, rng_state=None)
+    header["arrays"], size = snapshots.layout(fields)
+    with open(path, "wb") as f:
+        start = snapshots.write_header(f, header, HEADER_SIZE)
+        f.truncate(start + size)
+
+
+class PagedWorld:
+    """A world in a backing file with a hot window around the viewport, see the module docstring.
+
+    It looks like a simulation to the game: place(), fill(), step(), temperature_at() and the ambient temperature
+    work in world coordinates. colors(), temperatures() and materials() cover the hot window, whose top left cell
+    is at `origin`. A snapshot of the array engine can be opened as a backing file too.
+    """
+    def __init__(self, path, width=None, height=None, page_size=PAGE_SIZE, margin=MARGIN, **kwargs):
+        if width is not None:
+            create(path, width, height, page_size, kwargs.get("ambient_temperature", 10), kwargs.get("seed"))
+        self.path = path
+        self.header, self._header_size, start = snapshots.read_header(path)
+        if self.header["engine"] != "ArraySimulation":
+            raise ValueError(f"{path} is a snapshot of the {self.header['engine']} engine, only the array engine can be paged")
+        if self.header["materials"] != [cls.__name__ for cls in MATERIALS]:
+            raise ValueError(f"{path} was written with other materials")
+        self._data = np.memmap(path, np.uint8, "r+")
+        self.arrays = snapshots.map_arrays(self.header, self._data, start)
+        self.width = self.header["width"]
+        self.height = self.header["height"]
+        self.page_size = self.header.get("page_size", page_size)
+        shape = (-(-self.height // self.page_size), -(-self.width // self.page_size))
+        self.pages = self.arrays.pop("pages", np.ones(shape, np.uint8)) # A plain snapshot is written all over
+        if "heat_lag" in self.arrays:
+            self._catch_up()
+        self.margin = margin
+        kwargs.setdefault("ambient_temperature", self.header["ambient_temperature"])
+        kwargs.setdefault("seed", self.header["seed"])
+        self.kwargs = kwargs
+        self.window = None # (px0, py0, px1, py1) in pages
+        self.sim = None
+        self.look_at(0, 0, 1, 1)
+
+    #* The simulation of the window stands in for the world where the two agree
+
+    @property
+    def frame(self):
+        return self.sim.frame
+
+    @property
+    def profiler(self):
+        return self.sim.profiler
+
+    @property
+    def chunks(self):
+        return self.sim.chunks
+
+    @property
+    def ambient_temperature(self):
+        return self.sim.ambient_temperature
+
+    @ambient_temperature.setter
+    def ambient_temperature(self, value):
+        self.kwargs["ambient_temperature"] = value
+        self.sim.ambient_temperature = value
+
+    @property
+    def origin(self):
+        return self.window[0] * self.page_size, self.window[1] * self.page_size
+
+    #* --- Paging ---
+
+    def look_at(self, x0, y0, x1, y1):
+        """Make sure the cells [x0, x1) x [y0, y1), and the margin around them, are in the hot window"""
+        s, m = self.page_size, self.margin
+        px0, py0 = max(0, x0 // s - m), max(0, y0 // s - m)
+        px1 = min(self.pages.shape[1], max(x0, x1 - 1) // s + 1 + m)
+        py1 = min(self.pages.shape[0], max(y0, y1 - 1) // s + 1 + m)
+        if self.window is not None:
+            wx0, wy0, wx1, wy1 = self.window
+            if wx0 <= px0 and wy0 <= py0 and px1 <= wx1 and py1 <= wy1:
+                return
+        self._page_out()
+        self._page_in((px0, py0, px1, py1))
+
+    def _cells(self, window):
+        # World cells of a window of pages, as slices
+        px0, py0, px1, py1 = window
+        s = self.page_size
+        return slice(py0 * s, min(self.height, py1 * s)), slice(px0 * s, min(self.width, px1 * s))
+
+    def _page_in(self, window):
+        rows, cols = self._cells(window)
+        old = self.sim
+        sim = ArraySimulation(cols.stop - cols.start, rows.stop - rows.start, **self.kwargs)
+        if old is None:
+            sim.frame = self.header["frame"]
+            snapshots.restore_random(sim, self.header)
+        else:
+            # Carry the clock and the random number generators over, so paging doesn't change what happens next
+            sim.frame = old.frame
+            sim.random.setstate(old.random.getstate())
+            sim.rng.bit_generator.state = old.rng.bit_generator.state
+            sim.profiler.enabled = old.profiler.enabled
+            old.close()
+        live = sim.state_arrays()
+        px0, py0, px1, py1 = window
+        for py, px in zip(*np.nonzero(self.pages[py0:py1, px0:px1])):
+            page_rows, page_cols = self._cells((px0 + px, py0 + py, px0 + px + 1, py0 + py + 1))
+            local = (slice(page_rows.start - rows.start, page_rows.stop - rows.start),
+                     slice(page_cols.start - cols.start, page_cols.stop - cols.start))
+            for name, array in live.items():
+                array[local] = self.arrays[name][page_rows, page_cols]
+        sim.chunks.wake(0, 0, sim.width, sim.height)
+        sim._track_balls(0, 0, sim.width, sim.height)
+        self.sim = sim
+        self.window = window
+
+    def _page_out(self):
+        if self.sim is None:
+            return
+        rows, cols = self._cells(self.window)
+        # The next window starts with every chunk awake, so the thermal steps this one skipped are applied first
+        arrays = dict(self.sim.state_arrays(), temp=self.sim.temperatures())
+        for name, array in arrays.items():
+            self.arrays[name][rows, cols] = array
+        px0, py0, px1, py1 = self.window
+        self.pages[py0:py1, px0:px1] = 1
+        if "heat_lag" in self.arrays:
+            self._store_chunks(rows, cols)
+
+    def _catch_up(self):
+        # A snapshot keeps the thermal steps its chunks skipped, but windows start without any. Applied once up
+        # front, the backing file never has any either.
+        lag = self.arrays["heat_lag"]
+        if lag.any():
+            s = self.header["chunk_size"]
+            frames = np.repeat(np.repeat(lag, s, axis=0), s, axis=1)[:self.height, :self.width]
+            ids = self.arrays["material"]
+            self.arrays["temp"][...] = thermal.decay(self.arrays["temp"], DECAY_FACTOR[ids], IGNORE_COOLING[ids],
+                                                     self.header["heat_ambient"], frames)
+            lag[...] = 0
+
+    def _store_chunks(self, rows, cols):
+        """Write what the chunks of the window know into a backing snapshot that keeps it (chunk_arrays()), so
+        loading the file picks up where the window is. The window took its edge for the edge of the world, so
+        the chunks along it are woken on both sides."""
+        s = self.sim.chunks.size
+        awake, heat_awake, idle = self.arrays["chunks_awake"], self.arrays["heat_awake"], self.arrays["idle"]
+        if self.header.get("chunk_size") != s or rows.start % s or cols.start % s:
+            awake[...], heat_awake[...], idle[...] = True, True, 0 # Chunks that don't line up, wake everything
+            return
+        window = np.zeros(awake.shape, bool)
+        chunk_rows, chunk_cols = slice(rows.start // s, -(-rows.stop // s)), slice(cols.start // s, -(-cols.stop // s))
+        window[chunk_rows, chunk_cols] = True
+        awake[chunk_rows, chunk_cols] = self.sim.chunks.awake
+        heat_awake[chunk_rows, chunk_cols] = self.sim.heat.awake
+        idle[rows, cols] = self.sim.idle
+        # The temperatures were written caught up, so the window's chunks have no skipped steps left either
+        self.arrays["heat_lag"][chunk_rows, chunk_cols] = 0
+        edge = (grow(~window) & window) | (grow(window) & ~window)
+        awake[edge] = True
+        heat_awake[edge] = True
+        for cy, cx in zip(*np.nonzero(edge)):
+            idle[cy * s:(cy + 1) * s, cx * s:(cx + 1) * s] = 0
+
+    def flush(self):
+        """Write the hot window and the header (frame, ambient temperature, random states) to the backing file"""
+        self._page_out()
+        header = dict(self.header, **{key: value for key, value in snapshots.state_header(self.sim).items()
+                                      if key not in ("engine", "width", "height")})
+        with open(self.path, "r+b") as f:
+            snapshots.write_header(f, header, self._header_size)
+        self.header = header
+        self._data.flush()
+
+    def close(self):
+        self.flush()
+        self.sim.close()
+
+    def resident_bytes(self):
+        """Bytes of the arrays of the hot window"""
+        return sum(array.nbytes for array in self.sim.state_arrays().values())
+
+    #* --- The simulation interface, in world coordinates ---
+
+    def _local(self, x, y):
+        ox, oy = self.origin
+        return x - ox, y - oy
+
+    def step(self, n=1):
+        self.sim.step(n)
+
+    def update_frame(self):
+        self.sim.update_frame()
+
+    def place(self, x, y, material, temperature=None):
+        """Put a particle at (x, y), paging in the window around it if it's frozen"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.look_at(x, y, x + 1, y + 1)
+            self.sim.place(*self._local(x, y), material, temperature)
+
+    def fill(self, x0, y0, x1, y1, material):
+        """Fill the rectangle [x0, x1) x [y0, y1), a block of pages at a time"""
+        x0, x1 = max(0, x0), min(self.width, x1)
+        y0, y1 = max(0, y0), min(self.height, y1)
+        block = self.page_size * 8
+        for by in range(y0, y1, block):
+            for bx in range(x0, x1, block):
+                bx1, by1 = min(x1, bx + block), min(y1, by + block)
+                self.look_at(bx, by, bx1, by1)
+                lx, ly = self._local(bx, by)
+                self.sim.fill(lx, ly, lx + bx1 - bx, ly + by1 - by, material)
+
+    def _in_window(self, x, y):
+        lx, ly = self._local(x, y)
+        return 0 <= lx < self.sim.width and 0 <= ly < self.sim.height
+
+    def material_at(self, x, y):
+        # Frozen cells are read from the backing file, which is only up to date for pages that were written
+        if self._in_window(x, y):
+            return self.sim.material_at(*self._local(x, y))
+        return MATERIALS[self.arrays["material"][y, x]] if self.pages[y // self.page_size, x // self.page_size] else empty
+
+    def temperature_at(self, x, y):
+        if self._in_window(x, y):
+            return self.sim.temperature_at(*self._local(x, y))
+        return float(self.arrays["temp"][y, x]) if self.pages[y // self.page_size, x // self.page_size] else self.ambient_temperature
+
+    def colors(self):
+        return self.sim.colors()
+
+    def temperatures(self):
+        return self.sim.temperatures()
+
+    def materials(self):
+        return self.sim.materials()
@@ -0,0 +1,159 @@
+"""Movement and thermal passes of the array engine spread over a pool of worker processes.
+
+The grid is cut into tile_size x tile_size tiles that move in four phases, like a checkerboard with two colors
+per axis: the tiles of one phase never touch, and a particle moves at most one cell (a liquid flowing sideways
+at most its dispersion, which stays well below the tile size), so the tiles of a phase never read or write the
+same cells and can run side by side. The arrays the movement reads and writes live in
+shared memory, every worker has its own view of them.
+
+Every tile gets its own random numbers from (seed, frame, tile), so the result doesn't depend on the number of
+workers. It isn't the same as the serial pass though: a tile doesn't see the tiles below it move first, so
+things falling over a tile edge can hang for a frame. The phase order flips every frame to even that out.
+
+Heat is conducted in horizontal bands of rows, one per worker. Both temperature buffers are shared, a band reads
+its own rows plus one halo row above and below from the current buffer and writes its rows of the other one, and
+the pass waits for every band before the buffers swap. Each cell does the same float operations in the same order
+as thermal.conduct() on the whole grid, so the result is bit for bit the same. When only some chunks need heat
+(see Simulation._heat_region()), the workers get those blocks of cells instead of bands.
+"""
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+import weakref
+
+import numpy as np
+
+import thermal
+
+TILE_SIZE = 64
+PHASES = [(0, 0), (0, 1), (1, 0), (1, 1)] # (tile row, tile column) parity of the tiles that move together
+SHARED_FIELDS = ("mat", "perm", "_moved", "visc_timer", "temp", "_temp_back", "idle", "_mat_before") # What the workers use
+
+_mover = None # The worker's view of the world, see _attach()
+_temps = None # Its two temperature buffers in a fixed order, the simulation swaps which is which
+
+
+def share(array):
+    """Copy of array in a new shared memory block, returned with the block"""
+    block = SharedMemory(create=True, size=max(1, array.nbytes))
+    shared = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+    shared[...] = array
+    return shared, block
+
+
+def _release(blocks, pool):
+    pool.terminate()
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _attach(layout, width, height, sleeps):
+    # Worker initializer: a bare ArraySimulation whose arrays are views of the shared blocks
+    global _mover, _blocks, _temps
+    from array_engine import ArraySimulation, MaterialTable
+    _mover = ArraySimulation.__new__(ArraySimulation)
+    _mover.width, _mover.height = width, height
+    _mover.table = MaterialTable()
+    _mover._sleeps = sleeps
+    _blocks = []
+    for name, (block_name, shape, dtype) in layout.items():
+        block = SharedMemory(name=block_name)
+        _blocks.append(block)
+        setattr(_mover, name, np.ndarray(shape, dtype, buffer=block.buf))
+    _temps = (_mover.temp, _mover._temp_back)
+
+
+def _move_tiles(task):
+    frame, seed, tiles = task
+    _mover.frame = frame
+    for index, y0, y1, x0, x1 in tiles:
+        _mover.rng = np.random.default_rng((seed, frame, index))
+        _mover._move_tile(y0, y1, x0, x1)
+
+
+def _conduct_band(task):
+    src, y0, y1, ambient_temperature, all_neighbours = task
+    temp, out = _temps[src], _temps[1 - src]
+    h0, h1 = max(0, y0 - 1), min(_mover.height, y1 + 1) # With the halo rows
+    mat = _mover.mat[h0:h1]
+    table = _mover.table
+    new_temp = thermal.conduct(temp[h0:h1], table.conductivity[mat], table.decay_factor[mat], table.ignore_cooling[mat],
+                               ambient_temperature, all_neighbours)
+    out[y0:y1] = new_temp[y0 - h0:y1 - h0]
+
+
+def _conduct_blocks(task):
+    src, blocks, ambient_temperature, all_neighbours = task
+    table = _mover.table
+    new_temps = thermal.conduct_blocks(_temps[src], _mover.mat, table.conductivity, table.decay_factor,
+                                       table.ignore_cooling, ambient_temperature, all_neighbours, blocks)
+    for (rows, cols), new_temp in zip(blocks, new_temps):
+        _temps[1 - src][rows, cols] = new_temp
+
+
+class Workers:
+    """Runs the movement pass, and the thermal pass if asked, of an ArraySimulation on `workers` processes.
+
+    Moves the simulation's arrays into shared memory, so make it before anything holds on to them.
+    close() stops the workers, moves the arrays back out and frees the shared memory (that last part also happens
+    when this is garbage collected).
+    """
+    def __init__(self, sim, workers, tile_size=TILE_SIZE):
+        self.sim = sim
+        self.workers = workers
+        layout = {}
+        blocks = []
+        for name in SHARED_FIELDS:
+            shared, block = share(getattr(sim, name))
+            setattr(sim, name, shared)
+            blocks.append(block)
+            layout[name] = (block.name, shared.shape, shared.dtype)
+        self.awake, block = share(np.ones((sim.height, sim.width), bool))
+        blocks.append(block)
+        layout["_awake"] = (block.name, self.awake.shape, self.awake.dtype)
+        self.pool = get_context().Pool(workers, _attach, (layout, sim.width, sim.height, sim._sleeps))
+        self._finalizer = weakref.finalize(self, _release, blocks, self.pool)
+        self.temps = (sim.temp, sim._temp_back)
+        edges = np.linspace(0, sim.height, min(workers, sim.height) + 1).astype(int)
+        self.bands = list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+        # Tiles per phase as (index, y0, y1, x0, x1)
+        self.phases = {phase: [] for phase in PHASES}
+        index = 0
+        for ty, y0 in enumerate(range(0, sim.height, tile_size)):
+            for tx, x0 in enumerate(range(0, sim.width, tile_size)):
+                tile = (index, y0, min(sim.height, y0 + tile_size), x0, min(sim.width, x0 + tile_size))
+                self.phases[(ty % 2, tx % 2)].append(tile)
+                index += 1
+
+    def move(self, awake, frame, seed):
+        """Move every awake cell once, `awake` being the per-cell awake mask of the chunks"""
+        np.copyto(self.awake, awake)
+        movable = self.sim.table.movable[self.sim.mat] & awake
+        for phase in (PHASES if frame % 2 == 0 else PHASES[::-1]):
+            tiles = [tile for tile in self.phases[phase] if movable[tile[1]:tile[2], tile[3]:tile[4]].any()]
+            if not tiles:
+                continue
+            # A few batches per worker keeps them all busy when some tiles have more going on than others
+            batches = [tiles[i::self.workers * 4] for i in range(min(len(tiles), self.workers * 4))]
+            self.pool.map(_move_tiles, [(frame, seed, batch) for batch in batches])
+
+    def conduct(self, temp, ambient_temperature, all_neighbours):
+        """Conduct heat from `temp`, one of the two shared temperature buffers, into the other one and return it"""
+        src = 0 if temp is self.temps[0] else 1
+        self.pool.map(_conduct_band, [(src, y0, y1, ambient_temperature, all_neighbours) for y0, y1 in self.bands])
+        return self.temps[1 - src]
+
+    def conduct_blocks(self, temp, blocks, ambient_temperature, all_neighbours):
+        """Like conduct(), for the (rows, cols) blocks of cells only. The rest of the returned buffer is stale."""
+        src = 0 if temp is self.temps[0] else 1
+        batches = [blocks[i::self.workers * 4] for i in range(min(len(blocks), self.workers * 4))]
+        self.pool.map(_conduct_blocks, [(src, batch, ambient_temperature, all_neighbours) for batch in batches])
+        return self.temps[1 - src]
+
+    def close(self):
+        if self._finalizer.alive:
+            # The simulation keeps working on copies, views of the freed blocks would crash whatever reads them
+            for name in SHARED_FIELDS:
+                setattr(self.sim, name, getattr(self.sim, name).copy())
+            self._finalizer()
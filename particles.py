@@ -0,0 +1,947 @@
+from random import Random, randint, random
+
+# Temperature new particles spawn around. The simulation keeps this in sync with its own ambient temperature.
+ambient_temperature = 20
+
+def colorer(base_r, base_g, base_b, color_variance_red=20, color_variance_green=None, color_variance_blue=None):
+    # If only color_variance_red is filled, use it for all channels and apply the same diff to all
+    if color_variance_green is None and color_variance_blue is None:
+        diff = randint(-color_variance_red, color_variance_red)
+        r = max(0, min(255, base_r + diff))
+        g = max(0, min(255, base_g + diff))
+        b = max(0, min(255, base_b + diff))
+        # Clamp negative values to positive, and if any channel >255, reset all to base color
+        if r < 0 or g < 0 or b < 0:
+            r, g, b = abs(r), abs(g), abs(b)
+        if r > 255:
+            r = base_r
+        if g > 255:
+            g = base_g
+        if b > 255:
+            b = base_b
+    else:
+        # Apply variance per channel
+        if color_variance_green is None:
+            color_variance_green = color_variance_red
+        if color_variance_blue is None:
+            color_variance_blue = color_variance_red
+
+        diff_r = randint(-color_variance_red, color_variance_red)
+        diff_g = randint(-color_variance_green, color_variance_green)
+        diff_b = randint(-color_variance_blue, color_variance_blue)
+        
+        r = max(0, min(255, base_r + diff_r))
+        g = max(0, min(255, base_g + diff_g))
+        b = max(0, min(255, base_b + diff_b))
+        # Clamp negative values to positive, and if any channel >255, reset all to base color
+        if r < 0 or g < 0 or b < 0:
+            r, g, b = abs(r), abs(g), abs(b)
+        if r > 255:
+            r = base_r
+        if g > 255:
+            g = base_g
+        if b > 255:
+            b = base_b
+    return (r, g, b)
+
+
+class lazy_color:
+    """A per-particle color that is only rolled the first time it's read, like the basalt color cooling lava fades to.
+
+    roll(particle) makes the color, and it's kept in the particle's '_<name>' slot.
+    """
+    def __init__(self, roll):
+        self.roll = roll
+
+    def __set_name__(self, owner, name):
+        self.slot = '_' + name
+
+    def __get__(self, particle, owner=None):
+        if particle is None:
+            return self
+        try:
+            return getattr(particle, self.slot)
+        except AttributeError:
+            color = self.roll(particle)
+            setattr(particle, self.slot, color)
+            return color
+
+    def __set__(self, particle, color):
+        setattr(particle, self.slot, color)
+
+def transition_color(target):
+    # Lazy color of the material the `target` attribute (melt_to, solidify_to) points at
+    return lazy_color(lambda p: pick_color(getattr(p, target).color_pool))
+
+
+COLOR_VARIANTS = 256 # Colors rolled up front for every material, spawning picks one instead of calling colorer()
+
+def color_pool(base_color, color_variance, name):
+    """COLOR_VARIANTS colors from colorer(), or just the base color for a material without variance.
+
+    The rolls are seeded with the material name, so a color index means the same color in every run (snapshots
+    store the index). They come from a generator of their own, whatever use_rng() has swapped in.
+    """
+    global randint
+    if not any(color_variance):
+        return (tuple(base_color),)
+    drawing, randint = randint, Random(name).randint
+    try:
+        return tuple(colorer(*base_color, *color_variance) for _ in range(COLOR_VARIANTS))
+    finally:
+        randint = drawing
+
+def use_rng(rng):
+    """Draw the random numbers of the particles from rng, a random.Random. Simulations swap in their own this way."""
+    global random, randint
+    random, randint = rng.random, rng.randint
+
+def pick_color(pool):
+    return pool[int(random() * len(pool))] if len(pool) > 1 else pool[0]
+
+
+class Particle:
+    """Base class for all particles.
+
+    Material constants (base_color, conductivity, melt_temp, melt_to, ...) are class attributes shared by all
+    particles of a material. Instances only keep their own state, in __slots__, so every subclass declares
+    __slots__ as well (empty if it adds no state).
+    """
+    __slots__ = ("moved_frame", "temperature", "color", "spawn_color", "ramp_step")
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every material gets its pool of spawn colors once, when its class is defined
+        if 'base_color' in cls.__dict__:
+            cls.color_pool = color_pool(cls.base_color, cls.color_variance, cls.__name__)
+
+    def __init__(self):
+        self.moved_frame = -1 # Frame the particle last moved in, so it only moves once per frame
+        self.color = self.spawn_color = pick_color(self.color_pool)
+    def __repr__(self):
+        return self.__class__.__name__
+    
+    def move(self, grid, old_y, old_x, new_y, new_x):
+        grid[new_y][new_x], grid[old_y][old_x] = grid[old_y][old_x], grid[new_y][new_x]
+
+class Static(Particle):
+    __slots__ = ()
+    locked = False
+    """Base class for particles that don't move"""
+
+class StraightFalling(Particle):
+    __slots__ = ()
+    locked = False
+    """Base class for particles that fall straight down"""
+    
+    def check_movement(self, x, y, grid):
+        return self.check_below(x, y, grid)
+
+    def check_below(self, x, y, grid):
+        height = len(grid)
+        if y >= height - 1:
+            return False
+        if isinstance(grid[y+1][x], (empty, Liquid, LightGas)):
+            self.move(grid, y, x, y+1, x)
+            return True
+        return False
+
+class Granular(Particle):
+    __slots__ = ()
+    locked = False
+    """Base class for sand-like particles that fall and slide"""
+
+    def check_movement(self, x, y, grid):
+        return self.check_below(x, y, grid)
+
+    def check_bottom_left(self, x, y, grid, other):
+        # Left edge check
+        if x <= 0:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_right(x, y, grid, True)
+        # Regular checks
+        if isinstance(grid[y+1][x-1], (empty, Liquid, LightGas)):
+            self.move(grid, y, x, y+1, x-1)
+            return True
+        else:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_right(x, y, grid, True)
+
+    def check_bottom_right(self, x, y, grid, other):
+        width = len(grid[0])
+        # Right edge check
+        if x >= width - 1:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_left(x, y, grid, True)
+        # Regular checks
+        if isinstance(grid[y+1][x+1], (empty, Liquid, LightGas)):
+            self.move(grid, y, x, y+1, x+1)
+            return True
+        else:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_left(x, y, grid, True)
+
+    def check_below(self, x, y, grid):
+        height = len(grid)
+        # Floor check
+        if y >= height - 1:
+            return False
+        # Regular checks
+        if isinstance(grid[y+1][x], (empty, Liquid, LightGas)):
+            self.move(grid, y, x, y+1, x)
+            return True
+        else:
+            rnder = randint(0,1)
+            if rnder == 0:
+                return self.check_bottom_left(x, y, grid, False)
+            else:
+                return self.check_bottom_right(x, y, grid, False)
+
+class Liquid(Particle):
+    __slots__ = ()
+    locked = False
+    """Base class for liquid particles that fall, slide, and flow horizontally"""
+    dispersion = 8 # Free cells a sideways flow can cover in one move, 1 is a cell at a time. At most the chunk size.
+
+    def check_movement(self, x, y, grid):
+        return self.check_below(x, y, grid)
+
+    def flow_target(self, x, y, grid, side):
+        """Column a sideways flow from x into the free cell at x + side ends up in: as many free cells along the
+        row as dispersion allows, or the first one with nothing under it, to fall from next frame"""
+        width = len(grid[0])
+        row = grid[y]
+        below = grid[y+1] if y < len(grid) - 1 else None
+        target = x + side
+        for _ in range(self.dispersion - 1):
+            if below is not None and isinstance(below[target], empty):
+                break
+            if not 0 <= target + side < width or not isinstance(row[target + side], (empty, LightGas)):
+                break
+            target += side
+        return target
+    
+    def check_bottom_left(self, x, y, grid, other):
+        # Left edge check
+        if x <= 0:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_right(x, y, grid, True)
+        # Regular checks
+        if isinstance(grid[y+1][x-1], (empty,LightGas)):
+            self.move(grid, y, x, y+1, x-1)
+            return True
+        else:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_right(x, y, grid, True)
+
+    def check_bottom_right(self, x, y, grid, other):
+        width = len(grid[0])
+        # Right edge check
+        if x >= width - 1:
+            if other == True:
+                return False
+            else:
+                return self.check_bottom_left(x, y, grid, True)
+        # Regular checks
+        if isinstance(grid[y+1][x+1], (empty, LightGas)):
+            self.move(grid, y, x, y+1, x+1)
+            return True
+        else:
+            if other == True:
+                if randint(0, 1) == 0:
+                    return self.check_left(x, y, grid, False)
+                else:
+                    return self.check_right(x, y, grid, False)
+            else:
+                return self.check_bottom_left(x, y, grid, True)
+
+    def check_left(self, x, y, grid, other):
+        if x <= 0:
+            if other == True:
+                return False
+            else:
+                return self.check_right(x, y, grid, other)
+        if isinstance(grid[y][x-1], (empty, LightGas)):
+            self.move(grid, y, x, y, self.flow_target(x, y, grid, -1))
+            return True
+        else:
+            if other == True:
+                return False
+            else:
+                return self.check_right(x, y, grid, True)
+    
+    def check_right(self, x, y, grid, other):
+        width = len(grid[0])
+        if x >= width-1:
+            if other == True:
+                return False
+            else:
+                return self.check_left(x, y, grid, True)
+        if isinstance(grid[y][x+1], (empty, LightGas)):
+            self.move(grid, y, x, y, self.flow_target(x, y, grid, 1))
+            return True
+        else:
+            if other == True:
+                if randint(0, 1) == 0:
+                    return self.check_left(x, y, grid, False)
+                else:
+                    return self.check_right(x, y, grid, False)
+            else:
+                return self.check_left(x, y, grid, True)
+
+    def check_below(self, x, y, grid):
+        height = len(grid)
+        # Floor check
+        if y >= height - 1:
+            return False
+        # Regular checks
+        if isinstance(grid[y+1][x], empty):
+            self.move(grid, y, x, y+1, x)
+            return True
+        else:
+            if randint(0, 1) == 0:
+                return self.check_bottom_left(x, y, grid, False)
+            else:
+                return self.check_bottom_right(x, y, grid, False)
+
+class LightGas(Particle):
+    __slots__ = ()
+    locked = False
+    
+    def check_bottom_left(self, x,y, grid, counter=0):
+        height = len(grid)
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+        # Floor check
+        if y >= height - 1:
+            #* At the floor of the simulation, it can't go further down.
+            #* This means that it should either go left or right, instead of trying diagonally downwards like standard particles.
+            #* Since this particle originally intended to go downleft, it'll try to go left.
+            return self.check_left(x, y, grid, counter + 1)
+        # Left edge check
+        if x <= 0:
+            #* At the left wall of the simulation, it can't go bottom left, top left, or left itself.
+            #* This means that it should either go up or down, instead of trying the other side like standard particles.
+            #* Since this particle originally intended to go downleft, it'll try to go down.
+            return self.check_below(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y+1][x-1]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y+1, x-1)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            return self.check_below(x,y, grid, counter+1)
+        
+    def check_below(self, x,y, grid, counter=0):
+        height = len(grid)
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+
+        # Floor check
+        if y >= height-1:
+            #* At the floor of the simulation, it can't go further down.
+            #* This means that it should either go left or right, instead of trying diagonally downwards like standard particles.
+            #* Since this particle originally intended to go straight down, it'll randomly go left or right.
+            if randint(0, 1) == 0:
+                return self.check_left(x,y, grid, counter+1)
+            else:
+                return self.check_right(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y+1][x]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y+1, x)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            if randint(0, 1) == 0:
+                return self.check_left(x,y, grid, counter+1)
+            else:
+                return self.check_right(x,y, grid, counter+1)
+    
+    def check_bottom_right(self, x,y, grid, counter=0):
+        height = len(grid)
+        width = len(grid[0])
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+        # Floor check
+        if y >= height - 1:
+            #* At the floor of the simulation, it can't go further down.
+            #* This means that it should either go left or right, instead of trying diagonally downwards like standard particles.
+            #* Since this particle originally intended to go downright, it'll try to go right.
+            return self.check_right(x, y, grid, counter + 1)
+        # Right edge check
+        if x >= width-1:
+            #* At the right wall of the simulation, it can't go bottom right, top right, or right itself.
+            #* This means that it should either go up or down, instead of trying the other side like standard particles.
+            #* Since this particle originally intended to go downright, it'll try to go down.
+            return self.check_below(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y+1][x+1]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y+1, x+1)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            return self.check_below(x,y, grid, counter+1)
+    
+    def check_left(self, x,y, grid, counter=0):
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+
+        # Left edge check
+        if x <= 0:
+            #* At the left wall of the simulation, it can't go bottom left, top left, or left itself.
+            #* This means that it should either go up or down, instead of trying the other side like standard particles.
+            #* Since this particle had no original vertical intention, it'll randomly pick to go up or down.
+            if randint(0, 1) == 0:
+                return self.check_below(x,y, grid, counter+1)
+            else:
+                return self.check_above(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y][x-1]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y, x-1)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            if randint(0, 1) == 0:
+                return self.check_below(x,y, grid, counter+1)
+            else:
+                return self.check_above(x,y, grid, counter+1)
+    
+    def check_right(self, x,y, grid, counter=0):
+        width = len(grid[0])
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+
+        # Right edge check
+        if x >= width-1:
+            #* At the right wall of the simulation, it can't go bottom right, top right, or right itself.
+            #* This means that it should either go up or down, instead of trying the other side like standard particles.
+            #* Since this particle had no original vertical intention, it'll randomly pick to go up or down.
+            if randint(0, 1) == 0:
+                return self.check_below(x,y, grid, counter+1)
+            else:
+                return self.check_above(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y][x+1]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y, x+1)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            if randint(0, 1) == 0:
+                return self.check_below(x,y, grid, counter+1)
+            else:
+                return self.check_above(x,y, grid, counter+1)
+
+    def check_top_left(self, x,y, grid, counter=0):
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+
+        # Ceiling check
+        if y <= 0:
+            #* At the ceiling of the simulation, it can't go further up.
+            #* This means that it should either go left or right.
+            #* Since this particle originally intended to go upleft, it'll go left.
+            return self.check_left(x,y, grid, counter+1)
+        # Left edge check
+        if x <= 0:
+            #* At the left wall of the simulation, it can't go bottom left, top left, or left itself.
+            #* This means that it should either go up or down, instead of trying the other side like standard particles.
+            #* Since this particle originally intended to go upleft, it'll try to go up.
+            return self.check_above(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y-1][x-1]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y-1, x-1)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            return self.check_above(x,y, grid, counter+1)
+        
+    def check_above(self, x,y, grid, counter=0):
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+
+        # Ceiling check
+        if y <= 0:
+            #* At the ceiling of the simulation, it can't go further up.
+            #* This means that it should either go left or right.
+            #* Since this particle originally intended to go straight up, it'll randomly go left or right.
+            if randint(0, 1) == 0:
+                return self.check_left(x,y, grid, counter+1)
+            else:
+                return self.check_right(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y-1][x]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y-1, x)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            if randint(0, 1) == 0:
+                return self.check_left(x,y, grid, counter+1)
+            else:
+                return self.check_right(x,y, grid, counter+1)
+    
+    def check_top_right(self, x,y, grid, counter=0):
+        width = len(grid[0])
+        #! Recursion prevention
+        if counter >= 8:
+            return False
+        #! Recursion prevention
+
+        # Ceiling check
+        if y <= 0:
+            #* At the ceiling of the simulation, it can't go further up.
+            #* This means that it should either go left or right.
+            #* Since this particle originally intended to go upright, it'll go right.
+            return self.check_right(x,y, grid, counter+1)
+        
+        # Right edge check
+        if x >= width-1:
+            #* At the right wall of the simulation, it can't go bottom right, top right, or right itself.
+            #* This means that it should either go up or down, instead of trying the other side like standard particles.
+            #* Since this particle originally intended to go downright, it'll try to go down.
+            return self.check_below(x,y, grid, counter+1)
+        # Regular checks
+        target=grid[y-1][x+1]
+        if isinstance(target, (empty, LightGas)):
+            self.move(grid, y,x, y-1, x+1)
+            return True
+        #TODO--- Gaseous interactions of varying densities
+        else:
+            return self.check_below(x,y, grid, counter+1)
+
+    def check_movement(self, x,y, grid):
+        r = random()
+        ri = randint(0,2)
+        # Upwards movements
+        if r < 0.6:
+            if ri == 0:
+                return self.check_top_left(x,y, grid, 0)
+            elif ri == 1:
+                return self.check_above(x,y, grid, 0)
+            else:
+                return self.check_top_right(x,y, grid, 0)
+        # Sideways movements
+        elif r < 0.8:
+            if randint(0,1) == 0:
+                return self.check_left(x,y, grid, 0)
+            else:
+                return self.check_right(x,y, grid, 0)
+        # Downwards movements
+        elif r < 0.9:
+            if ri == 0:
+                return self.check_bottom_left(x,y, grid, 0)
+            elif ri == 1:
+                return self.check_below(x,y, grid, 0)
+            else:
+                return self.check_bottom_right(x,y, grid, 0)
+        # Stay put
+        else:
+            return False
+
+
+
+class Bouncy(Particle):
+    __slots__ = ("current_direction",)
+    locked = True
+    """Base class for balls that bounce around diagonally. The simulations move them as entities, see entities.py"""
+    directions = ("topleft", "topright", "bottomleft", "bottomright")
+    def __init__(self):
+        super().__init__()
+        self.current_direction = self.directions[randint(0,3)]
+
+
+# Granular particles
+class sand(Granular):
+    __slots__ = ()
+    locked = False
+    base_color = (194, 178, 128)  # Sandy beige color
+    color_variance = (20,)
+    conductivity = 0.015
+    decay_factor = 0.002
+    def __init__(self):
+        # temperature defaults to ambient_temperature +/- 2.5
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+class dirt(Granular):
+    __slots__ = ()
+    locked = False
+    base_color = (139, 115, 85)  # Earthy brown, lighter and less saturated than mud
+    color_variance = (20,)
+    conductivity = 0.02
+    decay_factor = 0.003
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+# Liquid particles  
+class water(Liquid):
+    __slots__ = ("_solidify_color", "solidify_ramp", "original_temp")
+    locked = False
+    base_color = (64, 164, 223)  # Blue color
+    color_variance = (20,)
+    conductivity = 0.03
+    decay_factor = 0.005
+
+    evap_temp = 100 # evap_to and solidify_to point further down the file, see the end of the materials
+    solidify_temp = 0
+    solidify_color = transition_color('solidify_to')
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+class lava(Liquid):
+    __slots__ = ("_solidify_color", "solidify_ramp", "original_temp", "viscosity_timer")
+    locked = False
+    base_color = (255, 80, 0)
+    color_variance = (45,)
+    conductivity = 0.08
+    decay_factor = 0.0035
+
+    solidify_temp = 200 # Celsius, solidify_to is set at the end of the materials
+    solidify_color = transition_color('solidify_to')
+
+    viscosity = 2 # Lava moves slower
+    def __init__(self):
+        # Base 1125 +/-125 variation
+        self.temperature = 1125 + (random() * 250.0 - 125.0)
+        self.viscosity_timer = 0
+        super().__init__()
+
+class acid(Liquid):
+    __slots__ = ("lifetime", "max_lifetime", "viscosity_timer")
+    locked = False
+    base_color = (100, 255, 100)  # Bright green color
+    color_variance = (20,)
+    conductivity = 0.025
+    decay_factor = 0.004
+    viscosity = 1 # Acid moves slower
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        self.lifetime = randint(100,200)
+        self.max_lifetime = self.lifetime
+        super().__init__()
+
+class corrosive_byproducts(Liquid):
+    __slots__ = ("lifetime", "max_lifetime")
+    locked = True
+    base_color = (150, 75, 0)  # Brownish color
+    color_variance = (30,)
+    conductivity = 0.02
+    decay_factor = 0.004
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        self.lifetime = randint(150,300)
+        self.max_lifetime = self.lifetime
+        super().__init__()
+
+# Straight falling particles
+class stone(StraightFalling):
+    __slots__ = ()
+    locked = False
+    base_color = (68, 68, 68)  # Gray with less variance
+    color_variance = (10,)
+    conductivity = 0.03
+    decay_factor = 0.002
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+class mud(StraightFalling):
+    __slots__ = ("lifetime", "max_lifetime")
+    locked = False
+    base_color = (101, 67, 33)   # Dark brown color
+    color_variance = (20,)
+    conductivity = 0.02
+    decay_factor = 0.003
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        self.lifetime = randint(50,100)
+        self.max_lifetime = self.lifetime
+        super().__init__()
+
+class wet_sand(StraightFalling):
+    __slots__ = ("lifetime", "max_lifetime")
+    locked = False
+    base_color = (160, 140, 100)  # Darker sandy beige color
+    color_variance = (20,)
+    conductivity = 0.02
+    decay_factor = 0.003
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        self.lifetime = randint(50,100)
+        self.max_lifetime = self.lifetime
+        super().__init__()
+
+# Light Gaseous particles
+class steam(LightGas):
+    __slots__ = ("condensing_framecount", "condense_timer")
+    locked = False
+    base_color = (200, 200, 220)  # Light grayish color
+    color_variance = (15,)
+    # conductivity = 0.05
+    # decay_factor = 0.015
+    conductivity = 0.004
+    decay_factor = 0.025
+    condense_to = water
+    condense_temp = 100
+    def __init__(self):
+        self.condensing_framecount = 180 + randint(0,40)
+        self.condense_timer = 0
+
+        # Temperature variation across 100..275 (centered variation)
+        self.temperature = 187.5 + (random() * 175.0 - 87.5)
+        super().__init__()
+
+class fire(LightGas):
+    __slots__ = ("lifetime", "max_lifetime")
+    locked = False
+    base_color = (255, 120, 30)  # Bright orange, distinct from lava
+    color_variance = (30,)  # More variance than lava for a flickering effect
+    ignore_cooling = True
+    conductivity = 0.05
+    decay_factor = 0.015
+    def __init__(self):
+        self.temperature = 187.5 + (random() * 175.0 - 87.5) # Temperature variation across 100..275 (centered variation)
+        self.lifetime = randint(60, 120)  # Lifetime in frames
+        self.max_lifetime = self.lifetime
+        super().__init__()
+
+class cold_fire(LightGas):
+    __slots__ = ("lifetime", "max_lifetime")
+    locked = False
+    base_color = (60, 120, 255)  # Brighter blue color
+    color_variance = (20,)  # Moderate variance for a flickering effect
+    ignore_cooling = True
+    conductivity = 0.015
+    decay_factor = 0.010
+    def __init__(self):
+        self.temperature = -150.0 + (random() * 50.0 - 25.0) # Temperature variation across -175..-125 (centered variation)
+        self.lifetime = randint(60, 120)  # Lifetime in frames
+        self.max_lifetime = self.lifetime
+        super().__init__()
+
+# Static particles
+class empty(Static):
+    __slots__ = ()
+    locked = True
+    base_color = (0, 0, 0)  # Black with no variance
+    color_variance = (0,)
+    conductivity = 0.01
+    decay_factor = 0.035
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+class basalt(Static):
+    __slots__ = ("_melt_color", "melt_ramp", "original_temp")
+    locked = False
+    base_color = (76, 74, 74)  # Dark blue with minimal variance
+    color_variance = (35,)  # color variance: basalt has larger variance
+    conductivity = 0.03
+    decay_factor = 0.002
+
+    melt_temp = 1000 # Celsius
+    melt_to = lava
+    melt_color = transition_color('melt_to')
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+class ice(Static):
+    __slots__ = ("_melt_color", "melt_ramp", "original_temp")
+    locked = True
+    base_color = (180, 220, 255)  # Pale blue-white for ice
+    color_variance = (10,)
+    # Ice is a poor conductor compared to metals, but better than air
+    conductivity = 0.015
+    # Decays slowly toward ambient temperature (melts slowly)
+    decay_factor = 0.001
+    # Melts at 0°C, turns into water
+    melt_temp = 0
+    melt_to = water
+    melt_color = transition_color('melt_to')
+    def __init__(self):
+        # Ice is cold by default, well below room temperature
+        self.temperature = -10.0
+        super().__init__()
+
+class tungsten(Static):
+    __slots__ = ("_melt_color", "melt_ramp", "original_temp")
+    locked = False
+    base_color = (180, 180, 200)  # Silvery light gray-blue, still fits tungsten
+    color_variance = (6,)
+    # Tungsten is an excellent conductor
+    conductivity = 0.10
+    # Decays quickly toward ambient temperature (fast heat transfer)
+    decay_factor = 0.018
+    # Tungsten melts at 3422°C, turns into empty (simulate melting away)
+    melt_temp = 3422
+    melt_to = empty
+    melt_color = transition_color('melt_to')
+    def __init__(self):
+        # Default temperature is ambient
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+class copper(Static):
+    __slots__ = ("_melt_color", "melt_ramp", "original_temp", "_corroded_color", "corrode_ramp",
+                 "acidification_progress", "acidification_tick")
+    locked = False
+    base_color = (184, 115, 51)  # Copper color
+    color_variance = (10,)
+    # Copper is a very good conductor
+    conductivity = 0.15
+    # Decays quickly toward ambient temperature (fast heat transfer)
+    decay_factor = 0.015
+    # Corroded copper: more greenish (e.g., verdigris)
+    corroded_color = lazy_color(lambda p: colorer(80, 180, 120, p.color_variance[0]))
+    # Copper melts at 1085°C, turns into empty (simulate melting away)
+    melt_temp = 1085
+    melt_to = empty
+    melt_color = transition_color('melt_to')
+    def __init__(self):
+        # Default temperature is ambient
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        self.acidification_tick = 5 + random() * 4  # random float between 5 and 9
+        super().__init__()
+
+class crystal(Static):
+    __slots__ = ()
+    locked = False
+    base_color = (40, 40, 40)  # Darker than mid-dark, pure grey, no tint
+    color_variance = (0,)
+    conductivity = 0.025
+    decay_factor = 0.002
+    def __init__(self):
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+# Bouncy particles
+class bouncy_ball(Bouncy):
+    __slots__ = ("_melt_color", "melt_ramp", "original_temp", "viscosity_timer")
+    locked = True
+    base_color = (255, 0, 255)  # Bright magenta color
+    color_variance = (20,)
+    viscosity =  2
+    # Rubber is a poor conductor, so low conductivity
+    conductivity = 0.005
+    # Decays slowly toward ambient temperature (insulator)
+    decay_factor = 0.0005
+    # Melts at around 180°C, turns into empty (simulate burning/melting away)
+    melt_temp = 180
+    melt_to = empty
+    melt_color = transition_color('melt_to')
+    def __init__(self):
+        self.viscosity_timer = 0
+        # Rubber is usually at room temperature by default
+        self.temperature = ambient_temperature + (random() * 5.0 - 2.5)
+        super().__init__()
+
+# Transitions into materials that are defined further down than the material itself
+water.evap_to = steam
+water.solidify_to = ice
+lava.solidify_to = basalt
+
+
+def get_all_subclasses(cls):
+    subclasses = []
+    for subclass in cls.__subclasses__():
+        if subclass.locked:
+            continue
+        subclasses.append(subclass)
+        subclasses.extend(get_all_subclasses(subclass))
+    return subclasses
+
+def get_particle_colors():
+    color_dict = {}
+    for subclass in get_all_subclasses(Particle):
+        # only include "end" classes, not base ones like Granular
+        if not subclass.__subclasses__():
+            instance = subclass()  # create one so we can read its base color
+            color_dict[subclass] = instance.base_color
+            # Store the variance as a tuple (red, green, blue)
+            # Try to get the variance values from the constructor args or attributes
+            # Prefer the new unified `color_variance` attribute when present
+            red = getattr(instance, 'color_variance_red', None)
+            green = getattr(instance, 'color_variance_green', None)
+            blue = getattr(instance, 'color_variance_blue', None)
+            if hasattr(instance, 'color_variance'):
+                cv = instance.color_variance
+                if isinstance(cv, (list, tuple)):
+                    if len(cv) == 1:
+                        red = cv[0]
+                        green = cv[0]
+                        blue = cv[0]
+                    elif len(cv) == 3:
+                        red, green, blue = cv
+                    else:
+                        # Fallback: use first value for all channels
+                        red = cv[0]
+                        green = red
+                        blue = red
+                else:
+                    # single numeric value
+                    red = cv
+                    green = cv
+                    blue = cv
+            # Final fallbacks to maintain original behavior
+            if red is None:
+                red = 20
+            if green is None:
+                green = red
+            if blue is None:
+                blue = red
+            color_dict[f"{subclass.__name__}_var"] = (red, green, blue)
+    return color_dict
+
+PARTICLE_COLORS = get_particle_colors()
+
+particle_list = [cls for cls in get_all_subclasses(Particle)
+                 if not cls.__subclasses__()]
+
+def get_material_classes(cls=Particle):
+    # Every "end" class, including the locked ones that are hidden from the sidebar
+    materials = []
+    for subclass in cls.__subclasses__():
+        if subclass.__subclasses__():
+            materials.extend(get_material_classes(subclass))
+        else:
+            materials.append(subclass)
+    return materials
+
+# Integer ids for the array engine, empty is always 0
+MATERIALS = [empty] + [cls for cls in get_material_classes() if cls is not empty]
+for material_id, material in enumerate(MATERIALS):
+    material.material_id = material_id
@@ -0,0 +1,91 @@
+import csv
+import json
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+
+class Profiler:
+    """Wall time of each pass of each frame, kept in a ring buffer of the last `capacity` frames.
+
+    Usage: begin_frame() when a frame starts, then lap(name) after every pass. A lap is the time
+    since the previous lap (or since begin_frame). count(name, n) adds to a per-frame counter, like the
+    number of sleeping particles. When the profiler is disabled every call returns straight away, so it
+    can stay wired into the loops.
+    """
+    def __init__(self, capacity=600, enabled=False):
+        self.enabled = enabled
+        self.frames = deque(maxlen=capacity)
+        self.passes = [] # Pass names in the order they were first seen, used as columns
+        self.counters = [] # Counter names, columns after the passes
+        self._current = None
+        self._last = 0.0
+
+    def begin_frame(self, frame=None):
+        if not self.enabled:
+            return
+        self._commit()
+        self._current = {"frame": frame}
+        self._last = perf_counter()
+
+    def lap(self, name):
+        if not self.enabled or self._current is None:
+            return
+        now = perf_counter()
+        self._current[name] = self._current.get(name, 0.0) + now - self._last
+        self._last = now
+        if name not in self.passes:
+            self.passes.append(name)
+
+    def count(self, name, n):
+        if not self.enabled or self._current is None:
+            return
+        self._current[name] = self._current.get(name, 0) + n
+        if name not in self.counters:
+            self.counters.append(name)
+
+    def _commit(self):
+        if self._current is not None and len(self._current) > 1:
+            self.frames.append(self._current)
+        self._current = None
+
+    def clear(self):
+        self.frames.clear()
+        self.passes.clear()
+        self.counters.clear()
+        self._current = None
+
+    def records(self):
+        """Buffered frames, oldest first, plus the one still being recorded"""
+        pending = [self._current] if self._current is not None and len(self._current) > 1 else []
+        return list(self.frames) + pending
+
+    def summary(self):
+        """Per pass over the buffered frames: (mean, p50, p95, p99) in seconds"""
+        frames = self.frames
+        stats = {}
+        for name in self.passes + ["total"]:
+            if name == "total":
+                times = np.array([sum(f.get(name, 0.0) for name in self.passes) for f in frames])
+            else:
+                times = np.array([f[name] for f in frames if name in f])
+            if len(times):
+                p50, p95, p99 = np.percentile(times, [50, 95, 99])
+                stats[name] = (float(times.mean()), float(p50), float(p95), float(p99))
+        return stats
+
+    def counts(self):
+        """Mean of every counter per frame over the buffered frames"""
+        return {name: float(np.mean([f.get(name, 0) for f in self.frames])) for name in self.counters if self.frames}
+
+    def to_csv(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, ["frame"] + self.passes + self.counters)
+            writer.writeheader()
+            writer.writerows(self.records())
+
+    def to_jsonl(self, path):
+        with open(path, "w") as f:
+            for record in self.records():
+                f.write(json.dumps(record) + "\n")
@@ -0,0 +1,191 @@
+"""Record what is done to a simulation and replay it headless.
+
+A Recorder stands in front of a fresh simulation and logs every placement, erase, fill and ambient temperature
+change with the frame it happened before. Since the simulation draws all its random numbers from its own seeded
+generator, replaying those events on a new simulation with the same seed gives the same run again, as fast as the
+CPU allows. The file is a short JSON header (engine, size, seed, settings, material names, frames) followed by
+the events as fixed size binary records.
+
+    python recording.py session.rec                    # replay it and report the speed
+    python recording.py session.rec --engine arrays    # the same inputs on another engine
+    python recording.py session.rec --profile --output replay.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from particles import MATERIALS, empty
+from simulation import Simulation
+
+MAGIC = b"POWDREC\0"
+VERSION = 1
+PLACE, FILL, AMBIENT = range(3)
+EVENT = np.dtype([("frame", "<u4"), ("kind", "u1"), ("material", "u1"), ("x0", "<u2"), ("y0", "<u2"),
+                  ("x1", "<u2"), ("y1", "<u2"), ("value", "<f8")]) # value: temperature, NaN for none
+
+
+def _engines():
+    engines = {"objects": Simulation}
+    try:
+        from array_engine import ArraySimulation
+        engines["arrays"] = ArraySimulation
+    except ImportError:
+        pass
+    return engines
+
+
+def engine_name(sim):
+    return next(name for name, engine in _engines().items() if type(sim) is engine)
+
+
+class Recorder:
+    """Passes place(), fill() and set_ambient_temperature() on to sim and logs them.
+
+    Make it right after the simulation, before anything is placed. stop() ends the recording at the current
+    frame (e.g. when the world gets replaced), save() writes it. With enabled=False it only passes things on,
+    for worlds that can't be replayed (paging.py).
+    """
+    def __init__(self, sim, enabled=True):
+        self.sim = sim
+        self.events = []
+        if not enabled:
+            self.header = None
+            self.frames = 0
+            return
+        if sim.frame != 0:
+            raise ValueError("recordings start on a fresh simulation")
+        self.header = {
+            "engine": engine_name(sim),
+            "width": sim.width,
+            "height": sim.height,
+            "seed": sim.seed,
+            "ambient_temperature": sim.ambient_temperature,
+            "all_neighbours_temp": sim.all_neighbours_temp,
+            "thermal_backend": sim.thermal_backend,
+            "active_chunks": sim.chunks.enabled,
+            "chunk_size": sim.chunks.size,
+            "materials": [cls.__name__ for cls in MATERIALS],
+        }
+        self.frames = None # Set by stop()
+
+    def _log(self, kind, material, x0, y0, x1, y1, value=None):
+        if self.frames is None:
+            self.events.append((self.sim.frame, kind, material, x0, y0, x1, y1, np.nan if value is None else value))
+
+    def place(self, x, y, material, temperature=None):
+        if 0 <= x < self.sim.width and 0 <= y < self.sim.height:
+            self._log(PLACE, material.material_id, x, y, x + 1, y + 1, temperature)
+        self.sim.place(x, y, material, temperature)
+
+    def erase(self, x, y):
+        self.place(x, y, empty)
+
+    def fill(self, x0, y0, x1, y1, material):
+        x0, x1 = max(0, x0), min(self.sim.width, x1)
+        y0, y1 = max(0, y0), min(self.sim.height, y1)
+        if x0 < x1 and y0 < y1:
+            self._log(FILL, material.material_id, x0, y0, x1, y1)
+        self.sim.fill(x0, y0, x1, y1, material)
+
+    def set_ambient_temperature(self, value):
+        self._log(AMBIENT, 0, 0, 0, 0, 0, value)
+        self.sim.ambient_temperature = value
+
+    def stop(self):
+        if self.frames is None:
+            self.frames = self.sim.frame
+
+    def save(self, path):
+        if self.header is None:
+            raise ValueError("this recorder doesn't record")
+        header = dict(self.header, frames=self.sim.frame if self.frames is None else self.frames)
+        header = json.dumps(header).encode()
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.array([VERSION, len(header)], "<u4").tobytes())
+            f.write(header)
+            f.write(np.array(self.events, EVENT).tobytes())
+
+
+def load(path):
+    """The header and the events of a recording"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a recording")
+        version, length = np.frombuffer(f.read(8), "<u4").tolist()
+        if version > VERSION:
+            raise ValueError(f"{path} is a version {version} recording, this version reads up to {VERSION}")
+        header = json.loads(f.read(length))
+        events = np.frombuffer(f.read(), EVENT)
+    return header, events
+
+
+def replay(path, engine=None, profile=False, **kwargs):
+    """Run a recording on a new simulation and return it. engine ("objects" or "arrays") defaults to the recorded
+    one, profile turns the simulation's profiler on and other keyword arguments go to its constructor."""
+    header, events = load(path)
+    ids = {cls.__name__: cls for cls in MATERIALS}
+    materials = [ids[name] for name in header["materials"]]
+    for name in ("seed", "ambient_temperature", "all_neighbours_temp", "active_chunks", "chunk_size"):
+        kwargs.setdefault(name, header[name])
+    engine = engine or header["engine"]
+    if engine == header["engine"]:
+        kwargs.setdefault("thermal_backend", header["thermal_backend"])
+    sim = _engines()[engine](header["width"], header["height"], **kwargs)
+    sim.profiler.enabled = profile
+
+    # Events come in frame order, the ones of a frame are applied right before it runs
+    starts = np.searchsorted(events["frame"], np.arange(header["frames"] + 1)).tolist() + [len(events)]
+    for frame in range(header["frames"] + 1):
+        for event in events[starts[frame]:starts[frame + 1]].tolist():
+            _, kind, material, x0, y0, x1, y1, value = event
+            if kind == PLACE:
+                sim.place(x0, y0, materials[material], None if np.isnan(value) else value)
+            elif kind == FILL:
+                sim.fill(x0, y0, x1, y1, materials[material])
+            else:
+                sim.ambient_temperature = value
+        if frame < header["frames"]:
+            sim.step()
+    return sim
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--engine", choices=_engines(), help="replay on this engine instead of the recorded one")
+    parser.add_argument("--profile", action="store_true", help="also report the mean time of every pass")
+    parser.add_argument("--output", help="write the timings to this JSON file")
+    args = parser.parse_args()
+
+    header, events = load(args.path)
+    start = time.perf_counter()
+    sim = replay(args.path, args.engine, args.profile)
+    seconds = time.perf_counter() - start
+    sim.close()
+    result = {
+        "recording": args.path,
+        "engine": engine_name(sim),
+        "width": sim.width,
+        "height": sim.height,
+        "frames": header["frames"],
+        "events": len(events),
+        "seconds": round(seconds, 4),
+        "steps_per_sec": round(header["frames"] / seconds, 3) if seconds else None,
+    }
+    print(f"{result['engine']} {sim.width}x{sim.height}: {header['frames']} frames and {len(events)} events "
+          f"in {seconds:.2f}s, {result['steps_per_sec']} steps/sec")
+    if args.profile:
+        result["pass_seconds"] = {name: round(stats[0], 6) for name, stats in sim.profiler.summary().items()}
+        result["counts"] = {name: round(value, 1) for name, value in sim.profiler.counts().items()}
+        print("    " + "  ".join(f"{name} {seconds * 1000:.2f}ms" for name, seconds in result["pass_seconds"].items()))
+        print("    per frame: " + "  ".join(f"{name} {value:g}" for name, value in result["counts"].items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
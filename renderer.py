@@ -0,0 +1,115 @@
+from colorsys import hsv_to_rgb
+
+import numpy as np
+import pygame
+
+from particles import empty
+
+TILE_SIZE = 16 # Cells per side of the squares the renderer checks for changes
+
+r_hue = 0/360.0
+g_hue = 120/360.0
+b_hue = 240/360.0
+THERMOGRAM_STEPS = 1024
+
+
+def thermogram_lut(steps=THERMOGRAM_STEPS):
+    """Thermogram colors from the coldest cell (index 0) over the average (the middle) to the hottest"""
+    lut = np.zeros((steps, 3), np.uint8)
+    for i in range(steps):
+        n_temp = 2 * i / (steps - 1)
+        if n_temp < 1:
+            rgb = hsv_to_rgb(b_hue + n_temp * (g_hue - b_hue), 1, .4)
+        else:
+            rgb = hsv_to_rgb(g_hue + (n_temp - 1) * (r_hue - g_hue), 1, .4)
+        lut[i] = [int(c * 255) for c in rgb]
+    return lut
+
+THERMOGRAM_LUT = thermogram_lut()
+
+
+def as_rgb(colors):
+    """A [y][x] grid of colors as a (height, width, 3) uint8 array"""
+    colors = np.asarray(colors)
+    if colors.dtype != np.uint8:
+        colors = np.clip(colors, 0, 255).astype(np.uint8)
+    return colors
+
+
+def thermogram_colors(colors, temperatures, materials):
+    """Copy of colors with every empty cell showing its temperature, from blue (cold) over green to red (hot)"""
+    min_temp = float(temperatures.min())
+    max_temp = float(temperatures.max())
+    avg_temp = float(temperatures.mean())
+    #^ Clamp extremes to prevent skewing
+    if max_temp < 100:
+        max_temp = 50
+    if min_temp > 0:
+        min_temp = 0
+    # Below the average maps onto the first half of the LUT, above it onto the second half
+    cold = temperatures < avg_temp
+    position = np.full(temperatures.shape, 0.5)
+    low = avg_temp - min_temp
+    high = max_temp - avg_temp
+    position[cold] = (temperatures[cold] - min_temp) / low / 2 if low else 0.0
+    if high:
+        position[~cold] = 0.5 + (temperatures[~cold] - avg_temp) / high / 2
+    index = np.clip(position * (THERMOGRAM_STEPS - 1), 0, THERMOGRAM_STEPS - 1).astype(np.intp)
+    is_empty = materials == empty.material_id
+    colors = as_rgb(colors).copy()
+    colors[is_empty] = THERMOGRAM_LUT[index[is_empty]]
+    return colors
+
+
+class Renderer:
+    """Draws the world through a width x height pixel buffer that is scaled up to cell_size in one blit.
+
+    draw() returns the screen rects that changed since the last frame, so the caller can push just those
+    with pygame.display.update(rects).
+    """
+    def __init__(self, screen, width, height, cell_size, tile_size=TILE_SIZE):
+        self.screen = screen
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.tile_size = tile_size
+        self.buffer = pygame.Surface((width, height))
+        self.scaled = pygame.Surface((width * cell_size, height * cell_size))
+        self.rect = self.scaled.get_rect()
+        self.previous = None
+        self._rows = np.arange(0, height, tile_size)
+        self._cols = np.arange(0, width, tile_size)
+
+    def draw(self, colors):
+        """Draw a [y][x] grid of RGB colors onto the screen and return the rects that changed"""
+        colors = as_rgb(colors)
+        rects = self.dirty_rects(colors)
+        if rects:
+            pygame.surfarray.blit_array(self.buffer, colors.swapaxes(0, 1))
+            pygame.transform.scale(self.buffer, self.rect.size, self.scaled)
+            self.screen.blit(self.scaled, (0, 0))
+        self.previous = colors.copy()
+        return rects
+
+    def invalidate(self):
+        # Redraw everything on the next frame, e.g. after something else drew over the grid
+        self.previous = None
+
+    def dirty_rects(self, colors):
+        if self.previous is None:
+            return [self.rect]
+        changed = (colors != self.previous).any(axis=2)
+        if not changed.any():
+            return []
+        tiles = np.logical_or.reduceat(np.logical_or.reduceat(changed, self._rows, axis=0), self._cols, axis=1)
+        if tiles.mean() > 0.5:
+            return [self.rect]
+        # One rect per horizontal run of changed tiles
+        pixels = self.tile_size * self.cell_size
+        rects = []
+        for ty, row in enumerate(tiles):
+            edges = np.flatnonzero(np.diff(np.concatenate(([False], row, [False])).astype(np.int8)))
+            for x0, x1 in zip(edges[::2], edges[1::2]):
+                rect = pygame.Rect(int(x0) * pixels, ty * pixels, int(x1 - x0) * pixels, pixels)
+                rects.append(rect.clip(self.rect))
+        return rects
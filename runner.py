@@ -0,0 +1,111 @@
+"""Runs a simulation on its own thread at a fixed timestep, apart from whatever draws it.
+
+The thread steps the simulation steps_per_sec * speed times a second (a speed below 1 is slow motion), or as fast
+as it can in turbo mode. After a step it hands over a copy of what there is to draw (a RenderState) whenever the
+UI has taken the previous one, so the UI always draws the latest finished frame, the simulation keeps its own
+arrays to itself and neither waits for the other. Everything that changes the world goes through call(), which
+runs it on the simulation thread between two steps.
+"""
+import threading
+from collections import deque, namedtuple
+from time import perf_counter, sleep
+
+import numpy as np
+
+STEPS_PER_SEC = 60
+MIN_SPEED, MAX_SPEED = 0.125, 8.0
+MAX_LAG = 0.25 # Seconds behind schedule after which the clock resets instead of catching up
+
+# A finished frame as the UI gets it. temperatures and materials are only there in thermogram mode,
+# stats and counts (the profiler summary and counters) only while the profiler is on. origin is the world
+# cell the arrays start at, (0, 0) unless only part of the world is simulated (paging.py).
+RenderState = namedtuple("RenderState", ["frame", "colors", "temperatures", "materials", "stats", "origin", "counts"])
+
+
+class SimulationRunner:
+    """Steps sim on a thread of its own, see the module docstring. start() it, stop() it when done."""
+    def __init__(self, sim, steps_per_sec=STEPS_PER_SEC):
+        self.sim = sim
+        self.steps_per_sec = steps_per_sec
+        self.speed = 1.0
+        self.turbo = False # As many steps as possible, whatever speed says
+        self.paused = False
+        self.thermogram = False # Also hand over temperatures and materials
+        self.achieved = 0.0 # Steps per second actually run, updated twice a second
+        self._commands = deque()
+        self._latest = None
+        self._wanted = True
+        self._running = False
+        self._thread = None
+
+    def call(self, fn, *args):
+        """Run fn(*args) on the simulation thread before the next step"""
+        self._commands.append((fn, args))
+
+    def latest(self):
+        """The last RenderState handed over (None before the first), and ask for the next one"""
+        state = self._latest
+        self._wanted = True
+        return state
+
+    def change_speed(self, factor):
+        self.speed = min(MAX_SPEED, max(MIN_SPEED, self.speed * factor))
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread after the step it's on, running whatever call() still has queued"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._run_commands()
+
+    def _run_commands(self):
+        ran = bool(self._commands)
+        while self._commands:
+            fn, args = self._commands.popleft()
+            fn(*args)
+        return ran
+
+    def _publish(self):
+        sim = self.sim
+        self._wanted = False
+        thermogram = self.thermogram
+        self._latest = RenderState(
+            sim.frame,
+            np.array(sim.colors()),
+            np.array(sim.temperatures()) if thermogram else None,
+            np.array(sim.materials()) if thermogram else None,
+            sim.profiler.summary() if sim.profiler.enabled else None,
+            getattr(sim, "origin", (0, 0)),
+            sim.profiler.counts() if sim.profiler.enabled else None,
+        )
+
+    def _run(self):
+        next_step = perf_counter()
+        window_start, window_steps = next_step, 0
+        while self._running:
+            changed = self._run_commands()
+            now = perf_counter()
+            if self.paused:
+                next_step = now
+            elif self.turbo or now >= next_step:
+                self.sim.step()
+                changed = True
+                window_steps += 1
+                next_step = max(next_step + 1 / (self.steps_per_sec * self.speed), now - MAX_LAG)
+            if now - window_start >= 0.5:
+                self.achieved = window_steps / (now - window_start)
+                window_start, window_steps = now, 0
+            if self._wanted and (changed or self._latest is None or (self.thermogram and self._latest.temperatures is None)):
+                self._publish()
+            if self.paused:
+                sleep(0.005)
+            elif not self.turbo:
+                wait = next_step - perf_counter()
+                if wait > 0:
+                    sleep(min(wait, 0.005))
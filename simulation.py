@@ -0,0 +1,868 @@
+from colorsys import hsv_to_rgb, rgb_to_hsv
+from functools import lru_cache
+from random import Random
+
+import numpy as np
+
+import particles
+import thermal
+from chunks import AMBIENT_DELTA, CHUNK_SIZE, SETTLED_DELTA, SLEEP_FRAMES, Chunks, grow
+from entities import IS_BALL, Balls
+from profiler import Profiler
+from particles import *
+
+CONDUCTIVITY, DECAY_FACTOR, IGNORE_COOLING = thermal.material_properties(MATERIALS)
+# Materials that keep changing when nothing around them moves: gases drift, balls bounce, fire burns out,
+# mud and wet sand dry, crystal spreads color and acid eats the metal next to it
+RESTLESS = np.array([issubclass(cls, (LightGas, Bouncy, fire, cold_fire, mud, wet_sand, crystal, acid)) for cls in MATERIALS])
+# Materials whose movement only depends on which materials are next to them, so once one can't move it can't
+# until a neighbour changes. These fall asleep after SLEEP_FRAMES and the movement pass skips them.
+SLEEPS = np.array([issubclass(cls, (Granular, StraightFalling)) for cls in MATERIALS])
+# Liquids only flow sideways on a coin flip, so one that stayed put with room beside it keeps its chunk awake
+FLOWS = np.array([issubclass(cls, Liquid) for cls in MATERIALS])
+# Materials whose color or state follows their temperature, so they stay awake until it settles
+HEAT_SENSITIVE = np.array([any(hasattr(probe, name) for name in ('melt_to', 'solidify_to', 'evap_to', 'condense_to'))
+                           for probe in (cls() for cls in MATERIALS)])
+
+
+def transition_temp(probe, kinds, pick, default):
+    """The temperature past which probe changes state, pick() of the <kind>_temp of every <kind>_to it has"""
+    return pick([getattr(probe, kind + '_temp') for kind in kinds if hasattr(probe, kind + '_to')], default=default)
+
+
+# Temperatures at which those change state, at or below TRANSITION_BELOW (solidify, condense) or at or above
+# TRANSITION_ABOVE (melt, evaporate). A cell past one stays awake however slowly its temperature still drifts.
+TRANSITION_BELOW = np.array([transition_temp(cls(), ('solidify', 'condense'), max, -np.inf) for cls in MATERIALS])
+TRANSITION_ABOVE = np.array([transition_temp(cls(), ('melt', 'evap'), min, np.inf) for cls in MATERIALS])
+BURNS_OUT = (fire, cold_fire)
+DRIES_TO = {mud: dirt, wet_sand: sand}
+SPREADS_COLOR = (crystal,)
+# Special behaviours in the order they run, each with the test that picks the materials that have it.
+# Every name is a Simulation method taking (x, y, particle), and a new material gets whatever its attributes ask for.
+SPECIAL_BEHAVIOURS = [
+    ("condense", lambda p: hasattr(p, 'condense_to')),
+    ("burn_out", lambda p: isinstance(p, BURNS_OUT)),
+    ("solidify", lambda p: hasattr(p, 'solidify_to')),
+    ("melt", lambda p: hasattr(p, 'melt_to')),
+    ("evaporate", lambda p: hasattr(p, 'evap_to')),
+    ("dry", lambda p: type(p) in DRIES_TO),
+    ("corrode", lambda p: hasattr(p, 'corroded_color')),
+    ("spread_color", lambda p: isinstance(p, SPREADS_COLOR)),
+]
+# Names of the special behaviours of every material, indexed by material id. Empty for most materials.
+SPECIALS = [tuple(name for name, applies in SPECIAL_BEHAVIOURS if applies(probe)) for probe in (cls() for cls in MATERIALS)]
+# Neighbours in the order check_interactions() tries them: below, above, right, left,
+# bottom-right, bottom-left, top-right, top-left
+NEIGHBOUR_ORDER = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, 1), (1, -1), (-1, -1)]
+RAMP_STEPS = 64
+RAMPS = ("solidify_ramp", "melt_ramp", "corrode_ramp")
+# How the particle slots go into snapshots, as (dtype, values per cell), in the order they are restored.
+# Ramps only get their bit in the "slots" mask and are rebuilt from the colors, ramp_step is stored as
+# ramp index * RAMP_STEPS + step, and moved_frame is left out since it only matters within a frame.
+SLOT_FIELDS = {
+    "temperature": (np.float64, 1),
+    "color": (np.float64, 3), # dry() fades colors in fractions
+    "spawn_color": (np.uint8, 3),
+    "_solidify_color": (np.uint8, 3),
+    "_melt_color": (np.uint8, 3),
+    "_corroded_color": (np.uint8, 3),
+    "original_temp": (np.float64, 1),
+    "acidification_progress": (np.float64, 1),
+    "acidification_tick": (np.float64, 1),
+    "lifetime": (np.int32, 1),
+    "max_lifetime": (np.int32, 1),
+    "viscosity_timer": (np.int32, 1),
+    "condensing_framecount": (np.int32, 1),
+    "condense_timer": (np.int32, 1),
+    "current_direction": (np.uint8, 1), # Index into Bouncy.directions
+    "solidify_ramp": (None, 0),
+    "melt_ramp": (None, 0),
+    "corrode_ramp": (None, 0),
+    "ramp_step": (np.int16, 1),
+}
+
+
+class ColorRamp:
+    """RAMP_STEPS colors from one color to another, interpolated in HSV. Each step is worked out the first time it's used."""
+    def __init__(self, from_color, to_color):
+        self.start = rgb_to_hsv(from_color[0] / 255.0, from_color[1] / 255.0, from_color[2] / 255.0)
+        self.end = rgb_to_hsv(to_color[0] / 255.0, to_color[1] / 255.0, to_color[2] / 255.0)
+        self.colors = [None] * RAMP_STEPS
+
+    def __getitem__(self, step):
+        color = self.colors[step]
+        if color is None:
+            progress = step / (RAMP_STEPS - 1)
+            start, end = self.start, self.end
+            new_rgb = hsv_to_rgb(start[0] + (end[0] - start[0]) * progress,
+                                 start[1] + (end[1] - start[1]) * progress,
+                                 start[2] + (end[2] - start[2]) * progress)
+            # assign ints and clamp
+            color = (int(max(0, min(255, new_rgb[0] * 255))),
+                     int(max(0, min(255, new_rgb[1] * 255))),
+                     int(max(0, min(255, new_rgb[2] * 255))))
+            self.colors[step] = color
+        return color
+
+
+@lru_cache(maxsize=4096)
+def color_ramp(from_color, to_color):
+    # Particles with the same spawn and target colors share a ramp
+    return ColorRamp(from_color, to_color)
+
+
+def ramp_started(p, progress):
+    # Until a particle reaches the first ramp step it keeps its spawn color, so its target color isn't needed yet
+    return hasattr(p, 'ramp_step') or progress * (RAMP_STEPS - 1) >= 1
+
+
+def apply_ramp(p, ramp, progress):
+    """Color p with the ramp step for progress (0 to 1), unless that step is what it already shows"""
+    step = ramp, int(max(0.0, min(1.0, progress)) * (RAMP_STEPS - 1))
+    if getattr(p, 'ramp_step', None) != step:
+        p.color = ramp[step[1]]
+        p.ramp_step = step
+
+
+class Simulation:
+    """The powder world as a grid of Particle objects. Runs headless, pygame is only needed to look at it."""
+    thermal_backends = ("numpy", "loop")
+
+    def __init__(self, width=100, height=100, ambient_temperature=10, all_neighbours_temp=True, thermal_backend="numpy",
+                 active_chunks=True, chunk_size=CHUNK_SIZE, seed=None):
+        self.width = width
+        self.height = height
+        self.ambient_temperature = ambient_temperature
+        self.all_neighbours_temp = all_neighbours_temp # If true, particles will consider all 8 neighbours for thermal conduction, not just orthogonal ones
+        if thermal_backend not in self.thermal_backends:
+            raise ValueError(f"thermal_backend must be one of {self.thermal_backends}, not {thermal_backend!r}")
+        self.thermal_backend = thermal_backend # "numpy" conducts heat for the whole grid at once, "loop" goes cell by cell
+        self.frame = 0
+        # Every random number of the world comes from here (particles.use_rng()), so the same seed and the same
+        # inputs give the same run. Without a seed one is picked, it's kept in self.seed either way.
+        self.seed = Random().getrandbits(32) if seed is None else seed
+        self.random = Random(self.seed)
+        particles.use_rng(self.random)
+        self.profiler = Profiler() # Per-pass timings, off until profiler.enabled is set
+        self.chunks = Chunks(width, height, chunk_size, active_chunks) # Settled chunks are skipped by movement, specials and interactions
+        # Frames in a row the particle in each cell tried to move and couldn't. Off with the chunks.
+        self.idle = np.zeros((height, width), np.uint8)
+        self._sleeps = SLEEPS if active_chunks else np.zeros_like(SLEEPS)
+        # Chunks whose temperatures are still moving. The thermal pass only visits those and the ones the movement
+        # keeps awake, the others catch up on the ambient decay they skipped when they are next needed (_catch_up()).
+        self.heat = Chunks(width, height, chunk_size, active_chunks)
+        self._heat_lag = np.zeros(self.heat.awake.shape, np.int64) # Thermal steps every chunk skipped
+        self._heat_ambient = ambient_temperature # What those steps decay towards
+        self.balls = Balls(width, height) # Bouncy particles, moved without looking for them on the grid
+        self._build_world()
+
+    def _build_world(self):
+        self.grid = [[empty() for _ in range(self.width)] for _ in range(self.height)]
+        self._specials = [tuple(getattr(self, name) for name in names) for names in SPECIALS]
+        self._ids = None # Material ids as the last thermal pass saw them
+
+    @property
+    def ambient_temperature(self):
+        return self._ambient_temperature
+
+    @ambient_temperature.setter
+    def ambient_temperature(self, value):
+        # New particles spawn around the ambient temperature
+        self._ambient_temperature = value
+        particles.ambient_temperature = value
+
+    def close(self):
+        """Stop whatever the simulation runs outside this process, like the movement workers of the array engine"""
+
+    def step(self, n=1):
+        """Advance the world by n frames"""
+        for _ in range(n):
+            self.update_frame()
+
+    def place(self, x, y, material, temperature=None):
+        """Put a fresh particle of class `material` at (x, y), optionally at a given temperature"""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self._wake(x, y, x + 1, y + 1)
+            particles.ambient_temperature = self.ambient_temperature
+            particles.use_rng(self.random)
+            self.grid[y][x] = material()
+            if temperature is not None:
+                self.grid[y][x].temperature = temperature
+            self._track_balls(x, y, x + 1, y + 1)
+
+    def fill(self, x0, y0, x1, y1, material):
+        """Fill the rectangle [x0, x1) x [y0, y1) with fresh particles of class `material`"""
+        self._wake(x0, y0, x1, y1)
+        particles.ambient_temperature = self.ambient_temperature
+        particles.use_rng(self.random)
+        for y in range(max(0, y0), min(self.height, y1)):
+            for x in range(max(0, x0), min(self.width, x1)):
+                self.grid[y][x] = material()
+        self._track_balls(x0, y0, x1, y1)
+
+    def material_at(self, x, y):
+        return type(self.grid[y][x])
+
+    def temperature_at(self, x, y):
+        cell = self.grid[y][x]
+        lag = self._heat_lag[y // self.heat.size, x // self.heat.size]
+        return float(thermal.decay(cell.temperature, DECAY_FACTOR[cell.material_id], IGNORE_COOLING[cell.material_id],
+                                   self._heat_ambient, lag))
+
+    def colors(self):
+        """Current color of every cell, indexed [y][x]"""
+        return [[cell.color for cell in row] for row in self.grid]
+
+    def materials(self):
+        """Material id of every cell as a (height, width) array"""
+        cells = [cell for row in self.grid for cell in row]
+        return np.fromiter((cell.material_id for cell in cells), np.uint8, len(cells)).reshape(self.height, self.width)
+
+    def temperatures(self):
+        """Temperature of every cell as a (height, width) array"""
+        cells = [cell for row in self.grid for cell in row]
+        temps = np.fromiter((cell.temperature for cell in cells), np.float64, len(cells)).reshape(self.height, self.width)
+        return self._caught_up(temps, self.materials())
+
+    def snapshot(self):
+        """Copy of the world state as NumPy arrays: material ids, temperatures and colors"""
+        cells = [cell for row in self.grid for cell in row]
+        return {
+            "frame": self.frame,
+            "width": self.width,
+            "height": self.height,
+            "ambient_temperature": self.ambient_temperature,
+            "material": self.materials(),
+            "temperature": self.temperatures(),
+            "color": np.array([[int(c) for c in cell.color] for cell in cells], np.uint8).reshape(self.height, self.width, 3),
+        }
+
+    def state_arrays(self):
+        """The whole world as named arrays, for snapshots.save()"""
+        self._store_balls()
+        cells = [cell for row in self.grid for cell in row]
+        n = len(cells)
+        present = np.zeros(n, np.uint32) # Bit i is set when the particle has the i-th slot of SLOT_FIELDS
+        arrays = {"material": self.materials()}
+        for bit, (name, (dtype, channels)) in enumerate(SLOT_FIELDS.items()):
+            index, values = [], []
+            for i, cell in enumerate(cells):
+                value = getattr(cell, name, None)
+                if value is not None:
+                    index.append(i)
+                    values.append(value)
+            present[index] |= 1 << bit
+            if dtype is None:
+                continue
+            if name == "current_direction":
+                values = [Bouncy.directions.index(value) for value in values]
+            elif name == "ramp_step":
+                values = [next(r for r, ramp in enumerate(RAMPS) if getattr(cells[i], ramp, None) is value[0]) * RAMP_STEPS + value[1]
+                          for i, value in zip(index, values)]
+            field = np.zeros((n, channels) if channels > 1 else n, dtype)
+            if index:
+                field[index] = values
+            arrays[name] = field.reshape((self.height, self.width) + field.shape[1:])
+        arrays["slots"] = present.reshape(self.height, self.width)
+        return arrays
+
+    def load_state(self, arrays):
+        """Replace the world with the arrays of state_arrays(), material ids already matching MATERIALS"""
+        n = self.width * self.height
+        cells = []
+        for material_id in arrays["material"].ravel().tolist():
+            cls = MATERIALS[material_id]
+            cell = cls.__new__(cls)
+            cell.moved_frame = -1
+            cells.append(cell)
+        present = arrays["slots"].ravel()
+        for bit, (name, (dtype, channels)) in enumerate(SLOT_FIELDS.items()):
+            index = np.flatnonzero(present & (1 << bit))
+            if dtype is None:
+                # The same ramps solidify(), melt() and corrode() build
+                target = {"solidify_ramp": 'solidify_color', "melt_ramp": 'melt_color'}.get(name)
+                for i in index.tolist():
+                    p = cells[i]
+                    setattr(p, name, color_ramp(p.spawn_color, getattr(p, target) if target else acid.base_color))
+                continue
+            values = arrays[name].reshape((n, channels) if channels > 1 else n)[index].tolist()
+            if name == "color":
+                values = [tuple(int(c) if c.is_integer() else c for c in value) for value in values]
+            elif channels > 1:
+                values = [tuple(value) for value in values]
+            elif name == "current_direction":
+                values = [Bouncy.directions[value] for value in values]
+            for i, value in zip(index.tolist(), values):
+                if name == "ramp_step":
+                    value = getattr(cells[i], RAMPS[value // RAMP_STEPS]), value % RAMP_STEPS
+                setattr(cells[i], name, value)
+        self.grid = [cells[y * self.width:(y + 1) * self.width] for y in range(self.height)]
+        self._heat_lag[:] = 0
+        self._wake(0, 0, self.width, self.height)
+        self._track_balls(0, 0, self.width, self.height)
+
+    def chunk_arrays(self):
+        """What the chunks and the sleeping particles know, for snapshots.save(). state_arrays() is enough to load a
+        world, but without this it wakes up everywhere, so the steps it skipped make it diverge a little."""
+        return {"idle": self.idle, "chunks_awake": self.chunks.awake, "heat_awake": self.heat.awake,
+                "heat_lag": self._heat_lag}
+
+    def load_chunk_arrays(self, arrays, heat_ambient):
+        """Put back what chunk_arrays() returned, after load_state()"""
+        np.copyto(self.idle, arrays["idle"])
+        self.chunks.restore(arrays["chunks_awake"])
+        self.heat.restore(arrays["heat_awake"])
+        np.copyto(self._heat_lag, arrays["heat_lag"])
+        self._heat_ambient = heat_ambient
+
+    #* --- Sleeping particles ---
+
+    def _wake(self, x0, y0, x1, y1):
+        """Wake the chunks and the sleeping particles around the cells [x0, x1) x [y0, y1), before writing to them"""
+        s = self.heat.size
+        chunks = np.zeros_like(self.heat.awake)
+        chunks[max(0, y0 // s):max(y0, y1 - 1) // s + 1, max(0, x0 // s):max(x0, x1 - 1) // s + 1] = True
+        self._catch_up(chunks)
+        self.chunks.wake(x0, y0, x1, y1)
+        self.heat.wake(x0, y0, x1, y1)
+        self.idle[max(0, y0 - 1):max(0, y1 + 1), max(0, x0 - 1):max(0, x1 + 1)] = 0
+
+    def _stir(self, x, y, reach=1):
+        # The particle at (x, y) moved, at most reach cells, wake everything next to where it was and where it went
+        self.idle[max(0, y - 2):y + 3, max(0, x - reach - 1):x + reach + 2] = 0
+
+    def _settle(self, changed):
+        # Wake whatever sleeps next to the cells of the mask, the ones whose material changed
+        if changed.any():
+            self.idle[grow(changed)] = 0
+
+    def _room_to_flow(self, x, y):
+        row = self.grid[y]
+        return (x > 0 and isinstance(row[x - 1], (empty, LightGas))) or \
+            (x < self.width - 1 and isinstance(row[x + 1], (empty, LightGas)))
+
+    def _count_sleep(self, asleep_before):
+        asleep = self.idle >= SLEEP_FRAMES
+        profiler = self.profiler
+        profiler.count("asleep", int(np.count_nonzero(asleep)))
+        profiler.count("fell_asleep", int(np.count_nonzero(asleep & ~asleep_before)))
+        profiler.count("woken", int(np.count_nonzero(asleep_before & ~asleep)))
+
+    #* --- Balls ---
+
+    def _track_balls(self, x0, y0, x1, y1):
+        """Forget the balls in the rectangle [x0, x1) x [y0, y1) and add the ones in it now, after writing to it"""
+        x0, y0, x1, y1 = max(0, x0), max(0, y0), min(self.width, x1), min(self.height, y1)
+        self.balls.drop(x0, y0, x1, y1)
+        found = [(y, x, cell) for y in range(y0, y1) for x, cell in enumerate(self.grid[y][x0:x1], x0)
+                 if isinstance(cell, Bouncy)]
+        if found:
+            ys, xs, cells = zip(*found)
+            self.balls.add(ys, xs, [cell.material_id for cell in cells],
+                           [Bouncy.directions.index(cell.current_direction) for cell in cells],
+                           [getattr(cell, 'viscosity_timer', 0) for cell in cells])
+
+    def _move_balls(self):
+        # The balls take their step before anything else moves, see entities.py
+        if len(self.balls):
+            self._swap_balls(*self.balls.step(self._materials_at))
+
+    def _forget_balls(self):
+        # At the end of a frame, drop the balls that melted or reacted away in it. place(), fill() and load_state()
+        # keep the list up to date themselves.
+        if len(self.balls):
+            self.balls.keep(IS_BALL[self._materials_at(self.balls.y, self.balls.x)])
+
+    def _materials_at(self, ys, xs):
+        grid = self.grid
+        return np.fromiter((grid[y][x].material_id for y, x in zip(ys.tolist(), xs.tolist())), np.intp, len(ys))
+
+    def _store_balls(self):
+        # Hand the directions and timers to the ball particles. Nothing else reads them, so only state_arrays() does this.
+        grid, directions, balls = self.grid, Bouncy.directions, self.balls
+        for y, x, code, timer in zip(balls.y.tolist(), balls.x.tolist(), balls.direction.tolist(), balls.timer.tolist()):
+            cell = grid[y][x]
+            if not isinstance(cell, Bouncy):
+                continue # Melted since the last frame
+            cell.current_direction = directions[code]
+            if hasattr(cell, 'viscosity'):
+                cell.viscosity_timer = timer
+
+    def _swap_balls(self, ys, xs, tys, txs):
+        grid, frame = self.grid, self.frame
+        for y, x, ty, tx in zip(ys.tolist(), xs.tolist(), tys.tolist(), txs.tolist()):
+            grid[ty][tx], grid[y][x] = grid[y][x], grid[ty][tx]
+            grid[ty][tx].moved_frame = frame
+            self.chunks.touch(x, y)
+            self._stir(x, y)
+
+    #* --- Sparse heat ---
+
+    def _heat_cells(self, rows, cols):
+        """Material ids and temperatures of the cells in the slices"""
+        cells = [cell for row in self.grid[rows] for cell in row[cols]]
+        shape = (rows.stop - rows.start, cols.stop - cols.start)
+        ids = np.fromiter((cell.material_id for cell in cells), np.uint8, len(cells)).reshape(shape)
+        return ids, np.fromiter((cell.temperature for cell in cells), np.float64, len(cells)).reshape(shape)
+
+    def _set_heat(self, rows, cols, temps):
+        for row, new_temps in zip(self.grid[rows], temps.tolist()):
+            for cell, new_temp in zip(row[cols], new_temps):
+                cell.temperature = new_temp
+
+    def _lag_cells(self, rows=slice(None), cols=slice(None)):
+        # Skipped thermal steps of every cell, or of the cells in slices starting on the corner of a chunk
+        s = self.heat.size
+        rows, cols = slice(rows.start or 0, rows.stop or self.height), slice(cols.start or 0, cols.stop or self.width)
+        lag = self._heat_lag[rows.start // s:-(-rows.stop // s), cols.start // s:-(-cols.stop // s)]
+        return np.repeat(np.repeat(lag, s, axis=0), s, axis=1)[:rows.stop - rows.start, :cols.stop - cols.start]
+
+    def _caught_up(self, temps, ids):
+        # Temperatures of the whole grid as they'd be without the skipped steps, temps itself when none were
+        if not self._heat_lag.any():
+            return temps
+        return thermal.decay(temps, DECAY_FACTOR[ids], IGNORE_COOLING[ids], self._heat_ambient, self._lag_cells())
+
+    def _catch_up(self, chunks):
+        """Apply the ambient decay the chunks of the per-chunk mask skipped, so their cells are up to date"""
+        chunks = chunks & (self._heat_lag > 0)
+        if not chunks.any():
+            return
+        for rows, cols in thermal.blocks(chunks, self.heat.size, self.width, self.height):
+            ids, temps = self._heat_cells(rows, cols)
+            self._set_heat(rows, cols, thermal.decay(temps, DECAY_FACTOR[ids], IGNORE_COOLING[ids], self._heat_ambient,
+                                                     self._lag_cells(rows, cols)))
+        self._heat_lag[chunks] = 0
+
+    def _start_heat(self):
+        # Before the passes of a frame: whatever they can read or write has to be up to date. The decay of the
+        # skipped steps is only exact towards a fixed ambient temperature, so a new one catches up everything.
+        if self.ambient_temperature != self._heat_ambient:
+            self._catch_up(np.ones_like(self.heat.awake))
+            self._heat_ambient = self.ambient_temperature
+            self.heat.wake(0, 0, self.width, self.height)
+        else:
+            self._catch_up(grow(self.chunks.awake))
+
+    def _heat_region(self):
+        """Chunks the thermal pass visits: the ones whose temperatures are still moving and those around particles
+        that can still move, brought up to date along with the cells around them"""
+        region = self.heat.awake | grow(self.chunks.awake)
+        self._catch_up(grow(region))
+        return region
+
+    def _end_heat(self, region, blocks):
+        # After the thermal pass visited the chunks of region, blocks being (rows, cols, ids, temps, new temps)
+        ambient_temperature = self.ambient_temperature
+        for rows, cols, ids, temps, new_temps in blocks:
+            shifted = np.abs(new_temps - temps) > SETTLED_DELTA
+            changing = (new_temps <= TRANSITION_BELOW[ids]) | (new_temps >= TRANSITION_ABOVE[ids])
+            # Chunks with restless particles, temperatures that haven't settled or cells about to change state stay awake
+            self.chunks.touch_mask(RESTLESS[ids] | (HEAT_SENSITIVE[ids] & shifted) | changing, cols.start, rows.start)
+            self.heat.touch_mask(shifted | (np.abs(new_temps - ambient_temperature) > AMBIENT_DELTA), cols.start, rows.start)
+        self.heat.end_frame()
+        self._heat_lag[~region] += 1
+        self.profiler.count("heated", sum(new_temps.size for *_, new_temps in blocks))
+
+    def update_frame(self):
+        grid = self.grid
+        width, height = self.width, self.height
+        particles.ambient_temperature = self.ambient_temperature
+        particles.use_rng(self.random)
+        profiler = self.profiler
+        profiler.begin_frame(self.frame)
+        asleep_before = self.idle >= SLEEP_FRAMES if profiler.enabled else None
+        self._start_heat()
+        chunks = self.chunks
+        frame = self.frame
+        idle = self.idle.reshape(-1).data # Plain item access is a lot faster than indexing the array
+        sleeps = self._sleeps.tolist()
+        flows = FLOWS.tolist()
+        # First pass: Movement
+        self._move_balls()
+        for y in range(height-1, -1, -1):  # Bottom to top
+            row_start = y * width
+            for x0, x1 in chunks.spans(y):
+                for x in range(x0, x1):
+                    cell = grid[y][x]
+
+                    # Check if the cell has a check_below method and hasn't moved this frame
+                    if hasattr(cell, 'check_movement') and cell.moved_frame != frame:
+                        if idle[row_start + x] >= SLEEP_FRAMES:
+                            continue # Asleep, nothing next to it changed since it last failed to move
+
+                        # Slower moving items all fall under the attribute 'viscosity'
+                        if hasattr(cell, 'viscosity') and not hasattr(cell, 'viscosity_timer'):
+                            cell.viscosity_timer = 0
+                        if hasattr(cell, 'viscosity_timer') and not hasattr(cell, 'viscosity'):
+                            raise LookupError("Viscosity timer found without matching visocisity attribute")
+
+                        if hasattr(cell, 'viscosity'):
+                            cell.viscosity_timer += 1
+                            if cell.viscosity_timer <= cell.viscosity:
+                                continue
+                            if cell.viscosity_timer > cell.viscosity:
+                                cell.viscosity_timer = 0
+                        if cell.check_movement(x, y, grid):
+                            cell.moved_frame = frame
+                            chunks.touch(x, y)
+                            self._stir(x, y, getattr(cell, 'dispersion', 1))
+                        elif sleeps[cell.material_id]:
+                            idle[row_start + x] += 1
+                        elif flows[cell.material_id] and self._room_to_flow(x, y):
+                            chunks.touch(x, y)
+        profiler.lap("movement")
+
+        # Second pass: Check for interactions
+        specials = self._specials
+        for y in range(height):
+            for x0, x1 in chunks.spans(y):
+                for x in range(x0, x1):
+                    cell = grid[y][x]
+
+                    for special in specials[cell.material_id]:
+                        special(x, y, cell)
+                    #^ Example: Aging steam particles eventually turn into water
+
+                    if REACTIVE[grid[y][x].material_id]:
+                        self.check_interactions(x, y)
+                    if grid[y][x] is not cell:
+                        chunks.touch(x, y)
+        profiler.lap("specials")
+
+        # Third pass: Thermal dynamics. There is no reset pass, moved_frame is simply stale next frame
+        if self.thermal_backend == "numpy":
+            self.thermal_stencil()
+        else:
+            self._catch_up(np.ones_like(self.heat.awake)) # The reference visits every cell
+            self.thermal_loop()
+        profiler.lap("thermal")
+
+        self._forget_balls()
+        chunks.end_frame()
+        if asleep_before is not None:
+            self._count_sleep(asleep_before)
+        self.frame += 1
+
+    def thermal_loop(self):
+        # Reference implementation, one cell at a time, in a single sweep. New temperatures go into a row
+        # buffer and are written back one row behind, once no cell left in the sweep reads the old ones.
+        grid = self.grid
+        width, height = self.width, self.height
+        ambient_temperature = self.ambient_temperature
+        all_neighbours_temp = self.all_neighbours_temp
+        ids = np.empty((height, width), np.uint8)
+        temps = np.empty((height, width))
+        new_temps = np.empty((height, width))
+        previous = None
+        for y in range(height):
+            row = grid[y]
+            current = []
+            for x in range(width):
+                cell=row[x]
+                if hasattr(cell, 'ignore_cooling') and cell.ignore_cooling:
+                    current.append(cell.temperature)
+                    continue
+                conduction = 0
+                ambient_decay = cell.temperature + (ambient_temperature - cell.temperature) * cell.decay_factor
+
+                if y > 0:
+                    upper = grid[y-1][x]
+                    conduction += (upper.temperature - cell.temperature) * ((upper.conductivity + cell.conductivity)/2)
+                if y < height-1:
+                    lower = grid[y+1][x]
+                    conduction += (lower.temperature - cell.temperature) * ((lower.conductivity + cell.conductivity)/2)
+                if x > 0:
+                    left = row[x-1]
+                    conduction += (left.temperature - cell.temperature) * ((left.conductivity + cell.conductivity)/2)
+                if x < width-1:
+                    right = row[x+1]
+                    conduction += (right.temperature - cell.temperature) * ((right.conductivity + cell.conductivity)/2)
+                if all_neighbours_temp:
+                    if x > 0 and y > 0:
+                        upper_left = grid[y-1][x-1]
+                        conduction += (upper_left.temperature - cell.temperature) * ((upper_left.conductivity + cell.conductivity)/2) * 0.7071
+                    if x < width-1 and y > 0:
+                        upper_right = grid[y-1][x+1]
+                        conduction += (upper_right.temperature - cell.temperature) * ((upper_right.conductivity + cell.conductivity)/2) * 0.7071
+                    if x > 0 and y < height-1:
+                        lower_left = grid[y+1][x-1]
+                        conduction += (lower_left.temperature - cell.temperature) * ((lower_left.conductivity + cell.conductivity)/2) * 0.7071
+                    if x < width-1 and y < height-1:
+                        lower_right = grid[y+1][x+1]
+                        conduction += (lower_right.temperature - cell.temperature) * ((lower_right.conductivity + cell.conductivity)/2) * 0.7071
+                current.append(ambient_decay + conduction)
+            ids[y] = [cell.material_id for cell in row]
+            temps[y] = [cell.temperature for cell in row]
+            new_temps[y] = current
+            if previous is not None:
+                for cell, new_temp in zip(grid[y-1], previous):
+                    cell.temperature = new_temp
+            previous = current
+        for cell, new_temp in zip(grid[height-1], previous):
+            cell.temperature = new_temp
+        self._touch_unsettled(ids, temps, new_temps)
+
+    def thermal_stencil(self):
+        # Same rule as thermal_loop(), a run of chunks of _heat_region() at a time in thermal.conduct()
+        width, height = self.width, self.height
+        region = self._heat_region()
+        blocks = []
+        for rows, cols in thermal.blocks(region, self.heat.size, width, height):
+            outer, inner = thermal.with_halo(rows, cols, width, height)
+            ids, temps = self._heat_cells(*outer)
+            new_temps = thermal.conduct(temps, CONDUCTIVITY[ids], DECAY_FACTOR[ids], IGNORE_COOLING[ids],
+                                        self.ambient_temperature, self.all_neighbours_temp)
+            blocks.append((rows, cols, ids[inner], temps[inner], new_temps[inner]))
+        # Written back once every block has read the cells around it
+        changed = np.zeros((height, width), bool)
+        first = self._ids is None
+        if first:
+            self._ids = np.zeros((height, width), np.uint8)
+        for rows, cols, ids, _, new_temps in blocks:
+            self._set_heat(rows, cols, new_temps)
+            changed[rows, cols] = ids != self._ids[rows, cols]
+            self._ids[rows, cols] = ids
+        # Materials only change around particles that can move, which are all in the region
+        if not first:
+            self._settle(changed)
+        self._end_heat(region, blocks)
+
+    def _touch_unsettled(self, ids, temps, new_temps):
+        # Both thermal passes get the material ids after everything else ran, so this is where changes
+        # of material since the last frame wake the particles next to them
+        if self._ids is not None:
+            self._settle(ids != self._ids)
+        self._ids = ids
+        self._end_heat(np.ones_like(self.heat.awake), [(slice(0, self.height), slice(0, self.width), ids, temps, new_temps)])
+
+    def handle_particle_specials(self, x, y):
+        target = self.grid[y][x]
+        for special in self._specials[target.material_id]:
+            special(x, y, target)
+
+    def condense(self, x, y, target):
+        #! Handle condensation
+        #! 3 cells need to surround the cell if that cell wants to condense, lowers on lower temperatures. 
+        grid = self.grid
+        width, height = self.width, self.height
+        if target.temperature <= target.condense_temp:
+            target.condense_timer += 1
+            if target.condense_timer >= target.condensing_framecount:
+                # Edge checks for grid boundaries
+                orthogonal_neighbours = 0
+                steam_neighbours = []
+                for yi in range(-1,2):
+                    if orthogonal_neighbours == 3:
+                            break
+                    for xi in range(-1,2):
+                        if orthogonal_neighbours == 3:
+                            break
+
+                        # Wall checks
+                        if y+yi < 0 or y+yi >= height or x+xi < 0 or x+xi >= width:
+                            continue
+                        if yi != xi:
+                            if isinstance(grid[y+yi][x+xi], steam): 
+                                orthogonal_neighbours+=1
+                                steam_neighbours.append((y+yi, x+xi))
+
+                if orthogonal_neighbours == 3:
+                    neighbour_1 = grid[steam_neighbours[0][0]][steam_neighbours[0][1]]
+                    neighbour_2 = grid[steam_neighbours[1][0]][steam_neighbours[1][1]]
+                    neighbour_3 = grid[steam_neighbours[2][0]][steam_neighbours[2][1]]
+                    grid[y][x] = target.condense_to()
+                    grid[y][x].temperature = target.temperature
+                    grid[steam_neighbours[0][0]][steam_neighbours[0][1]] = empty()
+                    grid[steam_neighbours[0][0]][steam_neighbours[0][1]].temperature = neighbour_1.temperature
+                    grid[steam_neighbours[1][0]][steam_neighbours[1][1]] = empty()
+                    grid[steam_neighbours[1][0]][steam_neighbours[1][1]].temperature = neighbour_2.temperature
+                    grid[steam_neighbours[2][0]][steam_neighbours[2][1]] = empty()
+                    grid[steam_neighbours[2][0]][steam_neighbours[2][1]].temperature = neighbour_3.temperature
+
+    def burn_out(self, x, y, target):
+        #! Fire>Dissapear
+        grid = self.grid
+        grid[y][x].lifetime -= 1
+        if grid[y][x].lifetime <= 0:
+            grid[y][x] = empty()
+
+    def solidify(self, x, y, target):
+        #! Handle solidification
+        #! Color transitions will apply.
+        grid = self.grid
+        p = grid[y][x]
+
+        # fixed temp range: hot->cold
+        # Use the correct temperature range for solidifying (from original temp down to solidify_temp)
+        if not hasattr(p, 'original_temp'):
+            p.original_temp = p.temperature  # store the original temp at spawn
+        temp_range = max(1.0, p.original_temp - p.solidify_temp)
+        # Progress should be 0 when hot, 1 when cold (so invert)
+        temp_progress = 1.0 - ((p.temperature - p.solidify_temp) / temp_range)
+        if ramp_started(p, temp_progress):
+            # the ramp runs from the particle's original spawned color to the solidified color
+            if not hasattr(p, 'solidify_ramp'):
+                p.solidify_ramp = color_ramp(p.spawn_color, p.solidify_color)
+            apply_ramp(p, p.solidify_ramp, temp_progress)
+
+        if p.temperature <= p.solidify_temp:
+            grid[y][x] = p.solidify_to()
+            grid[y][x].temperature = p.temperature
+            grid[y][x].color = p.solidify_color
+
+    def melt(self, x, y, target):
+        #! Handle melting
+        #! Color transitions will apply
+        grid = self.grid
+        p = grid[y][x]
+
+        if not hasattr(p, 'original_temp'):
+            p.original_temp = p.temperature  # store the original temp at spawn
+        temp_range = max(1.0, p.melt_temp - p.original_temp)
+        # Progress should be 0 when cold (original), 1 when hot (melted)
+        temp_progress = (p.temperature - p.original_temp) / temp_range
+        if ramp_started(p, temp_progress):
+            # the ramp runs from the particle's original spawned color to the melted color
+            if not hasattr(p, 'melt_ramp'):
+                p.melt_ramp = color_ramp(p.spawn_color, p.melt_color)
+            apply_ramp(p, p.melt_ramp, temp_progress)
+
+        if p.temperature >= p.melt_temp:
+            grid[y][x] = p.melt_to()
+            grid[y][x].temperature = p.temperature
+            grid[y][x].color = p.melt_color
+
+    def evaporate(self, x, y, target):
+        #! Handle evaporation
+        grid = self.grid
+        if target.temperature >= target.evap_temp:
+            grid[y][x] = target.evap_to()
+            grid[y][x].temperature = target.temperature
+
+    def dry(self, x, y, target):
+        #! Mud>Dirt and Wet Sand>Sand
+        grid = self.grid
+        p = grid[y][x]
+        dried = DRIES_TO[type(p)]
+        p.lifetime -= 1
+        red_drying_increment = ((PARTICLE_COLORS[dried][0] - PARTICLE_COLORS[type(p)][0])/p.max_lifetime)
+        green_drying_increment = ((PARTICLE_COLORS[dried][1] - PARTICLE_COLORS[type(p)][1])/p.max_lifetime)
+        blue_drying_increment = ((PARTICLE_COLORS[dried][2] - PARTICLE_COLORS[type(p)][2])/p.max_lifetime)
+        new_r = max(0, min(255, p.color[0] + red_drying_increment))
+        new_g = max(0, min(255, p.color[1] + green_drying_increment))
+        new_b = max(0, min(255, p.color[2] + blue_drying_increment))
+        p.color = (new_r, new_g, new_b)
+
+        if p.lifetime <= 0:
+            grid[y][x] = dried()
+
+    def corrode(self, x, y, target):
+        #! Acidic Corrosion
+        grid = self.grid
+        width, height = self.width, self.height
+        # Check for acid neighbors, accounting for grid edges
+        acid_neighbor = False
+        if y > 0 and isinstance(grid[y-1][x], acid):
+            acid_neighbor = True
+        if y < height - 1 and isinstance(grid[y+1][x], acid):
+            acid_neighbor = True
+        if x < width - 1 and isinstance(grid[y][x+1], acid):
+            acid_neighbor = True
+        if x > 0 and isinstance(grid[y][x-1], acid):
+            acid_neighbor = True
+        if acid_neighbor:
+            # the ramp runs from the particle's original spawned color to the acid color
+            if not hasattr(target, 'corrode_ramp'):
+                target.corrode_ramp = color_ramp(target.spawn_color, acid.base_color)
+
+            if not hasattr(target, 'acidification_progress'):
+                target.acidification_progress = 0
+            if not hasattr(target, 'acidification_tick'):
+                target.acidification_tick = 2
+            target.acidification_progress += target.acidification_tick
+            apply_ramp(target, target.corrode_ramp, target.acidification_progress/100)
+            if target.acidification_progress >= 100:
+                if particles.random() < 0.8:
+                    grid[y][x] = acid()
+                    grid[y][x].temperature = target.temperature
+                    heat_release = 10 + particles.random() * 10  # 10–20 °C bump
+                    grid[y][x].temperature = target.temperature + heat_release
+                else:
+                    grid[y][x] = corrosive_byproducts()
+                    grid[y][x].color = target.corroded_color
+                    grid[y][x].temperature = target.temperature
+                    heat_release = 10 + particles.random() * 10  # 10–20 °C bump
+                    grid[y][x].temperature = target.temperature + heat_release
+
+    def spread_color(self, x, y, target):
+        #! Crystal color spread
+        grid = self.grid
+        width, height = self.width, self.height
+        r_sum = g_sum = b_sum = 0
+        non_empty = 0
+        for i in range(-1,2):
+            for j in range(-1,2):
+                nx, ny = x+i, y+j
+                if (i == 0 and j == 0) or not (0 <= nx < width and 0 <= ny < height):
+                    continue
+                cell = grid[ny][nx]
+                if isinstance(cell, empty):
+                    continue
+                else:
+                    non_empty += 1
+                r_sum += cell.color[0]
+                g_sum += cell.color[1]
+                b_sum += cell.color[2]
+        if non_empty != 0:
+            avg_hsv = rgb_to_hsv(r_sum/non_empty, g_sum/non_empty, b_sum/non_empty)
+            dimmed_rgb = hsv_to_rgb(avg_hsv[0], avg_hsv[1], avg_hsv[2]*0.96)
+
+            grid[y][x].color = dimmed_rgb
+
+    def check_interactions(self, x, y):
+        """Check for interactions with adjacent particles"""
+        grid = self.grid
+        width, height = self.width, self.height
+        interactions = INTERACTION_TABLE[grid[y][x].material_id]
+
+        for dx, dy in NEIGHBOUR_ORDER:
+            new_x, new_y = x + dx, y + dy
+
+            # Bounds checking
+            if 0 <= new_x < width and 0 <= new_y < height:
+                # Check for interaction
+                interaction_func = interactions[grid[new_y][new_x].material_id]
+                if interaction_func:
+                    interaction_func(new_x, new_y, x, y, grid)
+                    return  # Only process one interaction per particle per frame
+
+
+def sa_wa_ws(new_x, new_y, old_x, old_y, grid):
+        grid[new_y][new_x] = wet_sand()
+        grid[old_y][old_x] = empty()
+
+def di_wa_mu(new_x, new_y, old_x, old_y, grid):
+        grid[new_y][new_x] = mud()
+        grid[old_y][old_x] = empty()
+
+def la_st_la(new_x, new_y, old_x, old_y, grid):
+        grid[new_y][new_x] = lava()
+        grid[old_y][old_x] = lava()
+
+INTERACTIONS = {
+    "water+sand": sa_wa_ws, # Wet Sand
+    "sand+water": sa_wa_ws, #
+    "dirt+water": di_wa_mu, # Mud
+    "water+dirt": di_wa_mu, #
+    "lava+stone": la_st_la, # Lava-fy
+    "stone+lava": la_st_la, #
+}
+
+# INTERACTIONS as an N x N table indexed [current material id][neighbour material id], None where nothing happens
+INTERACTION_TABLE = [[None] * len(MATERIALS) for _ in MATERIALS]
+for key, interaction_func in INTERACTIONS.items():
+    current, neighbour = key.split("+")
+    INTERACTION_TABLE[getattr(particles, current).material_id][getattr(particles, neighbour).material_id] = interaction_func
+# Whether a material reacts with anything at all. Cells of the others skip the neighbour scan.
+REACTIVE = [any(row) for row in INTERACTION_TABLE]
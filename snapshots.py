@@ -0,0 +1,155 @@
+"""Save a world to disk and load it back.
+
+A snapshot is a short header followed by the raw arrays of the world, each starting on a 64 byte boundary:
+
+    b"POWDSNAP" | version (uint32) | header length (uint32) | JSON header | array | array | ...
+
+The header holds the engine, the world size, frame and ambient temperature, the seed and random number generator
+states, the material names by id, and the dtype, shape and offset (from the end of the header, rounded up to 64)
+of every array. The awake chunks, sleeping particles and skipped thermal steps (Simulation.chunk_arrays()) are
+saved along with the world, so a loaded world carries on exactly like the saved one would have. Material ids are
+matched up by name on load, so old files still load after materials are added. load() maps the file and copies
+the arrays straight into a new simulation, nothing gets parsed. The header is padded with spaces, so paging.py
+can rewrite it in place.
+
+    snapshots.save(sim, "world.powder")
+    sim = snapshots.load("world.powder")              # the engine it was saved from
+    sim = snapshots.load("world.powder", workers=4)   # anything else goes to the engine's constructor
+"""
+import json
+
+import numpy as np
+
+from particles import MATERIALS
+from simulation import Simulation
+
+MAGIC = b"POWDSNAP"
+VERSION = 1
+ALIGNMENT = 64
+HEADER_ROOM = 1024 # Spare bytes save() leaves after the header, the random states don't always take as many digits
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _engines():
+    engines = {"Simulation": Simulation}
+    try:
+        from array_engine import ArraySimulation
+        engines["ArraySimulation"] = ArraySimulation
+    except ImportError:
+        pass
+    return engines
+
+
+def layout(fields):
+    """Offsets of arrays given as {name: (dtype, shape)}, and the bytes they take up together"""
+    arrays = {}
+    offset = 0
+    for name, (dtype, shape) in fields.items():
+        dtype = np.dtype(dtype)
+        arrays[name] = {"dtype": dtype.str, "shape": list(shape), "offset": offset}
+        offset = _aligned(offset + dtype.itemsize * int(np.prod(shape)))
+    return arrays, offset
+
+
+def state_header(sim):
+    """Everything but the arrays that a snapshot keeps of sim"""
+    return {
+        "engine": type(sim).__name__,
+        "width": sim.width,
+        "height": sim.height,
+        "frame": sim.frame,
+        "ambient_temperature": sim.ambient_temperature,
+        "seed": sim.seed,
+        "random_state": sim.random.getstate(),
+        "rng_state": sim.rng.bit_generator.state if hasattr(sim, "rng") else None,
+        "materials": [cls.__name__ for cls in MATERIALS],
+        "chunk_size": sim.heat.size,
+        "heat_ambient": sim._heat_ambient,
+    }
+
+
+def restore_random(sim, header):
+    """Put the random number generators of sim back to where they were when the header was written"""
+    if header.get("random_state"):
+        version, state, gauss_next = header["random_state"]
+        sim.random.setstate((version, tuple(state), gauss_next))
+    if header.get("rng_state") and hasattr(sim, "rng"):
+        sim.rng.bit_generator.state = header["rng_state"]
+
+
+def write_header(f, header, size=0):
+    """Write the magic number and header at the start of f and return where the arrays start. The header is
+    padded with spaces to size bytes, so a file made with room to spare can have its header rewritten later, up to
+    where the arrays start."""
+    data = json.dumps(header).encode()
+    if size and len(data) > size:
+        raise ValueError(f"the header needs {len(data)} bytes, there are {size}")
+    data = data.ljust(size)
+    f.seek(0)
+    f.write(MAGIC)
+    f.write(np.array([VERSION, len(data)], "<u4").tobytes())
+    f.write(data)
+    return _aligned(len(MAGIC) + 8 + len(data))
+
+
+def save(sim, path):
+    """Write the world of sim to path"""
+    arrays = {name: np.ascontiguousarray(array) for name, array in {**sim.state_arrays(), **sim.chunk_arrays()}.items()}
+    header = state_header(sim)
+    header["arrays"], _ = layout({name: (array.dtype, array.shape) for name, array in arrays.items()})
+    with open(path, "wb") as f:
+        start = write_header(f, header, len(json.dumps(header)) + HEADER_ROOM)
+        for name, array in arrays.items():
+            f.seek(start + header["arrays"][name]["offset"])
+            f.write(array.data)
+
+
+def read_header(path):
+    """The header of a snapshot, the room it has up to the arrays and where the arrays start"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a snapshot")
+        version, length = np.frombuffer(f.read(8), "<u4").tolist()
+        if version > VERSION:
+            raise ValueError(f"{path} is a version {version} snapshot, this version reads up to {VERSION}")
+        header = json.loads(f.read(length))
+    start = _aligned(len(MAGIC) + 8 + length)
+    return header, start - len(MAGIC) - 8, start
+
+
+def map_arrays(header, data, start):
+    """The arrays of a snapshot as views of data, its file mapped with np.memmap"""
+    return {name: np.ndarray(field["shape"], np.dtype(field["dtype"]), buffer=data, offset=start + field["offset"])
+            for name, field in header["arrays"].items()}
+
+
+def read(path):
+    """The header and the arrays of a snapshot, the arrays being read-only views of the mapped file"""
+    header, _, start = read_header(path)
+    return header, map_arrays(header, np.memmap(path, np.uint8, "r"), start)
+
+
+def load(path, **kwargs):
+    """A new simulation of the engine the snapshot was saved from, holding its world"""
+    header, arrays = read(path)
+    ids = {cls.__name__: cls.material_id for cls in MATERIALS}
+    missing = [name for name in header["materials"] if name not in ids]
+    if missing:
+        raise ValueError(f"{path} has materials this version doesn't know: {', '.join(missing)}")
+    material_ids = np.array([ids[name] for name in header["materials"]], np.uint8)
+    arrays["material"] = material_ids[arrays["material"]]
+
+    kwargs.setdefault("ambient_temperature", header["ambient_temperature"])
+    kwargs.setdefault("seed", header.get("seed"))
+    sim = _engines()[header["engine"]](header["width"], header["height"], **kwargs)
+    sim.frame = header["frame"]
+    restore_random(sim, header)
+    sim.load_state(arrays)
+    chunk_arrays = sim.chunk_arrays()
+    if header.get("chunk_size") == sim.heat.size and all(
+            name in arrays and arrays[name].shape == array.shape for name, array in chunk_arrays.items()):
+        sim.load_chunk_arrays({name: arrays[name] for name in chunk_arrays}, header["heat_ambient"])
+    return sim
@@ -0,0 +1,129 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import snapshots
+from array_engine import ArraySimulation
+from entities import IS_BALL
+from particles import Bouncy, bouncy_ball, empty, lava, sand, tungsten
+from simulation import Simulation
+
+ENGINES = [Simulation, ArraySimulation]
+
+
+def listed(sim):
+    return sorted(zip(sim.balls.y.tolist(), sim.balls.x.tolist()))
+
+
+def on_grid(sim):
+    return sorted(map(tuple, np.argwhere(IS_BALL[sim.materials()]).tolist()))
+
+
+def directions(sim):
+    """Bouncy.directions of every listed ball by cell"""
+    return {(y, x): Bouncy.directions[code] for y, x, code in
+            zip(sim.balls.y.tolist(), sim.balls.x.tolist(), sim.balls.direction.tolist())}
+
+
+def bounce(rows, y, x, direction):
+    """Where a ball heading in direction ends up and where it heads next, by Bouncy's rules: grid corners, then
+    corners of particles, then the grid edges, then particles above/below and beside it. Otherwise it moves,
+    trading places with whatever is there."""
+    dy, dx = (1 if "bottom" in direction else -1), (1 if "right" in direction else -1)
+    ty, tx = y + dy, x + dx
+    off_y, off_x = not 0 <= ty < len(rows), not 0 <= tx < len(rows[0])
+    vertical = not off_y and rows[ty][x] is not empty
+    horizontal = not off_x and rows[y][tx] is not empty
+    if (off_y and off_x) or (not off_y and not off_x and vertical and horizontal):
+        dy, dx = -dy, -dx
+    elif off_y or (not off_x and vertical):
+        dy = -dy
+    elif off_x or horizontal:
+        dx = -dx
+    else:
+        y, x = ty, tx
+    return (y, x), ("top" if dy < 0 else "bottom") + ("left" if dx < 0 else "right")
+
+
+def ready_ball(engine, rows, y, x, direction):
+    sim = engine(len(rows[0]), len(rows), seed=1)
+    for cy, row in enumerate(rows):
+        for cx, cls in enumerate(row):
+            if cls is not empty:
+                sim.place(cx, cy, cls)
+    sim.place(x, y, bouncy_ball)
+    # The ball waits out its viscosity first, every frame after that it's ready
+    sim.balls.direction[:] = Bouncy.directions.index(direction)
+    sim.balls.timer[:] = sim.balls.viscosity
+    return sim
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_bounces_follow_bouncy(engine):
+    rng = np.random.default_rng(5)
+    for _ in range(12):
+        rows = [[(empty, tungsten, sand)[i] for i in rng.choice(3, 4, p=[0.6, 0.3, 0.1])] for _ in range(4)]
+        for y, x, direction in itertools.product(range(4), range(4), Bouncy.directions):
+            world = [row[:] for row in rows]
+            world[y][x] = empty
+            sim = ready_ball(engine, world, y, x, direction)
+            sim._move_balls() # Just the balls, before sand falls
+            assert directions(sim) == dict([bounce(world, y, x, direction)]), (world, y, x, direction)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_balls_bounce_off_each_other(engine):
+    sim = engine(8, 8, seed=1)
+    sim.place(2, 2, bouncy_ball)
+    sim.place(3, 3, bouncy_ball)
+    sim.place(6, 2, bouncy_ball)
+    sim.balls.timer[:] = sim.balls.viscosity
+    codes = {cell: Bouncy.directions.index(direction) for cell, direction in
+             [((2, 2), "bottomright"), ((3, 3), "topleft"), ((2, 6), "bottomleft")]}
+    sim.balls.direction[:] = [codes[cell] for cell in zip(sim.balls.y.tolist(), sim.balls.x.tolist())]
+    sim._move_balls()
+    # Heading into each other they both turn around without moving, the third ball is free to go
+    assert directions(sim) == {(2, 2): "topleft", (3, 3): "bottomright", (3, 5): "bottomleft"}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_same_cell_goes_to_the_first_ball(engine):
+    sim = engine(8, 8, seed=1)
+    sim.place(2, 2, bouncy_ball)
+    sim.place(4, 2, bouncy_ball)
+    sim.balls.timer[:] = sim.balls.viscosity
+    sim.balls.direction[:] = [Bouncy.directions.index("bottomright"), Bouncy.directions.index("bottomleft")]
+    sim._move_balls()
+    assert directions(sim) == {(3, 3): "bottomright", (2, 4): "bottomleft"} # The second waits its turn
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_ball_list_follows_the_grid(engine, tmp_path):
+    sim = engine(32, 32, ambient_temperature=20, seed=2)
+    sim.fill(4, 4, 12, 8, bouncy_ball)
+    sim.place(20, 20, bouncy_ball)
+    sim.step(10)
+    assert len(sim.balls) == 33 and listed(sim) == on_grid(sim)
+
+    sim.fill(0, 0, 32, 6, empty) # Paint over some of them
+    sim.place(30, 30, bouncy_ball)
+    sim.place(sim.balls.x[0], sim.balls.y[0], sand)
+    assert listed(sim) == on_grid(sim)
+    sim.step(10)
+    assert listed(sim) == on_grid(sim)
+
+    snapshots.save(sim, tmp_path / "world.powder")
+    loaded = snapshots.load(tmp_path / "world.powder")
+    assert listed(loaded) == on_grid(loaded) == on_grid(sim)
+    assert directions(loaded) == directions(sim)
+
+    # Melting takes a ball off the list the frame it happens
+    sim.fill(0, 28, 32, 32, lava)
+    melted = False
+    for _ in range(200):
+        count = len(sim.balls)
+        sim.step(1)
+        melted |= len(sim.balls) < count
+        assert listed(sim) == on_grid(sim)
+    assert melted
@@ -0,0 +1,33 @@
+import json
+
+import numpy as np
+import pytest
+
+import benchmark
+from particles import empty
+
+
+@pytest.mark.parametrize("scene", benchmark.SCENES)
+def test_scenes_build_alike_on_both_engines(scene):
+    sims = [benchmark.build(scene, engine, 30) for engine in ("objects", "arrays")]
+    objects, arrays = sims
+    assert np.array_equal(objects.materials(), arrays.materials())
+    assert (arrays.materials() != empty.material_id).any()
+    assert objects.ambient_temperature == arrays.ambient_temperature
+    for sim in sims:
+        sim.step(2)
+        sim.close()
+
+
+def test_run_case_reports_a_result(tmp_path, capsys):
+    result = benchmark.run_case("lava_flood", "arrays", 24, 3, memory=True, profile=True)
+    assert (result["scene"], result["engine"], result["width"], result["steps"], result["workers"]) == ("lava_flood", "arrays", 24, 3, 1)
+    assert result["steps_per_sec"] > 0 and result["cells_per_sec"] > 0
+    assert result["peak_memory_mb"] > 0 and result["bytes_per_cell"] > 0
+    assert "movement" in result["passes"] and "total" in result["pass_seconds"]
+    assert "asleep" in result["counts"]
+
+    baseline = tmp_path / "before.json"
+    baseline.write_text(json.dumps({"results": [dict(result, steps_per_sec=result["steps_per_sec"] / 2)]}))
+    benchmark.compare([result], baseline)
+    assert "lava_flood   arrays     24x24     2.00x steps/sec" in capsys.readouterr().out
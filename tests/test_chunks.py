@@ -0,0 +1,36 @@
+import numpy as np
+
+from array_engine import ArraySimulation
+from simulation import Simulation
+from particles import ice, sand, water
+
+
+def test_water_freezes_with_chunks_asleep():
+    # Water cooling towards -1 °C drifts less than SETTLED_DELTA a frame long before it gets below 0, its chunks
+    # have to stay awake for solidify() anyway
+    sims = [Simulation(16, 16, ambient_temperature=20, seed=1, active_chunks=active) for active in (True, False)]
+    for sim in sims:
+        sim.fill(0, 0, 16, 16, water)
+        sim.ambient_temperature = -1
+        sim.step(650)
+    chunked, reference = sims
+    assert (reference.materials() == ice.material_id).all()
+    assert np.array_equal(chunked.materials(), reference.materials())
+    assert np.allclose(chunked.temperatures(), reference.temperatures())
+
+
+def test_array_engine_skips_settled_chunks():
+    sim = ArraySimulation(128, 128, seed=2)
+    sim.fill(0, 64, 128, 128, sand) # Sand reacts with water, so every grain is a candidate while awake
+    sim.step(20)
+    assert not sim.chunks.awake.any()
+    sim.profiler.enabled = True
+    sim.step(5)
+    counts = sim.profiler.counts()
+    assert counts["special_cells"] == 0 and counts["reactive_cells"] == 0
+
+    # Something placed on the pile only wakes the chunks around it
+    sim.profiler.clear()
+    sim.place(64, 63, water)
+    sim.step(1)
+    assert 0 < sim.profiler.records()[-1]["reactive_cells"] <= (3 * sim.chunks.size) ** 2
@@ -0,0 +1,76 @@
+import random
+from colorsys import hsv_to_rgb, rgb_to_hsv
+
+import numpy as np
+import pytest
+
+from array_engine import ArraySimulation
+from particles import COLOR_VARIANTS, MATERIALS, color_pool, sand, stone, water
+from simulation import RAMP_STEPS, Simulation, apply_ramp, color_ramp
+
+
+def test_pools_are_seeded_by_name():
+    state = random.getstate()
+    pool = color_pool(sand.base_color, sand.color_variance, "sand")
+    assert random.getstate() == state
+    assert pool == color_pool(sand.base_color, sand.color_variance, "sand") == sand.color_pool
+    assert pool != color_pool(sand.base_color, sand.color_variance, "not sand")
+
+
+def test_pools_fit_the_variants():
+    for cls in MATERIALS:
+        assert 1 <= len(cls.color_pool) <= COLOR_VARIANTS
+    sim = ArraySimulation(32, 32, seed=1)
+    sim.fill(0, 0, 32, 32, sand)
+    assert (sim.variant < COLOR_VARIANTS).all()
+    assert len(np.unique(sim.variant)) > 1
+
+
+@pytest.mark.parametrize("material", [sand, stone, water])
+def test_engines_spawn_the_same_colors(material):
+    sims = [engine(24, 16, seed=5) for engine in (Simulation, ArraySimulation)]
+    sims[1].random.setstate(sims[0].random.getstate()) # Building the worlds draws a different number of rolls
+    for sim in sims:
+        sim.fill(2, 3, 20, 12, material)
+        sim.place(22, 14, material)
+    objects, array = sims
+    assert np.array_equal(np.array(objects.colors(), np.uint8), array.colors())
+
+
+def blend(from_color, to_color, progress):
+    # How a particle was colored on the way to its target before the ramps: an HSV blend of its own
+    start = rgb_to_hsv(*(c / 255.0 for c in from_color))
+    end = rgb_to_hsv(*(c / 255.0 for c in to_color))
+    progress = max(0.0, min(1.0, progress))
+    rgb = hsv_to_rgb(*(s + (e - s) * progress for s, e in zip(start, end)))
+    return tuple(int(max(0, min(255, c * 255))) for c in rgb)
+
+
+class Particle:
+    pass
+
+
+@pytest.mark.parametrize("colors", [((231, 91, 22), (58, 52, 49)), ((184, 115, 51), (80, 180, 120)),
+                                    ((120, 120, 120), (120, 120, 120))])
+def test_ramps_follow_the_blend(colors):
+    ramp = color_ramp(*colors)
+    assert color_ramp(*colors) is ramp
+    assert ramp[0] == blend(*colors, 0.0)
+    assert ramp[RAMP_STEPS - 1] == blend(*colors, 1.0)
+    step_size = max(abs(a - b) for k in range(RAMP_STEPS - 1) for a, b in zip(ramp[k], ramp[k + 1]))
+    p = Particle()
+    for progress in np.linspace(-0.5, 1.5, 81):
+        apply_ramp(p, ramp, progress)
+        assert max(abs(a - b) for a, b in zip(p.color, blend(*colors, progress))) <= step_size + 1
+
+
+def test_apply_ramp_only_recolors_on_a_new_step():
+    ramp = color_ramp((231, 91, 22), (58, 52, 49))
+    p = Particle()
+    apply_ramp(p, ramp, 0.5)
+    assert p.ramp_step == (ramp, (RAMP_STEPS - 1) // 2)
+    p.color = None
+    apply_ramp(p, ramp, 0.5 + 0.1 / RAMP_STEPS) # Same step
+    assert p.color is None
+    apply_ramp(p, ramp, 1.0)
+    assert p.color == ramp[RAMP_STEPS - 1]
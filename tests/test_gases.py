@@ -0,0 +1,107 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import particles
+from array_engine import (ABOVE, BELOW, BOTTOM_LEFT, BOTTOM_RIGHT, GAS_START, LEFT, RIGHT, TOP_LEFT, TOP_RIGHT,
+                          ArraySimulation)
+from particles import empty, steam, tungsten
+from simulation import Simulation
+
+STAY = -1
+# The first step of LightGas.check_movement() as (random(), randint(0, 2), randint(0, 1) for a sideways step)
+FIRST_DRAWS = {TOP_LEFT: (0.3, 0, None), ABOVE: (0.3, 1, None), TOP_RIGHT: (0.3, 2, None), LEFT: (0.7, 0, 0),
+               RIGHT: (0.7, 0, 1), BOTTOM_LEFT: (0.85, 0, None), BELOW: (0.85, 1, None),
+               BOTTOM_RIGHT: (0.85, 2, None), STAY: (0.95, 0, None)}
+
+
+class Draws:
+    """Stands in for the random number generators, to walk both engines down the same path: the first step,
+    then the same coin at every fork"""
+    def __init__(self, first, coin):
+        self.first, self.coin = first, coin
+        r, ri, side = FIRST_DRAWS[first]
+        self._random = [r]
+        self._ints = [ri] + ([side] if side is not None else [])
+
+    # random.Random, for LightGas
+    def randint(self, a, b):
+        return self._ints.pop(0) if self._ints else self.coin
+
+    def random(self, shape=None):
+        if shape is None:
+            return self._random.pop(0)
+        # np.random.Generator, for ArraySimulation._move_gases(): a roll for the first step, then a coin per
+        # retry, where below 0.5 takes the second of two choices
+        rolls = np.full(shape, 0.25 if self.coin else 0.75)
+        rolls[0] = (list(GAS_START).index(self.first) + 0.5) / GAS_START.size
+        return rolls
+
+
+def moves(rows, y, x):
+    """Where the gas at (y, x) of rows of materials ends up in either engine for every first step and coin, each
+    engine taking the same path"""
+    sim = ArraySimulation(len(rows[0]), len(rows))
+    for cy, row in enumerate(rows):
+        for cx, cls in enumerate(row):
+            sim.place(cx, cy, cls)
+    mat, perm = sim.mat.copy(), sim.perm.copy()
+    for first, coin in itertools.product(FIRST_DRAWS, (0, 1)):
+        particles.use_rng(sim.random)
+        grid = [[cls() for cls in row] for row in rows]
+        gas = grid[y][x]
+        particles.use_rng(Draws(first, coin))
+        gas.check_movement(x, y, grid)
+        (reference,) = [(cy, cx) for cy, row in enumerate(grid) for cx, cell in enumerate(row) if cell is gas]
+
+        sim.mat[...], sim.perm[...] = mat, perm
+        sim.rng = Draws(first, coin)
+        sim._move_gases(np.array([y]), np.array([x]))
+        (moved,) = np.argwhere(sim.perm == y * sim.width + x).tolist()
+        yield (first, coin), tuple(moved), reference
+
+
+def test_gas_takes_the_same_path_as_light_gas():
+    # Every first step with either coin, from every cell of small worlds with walls and other gas around
+    rng = np.random.default_rng(8)
+    for _ in range(40):
+        rows = [[(empty, tungsten, steam)[i] for i in rng.choice(3, 3, p=[0.5, 0.35, 0.15])] for _ in range(3)]
+        for y, x in itertools.product(range(3), range(3)):
+            world = [row[:] for row in rows]
+            world[y][x] = steam
+            for draws, moved, reference in moves(world, y, x):
+                assert moved == reference, (world, y, x, draws)
+
+
+@pytest.mark.parametrize("engine", [Simulation, ArraySimulation])
+def test_gas_direction_split(engine):
+    # Gas four cells apart never gets in its own way, so every one moves where its first step goes
+    counts = {"up": 0, "side": 0, "down": 0, "stay": 0}
+    for seed in range(8):
+        sim = engine(64, 64, ambient_temperature=150, seed=seed) # Hot enough that steam doesn't condense
+        starts = [(y, x) for y in range(2, 62, 4) for x in range(2, 62, 4)]
+        for y, x in starts:
+            sim.place(x, y, steam)
+        sim.step(1)
+        gas = sim.materials() == steam.material_id
+        for y, x in starts:
+            (dy, dx), = np.argwhere(gas[y - 1:y + 2, x - 1:x + 2]) - 1
+            counts["up" if dy < 0 else "down" if dy > 0 else "side" if dx else "stay"] += 1
+    total = sum(counts.values())
+    for direction, share in {"up": 0.6, "side": 0.2, "down": 0.1, "stay": 0.1}.items():
+        assert abs(counts[direction] / total - share) < 0.035, counts
+
+
+@pytest.mark.parametrize("engine", [Simulation, ArraySimulation])
+def test_gas_in_a_closed_box_keeps_its_count(engine):
+    sim = engine(32, 32, ambient_temperature=150, seed=3)
+    sim.fill(4, 4, 28, 5, tungsten)
+    sim.fill(4, 27, 28, 28, tungsten)
+    sim.fill(4, 4, 5, 28, tungsten)
+    sim.fill(27, 4, 28, 28, tungsten)
+    sim.fill(8, 16, 24, 26, steam)
+    for _ in range(10):
+        sim.step(20)
+        gas = sim.materials() == steam.material_id
+        assert gas.sum() == 160 and gas[5:27, 5:27].sum() == 160
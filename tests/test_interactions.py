@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from array_engine import ArraySimulation
+from particles import empty, sand, stone, water, wet_sand
+from simulation import Simulation
+
+
+@pytest.mark.parametrize("engine", [Simulation, ArraySimulation])
+def test_every_cell_reacts_with_its_first_partner(engine):
+    sim = engine(16, 8, seed=1)
+    sim.fill(0, 6, 16, 8, stone)
+    sim.fill(0, 5, 16, 6, sand)
+    sim.fill(0, 4, 16, 5, water) # Nowhere to flow, every water reacts with the sand below it
+    sim.step(1)
+    mat = sim.materials()
+    assert (mat[4] == empty.material_id).all()
+    assert (mat[5] == wet_sand.material_id).all()
+
+
+@pytest.mark.parametrize("engine", [Simulation, ArraySimulation])
+def test_a_cell_reacts_once_a_frame(engine):
+    sim = engine(8, 8, seed=1)
+    sim.fill(0, 6, 8, 8, stone)
+    sim.place(3, 5, sand)
+    sim.place(3, 4, water) # Comes first in scan order, so it gets the sand
+    sim.place(2, 5, water)
+    sim.place(4, 5, water)
+    sim.step(1)
+    mat = sim.materials()
+    assert np.count_nonzero(mat == wet_sand.material_id) == 1
+    assert np.count_nonzero(mat == water.material_id) == 2
+    assert mat[5, 3] == wet_sand.material_id and mat[4, 3] == empty.material_id
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from array_engine import ArraySimulation
+from particles import MATERIALS, Liquid, acid, empty, steam, tungsten, water
+from simulation import Simulation
+
+ROW = 40
+
+
+def both_engines(rows):
+    """Columns Liquid.flow_target() and ArraySimulation._flow_targets() give every liquid of rows of materials, for
+    each side whose first cell it could flow into"""
+    sim = ArraySimulation(len(rows[0]), len(rows))
+    grid = [[cls() for cls in row] for row in rows]
+    for y, row in enumerate(rows):
+        for x, cls in enumerate(row):
+            sim.place(x, y, cls)
+    expected, found = [], []
+    for y, row in enumerate(grid):
+        for x, cell in enumerate(row):
+            for side in (-1, 1):
+                if not isinstance(cell, Liquid) or not 0 <= x + side < len(row) or \
+                        not isinstance(row[x + side], (empty, steam)):
+                    continue
+                expected.append(cell.flow_target(x, y, grid, side))
+                found.append(int(sim._flow_targets(y, np.array([x]), np.array([side]),
+                                                   np.array([cell.dispersion]))[0]))
+    return expected, found
+
+
+def test_flow_targets_match_flow_target():
+    rng = np.random.default_rng(4)
+    choices = [empty, tungsten, water, acid, steam]
+    rows = [[choices[i] for i in rng.choice(len(choices), ROW, p=[0.6, 0.15, 0.1, 0.05, 0.1])] for _ in range(6)]
+    expected, found = both_engines(rows)
+    assert len(expected) > 20
+    assert found == expected
+
+
+@pytest.mark.parametrize("row, target", [
+    ("w.........", 8),  # As far as dispersion goes
+    ("w...#.....", 3),  # Stops at a wall
+    ("w..a......", 2),  # and at another liquid
+    ("w.....", 5),      # and at the edge of the world
+    ("w..s......", 8),  # but flows through gas
+])
+def test_flow_stops_at_walls_and_liquids(row, target):
+    legend = {"w": water, ".": empty, "#": tungsten, "a": acid, "s": steam}
+    rows = [[legend[c] for c in row], [tungsten] * len(row)]
+    expected, found = both_engines(rows)
+    assert expected == found and expected[0] == target # The water's, the acid flows too
+
+
+def test_flow_falls_off_an_edge():
+    rows = [[water] + [empty] * 9, [tungsten] * 4 + [empty] + [tungsten] * 5]
+    expected, found = both_engines(rows)
+    assert expected == found == [4] # The first cell with nothing under it
+
+
+def test_engines_level_water_the_same_way():
+    results = []
+    for engine in (Simulation, ArraySimulation):
+        sim = engine(24, 24, seed=6)
+        sim.fill(2, 20, 22, 21, tungsten) # A basin 18 cells wide
+        sim.fill(2, 4, 3, 20, tungsten)
+        sim.fill(21, 4, 22, 20, tungsten)
+        sim.fill(3, 2, 6, 14, water) # 36 cells, two rows' worth
+        sim.step(200)
+        water_cells = sim.materials() == water.material_id
+        assert water_cells[18:20, 3:21].all() and water_cells.sum() == 36
+        results.append(sim.materials())
+    assert np.array_equal(*results)
@@ -0,0 +1,41 @@
+from collections import Counter
+
+from particles import sand, tungsten, water
+from simulation import Simulation
+
+
+def test_particles_move_once_per_frame(monkeypatch):
+    # Water flowing right lands on cells the row scan still has to visit, the moved_frame stamp skips it there
+    calls = Counter()
+    check_movement = water.check_movement
+    def counted(self, x, y, grid):
+        calls[id(self), sim.frame] += 1
+        return check_movement(self, x, y, grid)
+    monkeypatch.setattr(water, "check_movement", counted)
+    sim = Simulation(32, 8, seed=2)
+    sim.fill(0, 7, 32, 8, tungsten)
+    sim.fill(0, 0, 8, 7, water)
+    sim.step(40)
+    assert calls and max(calls.values()) == 1
+
+
+def test_stamps_go_stale_without_a_reset():
+    sim = Simulation(4, 16, seed=1)
+    sim.place(1, 0, sand)
+    grain = sim.grid[0][1]
+    for frame in range(10):
+        sim.step(1)
+        assert sim.grid[frame + 1][1] is grain
+        assert grain.moved_frame == frame
+
+
+def test_loaded_particles_can_move_straight_away():
+    sim = Simulation(4, 16, seed=1)
+    sim.place(1, 0, sand)
+    sim.step(5)
+    loaded = Simulation(4, 16, seed=1)
+    loaded.load_state(sim.state_arrays())
+    loaded.frame = sim.frame
+    assert loaded.grid[5][1].moved_frame == -1
+    loaded.step(1)
+    assert loaded.material_at(1, 6) is sand
@@ -0,0 +1,48 @@
+import numpy as np
+
+import snapshots
+from array_engine import ArraySimulation
+from paging import PagedWorld
+from particles import lava, sand, stone, water
+
+
+def settled_world(path):
+    sim = ArraySimulation(64, 64, ambient_temperature=20, seed=5)
+    sim.fill(0, 56, 64, 64, stone)
+    sim.fill(4, 40, 20, 56, sand)
+    sim.fill(36, 20, 44, 28, sand)
+    sim.place(50, 10, water)
+    sim.step(120) # Long enough for chunks to fall asleep and skip thermal steps
+    assert not sim.chunks.awake.all() and sim._heat_lag.any()
+    snapshots.save(sim, path)
+
+
+def test_flushed_window_loads_like_it_carries_on(tmp_path):
+    path = tmp_path / "world.powder"
+    settled_world(path)
+    world = PagedWorld(path, page_size=64) # One page, the window is the whole world
+    world.fill(36, 0, 44, 6, sand)
+    world.place(10, 30, lava, 1200)
+    world.step(5)
+    world.flush()
+    loaded = snapshots.load(path)
+    assert np.array_equal(loaded.chunks.awake, world.sim.chunks.awake)
+    assert not loaded._heat_lag.any()
+
+    world.step(30)
+    loaded.step(30)
+    assert np.array_equal(loaded.materials(), world.materials())
+    assert np.allclose(loaded.temperatures(), world.temperatures(), atol=1e-3)
+    world.close()
+
+
+def test_flush_wakes_the_chunks_along_the_window_edge(tmp_path):
+    path = tmp_path / "world.powder"
+    settled_world(path)
+    world = PagedWorld(path, page_size=32, margin=0) # The window is the top left page
+    world.step(5)
+    world.close()
+    loaded = snapshots.load(path)
+    assert loaded.chunks.awake[:2, 2].all() and loaded.chunks.awake[2, :3].all()
+    assert loaded.heat.awake[:2, 2].all() and loaded.heat.awake[2, :3].all()
+    assert not loaded.idle[:48, 32:48].any() and not loaded.idle[32:48, :48].any()
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import thermal
+from array_engine import ArraySimulation
+from particles import bouncy_ball, lava, sand, steam, stone, water
+
+
+def build(workers, thermal_backend="numpy"):
+    sim = ArraySimulation(128, 96, seed=1, workers=workers, tile_size=32, thermal_backend=thermal_backend)
+    sim.fill(0, 70, 128, 96, stone)
+    sim.fill(0, 30, 64, 50, sand)
+    sim.fill(64, 30, 128, 50, water)
+    sim.fill(32, 0, 96, 12, steam)
+    sim.fill(10, 15, 20, 25, bouncy_ball)
+    sim.fill(40, 55, 70, 65, lava)
+    return sim
+
+
+def run(workers, thermal_backend="numpy", steps=25):
+    sim = build(workers, thermal_backend)
+    try:
+        sim.step(steps)
+    finally:
+        sim.close()
+    return sim.materials(), sim.temperatures()
+
+
+def test_same_result_on_any_number_of_workers():
+    (mat2, temp2), (mat3, temp3) = run(2), run(3)
+    assert np.array_equal(mat2, mat3)
+    assert np.array_equal(temp2, temp3)
+
+
+def test_tiled_thermal_pass_matches_serial():
+    (mat, temp), (tiled_mat, tiled_temp) = run(2), run(2, "tiled")
+    assert np.array_equal(mat, tiled_mat)
+    assert np.array_equal(temp, tiled_temp)
+
+
+@pytest.mark.parametrize("all_neighbours", [False, True])
+def test_tiled_conduct_matches_conduct(all_neighbours):
+    sim = build(3, "tiled")
+    try:
+        sim.temp[...] = np.random.default_rng(0).uniform(-50, 1500, sim.temp.shape)
+        table, mat, temp = sim.table, sim.mat, sim.temp.copy()
+        expected = thermal.conduct(temp, table.conductivity[mat], table.decay_factor[mat], table.ignore_cooling[mat],
+                                   sim.ambient_temperature, all_neighbours)
+        tiled = sim.parallel.conduct(sim.temp, sim.ambient_temperature, all_neighbours).copy()
+        parts = [(slice(0, 32), slice(16, 80)), (slice(48, 96), slice(96, 128))]
+        blocks = sim.parallel.conduct_blocks(sim.temp, parts, sim.ambient_temperature, all_neighbours)
+        tiled_blocks = [blocks[rows, cols].copy() for rows, cols in parts]
+    finally:
+        sim.close()
+    assert np.array_equal(tiled, expected)
+    for (rows, cols), block in zip(parts, tiled_blocks):
+        assert np.array_equal(block, expected[rows, cols])
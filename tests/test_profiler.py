@@ -0,0 +1,68 @@
+import csv
+import json
+
+import numpy as np
+import pytest
+
+import profiler as profiler_module
+from profiler import Profiler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A perf_counter that only moves when the test says so
+    now = [0.0]
+    monkeypatch.setattr(profiler_module, "perf_counter", lambda: now[0])
+    return now
+
+
+def record(profiler, clock, frames):
+    for frame, (movement, thermal) in enumerate(frames):
+        profiler.begin_frame(frame)
+        clock[0] += movement
+        profiler.lap("movement")
+        clock[0] += thermal
+        profiler.lap("thermal")
+        profiler.count("sleeping", frame)
+    profiler.begin_frame() # Commits the last frame
+
+
+def test_ring_buffer_keeps_the_last_frames(clock):
+    profiler = Profiler(capacity=10, enabled=True)
+    record(profiler, clock, [(0.001 * i, 0.002) for i in range(25)])
+    assert [f["frame"] for f in profiler.records()] == list(range(15, 25))
+    assert profiler.records()[0]["movement"] == pytest.approx(0.015)
+    assert profiler.counts() == {"sleeping": pytest.approx(19.5)}
+
+
+def test_summary_percentiles(clock):
+    profiler = Profiler(capacity=200, enabled=True)
+    movement = [0.001 * (i + 1) for i in range(100)]
+    record(profiler, clock, [(m, 0.004) for m in movement])
+    stats = profiler.summary()
+    assert stats["movement"] == pytest.approx((np.mean(movement), *np.percentile(movement, [50, 95, 99])))
+    assert stats["thermal"] == pytest.approx((0.004,) * 4)
+    assert stats["total"][0] == pytest.approx(np.mean(movement) + 0.004)
+    assert set(stats) == {"movement", "thermal", "total"}
+
+
+def test_disabled_records_nothing(clock):
+    profiler = Profiler()
+    record(profiler, clock, [(0.001, 0.001)] * 5)
+    assert profiler.records() == [] and profiler.summary() == {} and profiler.counts() == {}
+
+
+def test_exports_round_trip(clock, tmp_path):
+    profiler = Profiler(capacity=4, enabled=True)
+    record(profiler, clock, [(0.001 * i, 0.5 / (i + 1)) for i in range(7)])
+    records = profiler.records()
+
+    profiler.to_jsonl(tmp_path / "profile.jsonl")
+    with open(tmp_path / "profile.jsonl") as f:
+        assert [json.loads(line) for line in f] == records
+
+    profiler.to_csv(tmp_path / "profile.csv")
+    with open(tmp_path / "profile.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ["frame", "movement", "thermal", "sleeping"]
+    assert [{name: float(value) for name, value in row.items()} for row in rows] == records
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import recording
+from array_engine import ArraySimulation
+from particles import bouncy_ball, lava, sand, steam, stone, water
+from simulation import Simulation
+
+
+@pytest.mark.parametrize("engine", [Simulation, ArraySimulation])
+def test_replay_gives_the_recorded_run(engine, tmp_path):
+    sim = engine(40, 40, ambient_temperature=20, seed=5)
+    recorder = recording.Recorder(sim)
+    recorder.fill(0, 32, 40, 40, stone)
+    recorder.fill(5, 5, 15, 12, sand)
+    sim.step(10)
+    recorder.fill(20, 5, 30, 12, water)
+    recorder.place(25, 2, lava, 1200)
+    recorder.fill(2, 20, 6, 24, bouncy_ball)
+    sim.step(15)
+    recorder.set_ambient_temperature(5)
+    recorder.fill(10, 0, 30, 3, steam)
+    recorder.erase(12, 8)
+    sim.step(25)
+    recorder.save(tmp_path / "session.rec")
+
+    replayed = recording.replay(tmp_path / "session.rec")
+    assert type(replayed) is engine
+    assert replayed.frame == sim.frame
+    assert np.array_equal(replayed.materials(), sim.materials())
+    assert np.array_equal(replayed.temperatures(), sim.temperatures())
+    assert np.array_equal(np.asarray(replayed.colors()), np.asarray(sim.colors()))
@@ -0,0 +1,76 @@
+from colorsys import hsv_to_rgb
+
+import numpy as np
+import pygame
+
+from particles import empty, stone
+from renderer import THERMOGRAM_LUT, Renderer, thermogram_colors
+
+r_hue, g_hue, b_hue = 0 / 360.0, 120 / 360.0, 240 / 360.0
+
+
+def thermogram_cell(temperature, min_temp, avg_temp, max_temp):
+    # The color the simulation gave an empty cell before the thermogram went through the LUT
+    if temperature < avg_temp:
+        denom = avg_temp - min_temp
+        n_temp = (temperature - min_temp) / denom if denom != 0 else 0
+        rgb = hsv_to_rgb(b_hue + n_temp * (g_hue - b_hue), 1, .4)
+    else:
+        denom = max_temp - avg_temp
+        n_temp = (temperature - avg_temp) / denom if denom != 0 else 0
+        rgb = hsv_to_rgb(g_hue + n_temp * (r_hue - g_hue), 1, .4)
+    return [int(c * 255) for c in rgb]
+
+
+def test_lut_matches_the_per_cell_colors():
+    temperatures = np.linspace(-40, 400, 64 * 64).reshape(64, 64)
+    materials = np.full(temperatures.shape, empty.material_id, np.uint8)
+    colors = thermogram_colors(np.zeros(temperatures.shape + (3,), np.uint8), temperatures, materials)
+    step = int(np.abs(np.diff(THERMOGRAM_LUT.astype(int), axis=0)).max())
+    avg = temperatures.mean()
+    for y, x in np.ndindex(temperatures.shape):
+        expected = thermogram_cell(temperatures[y, x], -40, avg, 400)
+        assert np.abs(colors[y, x].astype(int) - expected).max() <= step
+    assert (colors[0, 0] == THERMOGRAM_LUT[0]).all()
+    assert (colors[-1, -1] == THERMOGRAM_LUT[-1]).all()
+
+
+def test_clamps_below_and_above():
+    # A world between 20 and 80 degrees is shown against 0 to 50, like before
+    temperatures = np.full((8, 8), 20.0)
+    temperatures[0, 0] = 80.0
+    temperatures[0, 1] = 60.0
+    materials = np.full(temperatures.shape, empty.material_id, np.uint8)
+    materials[7, 7] = stone.material_id
+    colors = np.full(temperatures.shape + (3,), 7, np.uint8)
+    shown = thermogram_colors(colors, temperatures, materials)
+    # The range goes down to 0 though nothing is that cold, and what's hotter than 50 sticks to the hot end
+    assert (shown[0, 0] == THERMOGRAM_LUT[-1]).all() and (shown[0, 1] == THERMOGRAM_LUT[-1]).all()
+    avg = temperatures.mean()
+    assert (shown[3, 3] == thermogram_cell(20.0, 0, avg, 50)).all()
+    assert (shown[7, 7] == 7).all() and (colors == 7).all() # Only empty cells, and on a copy
+
+
+def test_one_changed_cell_marks_its_tile():
+    renderer = Renderer(pygame.Surface((40 * 3, 24 * 3)), 40, 24, 3, tile_size=8)
+    colors = np.zeros((24, 40, 3), np.uint8)
+    assert renderer.draw(colors) == [pygame.Rect(0, 0, 120, 72)]
+    assert renderer.draw(colors) == []
+    colors[13, 21] = (200, 100, 50)
+    assert renderer.draw(colors) == [pygame.Rect(16 * 3, 8 * 3, 8 * 3, 8 * 3)]
+    assert tuple(renderer.screen.get_at((21 * 3 + 1, 13 * 3 + 1)))[:3] == (200, 100, 50)
+    colors[23, 39] = (1, 2, 3) # A tile cut short by the edge of the view
+    assert renderer.draw(colors) == [pygame.Rect(32 * 3, 16 * 3, 8 * 3, 8 * 3)]
+
+
+def test_pan_and_zoom_redraw_the_whole_view():
+    colors = np.zeros((24, 40, 3), np.uint8)
+    colors[5, 5] = (9, 9, 9)
+    renderer = Renderer(pygame.Surface((120, 72)), 40, 24, 3, tile_size=8)
+    renderer.draw(colors)
+    renderer.invalidate() # What the game does when the view moves
+    assert renderer.draw(np.roll(colors, 1, axis=1)) == [pygame.Rect(0, 0, 120, 72)]
+    # Zooming makes a renderer for the new cell size, whose first frame covers the whole grid area again
+    renderer = Renderer(renderer.screen, 20, 12, 6, tile_size=8)
+    assert renderer.draw(colors[:12, :20]) == [pygame.Rect(0, 0, 120, 72)]
+    assert tuple(renderer.screen.get_at((5 * 6 + 2, 5 * 6 + 2)))[:3] == (9, 9, 9)
@@ -0,0 +1,84 @@
+import threading
+from time import sleep
+
+import numpy as np
+import pytest
+
+from array_engine import ArraySimulation
+from particles import sand, stone
+from runner import MAX_SPEED, MIN_SPEED, SimulationRunner
+
+
+def run_for(runner, seconds):
+    start = runner.sim.frame
+    runner.start()
+    sleep(seconds)
+    runner.stop()
+    return runner.sim.frame - start
+
+
+@pytest.fixture
+def sim():
+    sim = ArraySimulation(16, 16, seed=1)
+    sim.fill(0, 12, 16, 16, stone)
+    sim.fill(4, 0, 12, 6, sand)
+    return sim
+
+
+def test_speed_and_turbo(sim):
+    runner = SimulationRunner(sim, steps_per_sec=100)
+    normal = run_for(runner, 0.5)
+    runner.speed = 0.25
+    slow = run_for(runner, 0.5)
+    runner.turbo = True
+    turbo = run_for(runner, 0.5)
+    assert 30 <= normal <= 60
+    assert 6 <= slow <= 16
+    assert turbo > 3 * normal
+
+
+def test_change_speed_stays_in_range(sim):
+    runner = SimulationRunner(sim)
+    for _ in range(10):
+        runner.change_speed(2)
+    assert runner.speed == MAX_SPEED
+    for _ in range(20):
+        runner.change_speed(0.5)
+    assert runner.speed == MIN_SPEED
+
+
+def test_render_state_is_a_copy_of_a_finished_frame(sim):
+    runner = SimulationRunner(sim, steps_per_sec=200)
+    runner.paused = True
+    runner.start()
+    sleep(0.05)
+    state = runner.latest()
+    assert state.frame == 0 and state.temperatures is None and state.stats is None and state.origin == (0, 0)
+    assert np.array_equal(state.colors, sim.colors()) and state.colors is not sim.colors()
+
+    sim.profiler.enabled = True
+    runner.thermogram = True
+    runner.call(sim.place, 0, 0, sand)
+    sleep(0.05)
+    state = runner.latest()
+    assert state.temperatures.shape == state.materials.shape == (16, 16)
+    assert state.materials[0, 0] == sand.material_id
+
+    runner.paused = False
+    for _ in range(5): # The UI asks for the next state every time it takes one
+        sleep(0.03)
+        state = runner.latest()
+    runner.stop()
+    assert 1 < state.frame <= sim.frame
+    assert "movement" in state.stats and state.counts is not None
+
+
+def test_calls_run_on_the_simulation_thread(sim):
+    runner = SimulationRunner(sim)
+    threads = []
+    runner.start()
+    runner.call(lambda: threads.append(threading.current_thread().name))
+    sleep(0.05)
+    runner.call(threads.append, "queued") # Still runs when the runner stops
+    runner.stop()
+    assert threads[0] == "simulation" and threads[-1] == "queued"
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from array_engine import ArraySimulation
+from chunks import SLEEP_FRAMES
+from particles import MATERIALS, Granular, LightGas, Liquid, empty, sand, steam, stone, tungsten, water
+from simulation import SLEEPS, Simulation
+
+ENGINES = [Simulation, ArraySimulation]
+SINKS = np.array([issubclass(cls, (empty, Liquid, LightGas)) for cls in MATERIALS]) # What falling particles move into
+GRANULAR = np.array([issubclass(cls, Granular) for cls in MATERIALS])
+
+
+def sand_pile(engine):
+    sim = engine(32, 32, seed=3)
+    sim.fill(0, 28, 32, 29, tungsten)
+    sim.fill(8, 10, 24, 28, sand)
+    sim.step(60)
+    return sim
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_settled_pile_falls_asleep(engine):
+    sim = sand_pile(engine)
+    assert not sim.chunks.awake.any()
+    materials, idle = sim.materials().copy(), sim.idle.copy()
+    sim.step(20)
+    assert not sim.chunks.awake.any()
+    assert np.array_equal(sim.materials(), materials) and np.array_equal(sim.idle, idle) # Not even looked at
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_removing_support_wakes_the_pile(engine):
+    sim = sand_pile(engine)
+    sim.place(16, 28, empty)
+    sim.step(1)
+    assert sim.material_at(16, 28) is sand # The grain above fell in the next frame
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_placing_a_cell_wakes_its_neighbours(engine):
+    sim = sand_pile(engine)
+    sim.place(16, 25, steam) # In the pile, the grain on top of it can sink into it
+    assert sim.idle[24:27, 15:18].max() == 0
+    sim.step(1)
+    assert sim.material_at(16, 25) is sand
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_evaporating_neighbour_wakes_it(engine):
+    sim = engine(16, 16, ambient_temperature=20, seed=3)
+    sim.fill(0, 11, 16, 12, tungsten)
+    sim.place(5, 10, stone)
+    sim.place(7, 10, tungsten)
+    sim.place(6, 10, water, 99) # Boxed in, next to the stone
+    sim.step(10)
+    assert sim.idle[10, 5] >= SLEEP_FRAMES
+
+    sim.ambient_temperature = 300
+    for _ in range(100):
+        sim.step(1)
+        if sim.material_at(6, 10) is not water:
+            break
+    assert sim.idle[10, 5] < SLEEP_FRAMES
+    sim.step(30) # Once the steam has risen away, the stone falls asleep again
+    assert sim.idle[10, 5] >= SLEEP_FRAMES
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_sleeping_gives_the_same_grid(engine):
+    # Stone falls straight down without drawing random numbers, so the two runs can be compared cell for cell
+    sims = [engine(48, 48, seed=4, active_chunks=active) for active in (True, False)]
+    for sim in sims:
+        sim.fill(0, 44, 48, 45, tungsten)
+        sim.fill(4, 10, 14, 30, stone)
+        sim.fill(18, 20, 30, 40, stone)
+        sim.fill(34, 5, 44, 15, stone)
+        sim.place(40, 43, tungsten, 400) # Keeps some heat chunks awake
+        sim.step(60)
+        sim.fill(20, 44, 26, 45, empty) # Dig under the middle block
+        sim.fill(6, 0, 10, 4, stone)
+        sim.step(60)
+    chunked, reference = sims
+    assert chunked.idle.max() >= SLEEP_FRAMES
+    assert np.array_equal(chunked.materials(), reference.materials())
+    assert np.allclose(chunked.temperatures(), reference.temperatures())
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_nothing_sleeps_that_could_move(engine):
+    sim = engine(64, 64, seed=2)
+    sim.fill(0, 56, 64, 64, stone)
+    sim.fill(8, 16, 32, 40, sand)
+    sim.fill(16, 4, 48, 12, water)
+    for frame in range(120):
+        if frame == 60:
+            sim.fill(16, 48, 24, 56, empty) # Dig under the pile
+        sim.step(1)
+        materials = sim.materials()
+        free = np.pad(SINKS[materials], 1) # Nothing to move into off the grid
+        can_move = free[2:, 1:-1] | (GRANULAR[materials] & (free[2:, :-2] | free[2:, 2:]))
+        asleep = (sim.idle >= SLEEP_FRAMES) & SLEEPS[materials]
+        assert not (asleep & can_move).any(), frame
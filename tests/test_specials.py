@@ -0,0 +1,48 @@
+import pytest
+
+from particles import MATERIALS, crystal, cold_fire, empty, fire, mud, steam, water, wet_sand
+from simulation import SPECIALS, Simulation
+
+
+def old_checks(p):
+    # The tests handle_particle_specials() ran on every particle before the dispatch table, in their order
+    return tuple(name for name, applies in [
+        ("condense", hasattr(p, 'condense_to')),
+        ("burn_out", isinstance(p, (fire, cold_fire))),
+        ("solidify", hasattr(p, 'solidify_to')),
+        ("melt", hasattr(p, 'melt_to')),
+        ("evaporate", hasattr(p, 'evap_to')),
+        ("dry", isinstance(p, (mud, wet_sand))),
+        ("corrode", hasattr(p, 'corroded_color')),
+        ("spread_color", isinstance(p, crystal)),
+    ] if applies)
+
+
+def test_table_matches_the_old_checks():
+    assert len(SPECIALS) == len(MATERIALS)
+    for cls, names in zip(MATERIALS, SPECIALS):
+        assert names == old_checks(cls()), cls.__name__
+    assert SPECIALS[empty.material_id] == ()
+
+
+def test_dispatch_calls_the_handlers_in_order(monkeypatch):
+    calls = []
+    for name in {name for names in SPECIALS for name in names}:
+        monkeypatch.setattr(Simulation, name, lambda self, x, y, p, name=name: calls.append((name, x, y, type(p))))
+    sim = Simulation(len(MATERIALS), 1, seed=1)
+    for x, cls in enumerate(MATERIALS):
+        sim.grid[0][x] = cls()
+        calls.clear()
+        sim.handle_particle_specials(x, 0)
+        assert calls == [(name, x, 0, cls) for name in SPECIALS[cls.material_id]]
+
+
+@pytest.mark.parametrize("material, temperature, becomes", [(water, 150, steam), (steam, 50, water)])
+def test_handlers_change_state(material, temperature, becomes):
+    sim = Simulation(3, 3, ambient_temperature=20, seed=1)
+    sim.fill(0, 0, 3, 3, steam if material is steam else empty) # Steam only condenses when it's boxed in
+    sim.place(1, 1, material, temperature)
+    frames = getattr(sim.grid[1][1], 'condensing_framecount', 0) + 1
+    for _ in range(frames):
+        sim.handle_particle_specials(1, 1)
+    assert sim.material_at(1, 1) is becomes
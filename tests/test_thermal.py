@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import thermal
+from array_engine import ArraySimulation
+from simulation import Simulation
+from particles import lava, stone, tungsten, water
+
+
+@pytest.mark.parametrize("all_neighbours", [False, True])
+def test_numpy_backend_matches_loop(all_neighbours):
+    sims = [Simulation(32, 32, ambient_temperature=20, all_neighbours_temp=all_neighbours, thermal_backend=backend, seed=3)
+            for backend in ("numpy", "loop")]
+    for sim in sims:
+        sim.fill(0, 20, 32, 32, stone)
+        sim.fill(4, 4, 14, 14, lava)
+        sim.fill(18, 4, 28, 14, water)
+        sim.step(100)
+    stencil, loop = sims
+    assert np.array_equal(stencil.materials(), loop.materials())
+    assert np.allclose(stencil.temperatures(), loop.temperatures())
+
+
+def test_decay_matches_stepping_every_frame():
+    rng = np.random.default_rng(0)
+    shape = (8, 8)
+    temp = rng.uniform(-50, 400, shape).astype(np.float32)
+    decay_factor = rng.uniform(0.001, 0.02, shape).astype(np.float32)
+    ignore_cooling = rng.random(shape) < 0.2
+    frames = rng.integers(0, 300, shape)
+    stepped = temp.copy()
+    for frame in range(frames.max()):
+        # No conduction, so every cell only decays towards the ambient temperature
+        new_temp = thermal.conduct(stepped, np.zeros_like(stepped), decay_factor, ignore_cooling, 20)
+        stepped = np.where(frame < frames, new_temp, stepped)
+    assert np.allclose(thermal.decay(temp, decay_factor, ignore_cooling, 20, frames), stepped, rtol=1e-4, atol=1e-3)
+
+
+@pytest.mark.parametrize("engine", [Simulation, ArraySimulation])
+def test_skipped_chunks_catch_up_when_woken(engine):
+    # A block of one material at one temperature has nothing to conduct, so the only thermal steps the sleeping
+    # chunks skip are the ambient decay that _catch_up() applies in closed form
+    sims = [engine(64, 64, ambient_temperature=20, seed=1, active_chunks=active) for active in (True, False)]
+    for sim in sims:
+        sim.fill(0, 0, 64, 64, tungsten)
+        sim._set_heat(slice(0, 64), slice(0, 64), np.full((64, 64), 20.04))
+        sim.step(200)
+    chunked, reference = sims
+    assert not chunked.heat.awake.any() and chunked._heat_lag.min() >= 150
+    for sim in sims:
+        sim.place(8, 8, tungsten, 500)
+        sim.step(5)
+    assert chunked._heat_lag.max() > 0 # Only the chunks around the hot cell woke up
+    # The array engine's float32 temperatures round a little differently over 200 steps than over one
+    assert np.allclose(chunked.temperatures(), reference.temperatures(), rtol=0, atol=1e-5)
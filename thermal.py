@@ -0,0 +1,112 @@
+import numpy as np
+
+DIAGONAL_WEIGHT = 0.7071
+
+# Neighbour pairs as (cell, neighbour, weight) slices. Every pair is visited once and the
+# flux between the two cells is added to one side and taken from the other.
+ORTHOGONAL_PAIRS = [
+    ((slice(1, None), slice(None)), (slice(None, -1), slice(None)), 1.0),                          # upper
+    ((slice(None), slice(1, None)), (slice(None), slice(None, -1)), 1.0),                          # left
+]
+DIAGONAL_PAIRS = [
+    ((slice(1, None), slice(1, None)), (slice(None, -1), slice(None, -1)), DIAGONAL_WEIGHT),      # upper left
+    ((slice(1, None), slice(None, -1)), (slice(None, -1), slice(1, None)), DIAGONAL_WEIGHT),      # upper right
+]
+
+
+def material_properties(materials):
+    """Conductivity, decay factor and ignore_cooling lookup tables indexed by material id"""
+    conductivity = np.zeros(len(materials))
+    decay_factor = np.zeros(len(materials))
+    ignore_cooling = np.zeros(len(materials), bool)
+    for material_id, cls in enumerate(materials):
+        probe = cls()
+        conductivity[material_id] = probe.conductivity
+        decay_factor[material_id] = probe.decay_factor
+        ignore_cooling[material_id] = getattr(probe, 'ignore_cooling', False)
+    return conductivity, decay_factor, ignore_cooling
+
+
+def conduct(temp, conductivity, decay_factor, ignore_cooling, ambient_temperature, all_neighbours=True, out=None):
+    """One thermal step for the whole grid: ambient decay plus conduction with the 4 or 8 neighbours.
+
+    Every argument but ambient_temperature is a per-cell array with the same shape as temp.
+    Cells on the grid edge simply have fewer neighbours, and ignore_cooling cells keep their
+    temperature while still heating or cooling the cells around them.
+
+    The new temperatures go into `out` when given (any array of temp's shape and dtype but temp
+    itself), so a caller can swap two buffers every step instead of allocating a new one.
+    """
+    dtype = temp.dtype.type
+    new_temp = np.subtract(dtype(ambient_temperature), temp, out=out)
+    new_temp *= decay_factor
+    new_temp += temp
+    conduction = np.zeros_like(temp)
+    pairs = ORTHOGONAL_PAIRS + DIAGONAL_PAIRS if all_neighbours else ORTHOGONAL_PAIRS
+    for cell, other, weight in pairs:
+        flux = (temp[other] - temp[cell]) * ((conductivity[other] + conductivity[cell]) / 2)
+        if weight != 1.0:
+            flux *= dtype(weight)
+        conduction[cell] += flux
+        conduction[other] -= flux
+    new_temp += conduction
+    new_temp[ignore_cooling] = temp[ignore_cooling]
+    return new_temp
+
+
+def conduct_blocks(temp, mat, conductivity, decay_factor, ignore_cooling, ambient_temperature, all_neighbours, blocks):
+    """conduct() for only the (rows, cols) slices in blocks, with the tables indexed by material id this time.
+
+    Each block also reads the cells right around it, so its cells get exactly the temperatures conduct() gives
+    them on the whole grid. Returns the new temperatures of every block, in order, and leaves temp as it is.
+    """
+    height, width = temp.shape
+    new_temps = []
+    for rows, cols in blocks:
+        (outer_rows, outer_cols), inner = with_halo(rows, cols, width, height)
+        ids = mat[outer_rows, outer_cols]
+        new_temp = conduct(temp[outer_rows, outer_cols], conductivity[ids], decay_factor[ids], ignore_cooling[ids],
+                           ambient_temperature, all_neighbours)
+        new_temps.append(new_temp[inner])
+    return new_temps
+
+
+def with_halo(rows, cols, width, height):
+    """The slices grown by the cell around them that conduct() reads, and where the original cells are inside those"""
+    outer_rows = slice(max(0, rows.start - 1), min(height, rows.stop + 1))
+    outer_cols = slice(max(0, cols.start - 1), min(width, cols.stop + 1))
+    inner = (slice(rows.start - outer_rows.start, rows.stop - outer_rows.start),
+             slice(cols.start - outer_cols.start, cols.stop - outer_cols.start))
+    return (outer_rows, outer_cols), inner
+
+
+def blocks(mask, size, width, height):
+    """The chunks of a per-chunk mask as (rows, cols) slices of cells: runs of chunks along a chunk row, stacked
+    into one block for as long as the chunk rows below have the same run"""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), bool)
+    padded[:, 1:-1] = mask
+    ys, xs = np.nonzero(padded[:, 1:] != padded[:, :-1])
+    runs = {} # Chunk row -> runs on it as (cx0, cx1)
+    for cy, cx0, cx1 in zip(ys[::2].tolist(), xs[::2].tolist(), xs[1::2].tolist()):
+        runs.setdefault(cy, set()).add((cx0, cx1))
+    found = []
+    stacked = {} # (cx0, cx1) -> chunk rows [cy0, cy1) it was on so far
+    for cy in sorted(runs) + [len(mask) + 1]:
+        row = runs.get(cy, ())
+        for cx0, cx1 in [run for run, (_, cy1) in stacked.items() if cy1 != cy or run not in row]:
+            cy0, cy1 = stacked.pop((cx0, cx1))
+            found.append((slice(cy0 * size, min(height, cy1 * size)), slice(cx0 * size, min(width, cx1 * size))))
+        for run in row:
+            stacked[run] = (stacked.get(run, (cy,))[0], cy + 1)
+    return found
+
+
+def decay(temp, decay_factor, ignore_cooling, ambient_temperature, frames):
+    """temp after `frames` steps of ambient decay alone: conduct() in closed form for cells with nothing to conduct.
+
+    frames is a per-cell array like the others, cells at 0 keep their temperature as it is.
+    """
+    temp = np.asarray(temp)
+    keep = np.power(1 - np.asarray(decay_factor, np.float64), frames)
+    new_temp = (ambient_temperature + (temp - ambient_temperature) * keep).astype(temp.dtype)
+    return np.where((frames > 0) & ~ignore_cooling, new_temp, temp)